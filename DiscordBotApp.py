@@ -5,7 +5,10 @@ Discord 管理機器人主程式
 import discord
 from discord.ext import commands
 import asyncio
+import io
+import json
 import logging
+import time
 from datetime import datetime, timezone
 
 # 導入配置和工具
@@ -33,6 +36,11 @@ class DiscordBot(commands.Bot):
         )
         
         self.start_time = datetime.now()
+        
+        # 啟動耗時紀錄（毫秒）
+        self.startup_timings = {'cogs': {}}
+        self._start_perf = time.perf_counter()
+        self._storage_prewarmed = False
     
     async def setup_hook(self):
         """機器人啟動時的設置"""
@@ -40,11 +48,14 @@ class DiscordBot(commands.Bot):
         
         # 載入所有 Cogs
         for cog in INITIAL_COGS:
+            cog_start = time.perf_counter()
             try:
                 await self.load_extension(cog)
                 logger.info(f"✓ 已載入: {cog}")
             except Exception as e:
                 logger.error(f"✗ 載入失敗: {cog} - {e}")
+            self.startup_timings['cogs'][cog] = (time.perf_counter() - cog_start) * 1000
+        self.startup_timings['setup_hook_ms'] = (time.perf_counter() - self._start_perf) * 1000
         
         # 同步斜線指令
         try:
@@ -63,6 +74,12 @@ class DiscordBot(commands.Bot):
         logger.info(f"用戶數量: {sum(g.member_count for g in self.guilds)}")
         logger.info("=" * 50)
         
+        # 首次就緒時於背景預熱資料集（重新連線不重複執行）
+        if not self._storage_prewarmed:
+            self._storage_prewarmed = True
+            self.startup_timings['ready_ms'] = (time.perf_counter() - self._start_perf) * 1000
+            asyncio.create_task(self.prewarm_storage())
+        
         # 設定狀態
         await self.change_presence(
             activity=discord.Activity(
@@ -71,6 +88,22 @@ class DiscordBot(commands.Bot):
             )
         )
     
+    async def prewarm_storage(self):
+        """在背景執行緒載入所有資料集，並輸出啟動耗時報告"""
+        try:
+            await asyncio.to_thread(db.prewarm)
+        except Exception as e:
+            logger.error(f"資料集預熱失敗: {e}")
+        
+        report = db.startup_report()
+        slowest_cogs = sorted(self.startup_timings['cogs'].items(), key=lambda item: item[1], reverse=True)[:3]
+        logger.info(
+            f"啟動耗時: setup_hook {self.startup_timings.get('setup_hook_ms', 0):.0f}ms, "
+            f"就緒 {self.startup_timings.get('ready_ms', 0):.0f}ms, "
+            f"資料集預熱 {report['prewarm_ms'] or 0:.1f}ms"
+        )
+        logger.info("最慢的 Cogs: " + ", ".join(f"{cog} {ms:.0f}ms" for cog, ms in slowest_cogs))
+    
     async def on_guild_join(self, guild: discord.Guild):
         """加入新伺服器事件"""
         logger.info(f"加入了新伺服器: {guild.name} (ID: {guild.id})")
@@ -196,15 +229,16 @@ async def help_command(ctx: commands.Context, command: str = None):
     # 按 Cog 分組指令
     cogs_dict = {
         "管理功能": ["kick", "ban", "unban", "warn", "warnings", "clearwarnings", "mute", "unmute", "clear", "lock", "unlock", "slowmode", "nick"],
-        "歡迎系統": ["setwelcome", "setfarewell", "setautorole"],
+        "歡迎系統": ["setwelcome", "setfarewell", "setautorole", "welcomecard"],
         "等級系統": ["rank", "leaderboard", "resetlevels"],
         "經濟系統": ["balance", "daily", "work", "deposit", "withdraw", "give", "richest"],
         "娛樂功能": ["8ball", "roll", "choose", "rps", "coinflip", "random", "cat", "dog", "poll"],
         "實用工具": ["serverinfo", "userinfo", "avatar", "ping", "botinfo", "roleinfo"],
         "音樂播放": ["join", "leave", "play", "pause", "resume", "stop", "volume"],
         "反應角色": ["reactionrole", "removereactionrole", "listreactionroles"],
-        "自動管理": ["automod"],
-        "日誌記錄": ["setlog"]
+        "自動管理": ["automod", "automodset", "bannedwords", "linkfilter", "imageblock", "antiraid", "endraid", "autoslowmode"],
+        "日誌記錄": ["setlog", "logsearch"],
+        "資料維護": ["retention"]
     }
     
     for category, commands_list in cogs_dict.items():
@@ -253,6 +287,88 @@ async def unload_cog(ctx: commands.Context, cog: str):
         await ctx.send(f"✗ 卸載失敗: {e}")
 
 
+@bot.command(name="dbstats", hidden=True)
+@commands.is_owner()
+async def db_stats(ctx: commands.Context, mode: str = None):
+    """查看資料層效能統計（json: 匯出完整統計, reset: 清除統計）"""
+    if mode == "reset":
+        db.metrics.reset()
+        await ctx.send("✓ 已清除資料層統計")
+        return
+
+    snapshot = db.metrics.snapshot()
+
+    if mode == "json":
+        payload = json.dumps(snapshot, ensure_ascii=False, indent=2).encode('utf-8')
+        await ctx.send(file=discord.File(io.BytesIO(payload), filename="storage_metrics.json"))
+        return
+
+    embed = create_embed(
+        title="📊 資料層統計",
+        description=f"使用 `{BOT_PREFIX}dbstats json` 匯出完整統計",
+        color=Colors.INFO
+    )
+
+    for name, stats in snapshot['datasets'].items():
+        lock_wait = stats['lock_wait']
+        embed.add_field(
+            name=name,
+            value=(
+                f"讀取: {stats['reads']} 次 / {stats['bytes_read']:,} B\n"
+                f"寫入: {stats['writes']} 次 / {stats['bytes_written']:,} B\n"
+                f"磁碟: {stats['read_io_ms'] + stats['write_io_ms']:.1f}ms\n"
+                f"JSON: {stats['parse_ms'] + stats['serialize_ms']:.1f}ms\n"
+                f"鎖等待: p95 {lock_wait['p95_ms']}ms / max {lock_wait['max_ms']}ms"
+            ),
+            inline=True
+        )
+
+    # 依總耗時列出最慢的方法
+    slowest = sorted(snapshot['methods'].items(), key=lambda item: item[1]['total_ms'], reverse=True)[:8]
+    if slowest:
+        lines = [
+            f"`{name}` ×{hist['count']} avg {hist['avg_ms']}ms p95 {hist['p95_ms']}ms"
+            for name, hist in slowest
+        ]
+        embed.add_field(name="最耗時的方法", value="\n".join(lines), inline=False)
+
+    await ctx.send(embed=embed)
+
+
+@bot.command(name="startup", hidden=True)
+@commands.is_owner()
+async def startup_report(ctx: commands.Context):
+    """查看啟動耗時報告"""
+    timings = bot.startup_timings
+    report = db.startup_report()
+    
+    embed = create_embed(
+        title="⏱️ 啟動耗時",
+        description=(
+            f"setup_hook: **{timings.get('setup_hook_ms', 0):.0f}ms**\n"
+            f"就緒: **{timings.get('ready_ms', 0):.0f}ms**\n"
+            f"資料庫初始化: **{report['init_ms']}ms**\n"
+            f"資料集預熱: **{report['prewarm_ms'] if report['prewarm_ms'] is not None else '未完成'}ms**"
+        ),
+        color=Colors.INFO
+    )
+    
+    cogs_str = "\n".join(
+        f"`{cog}` {ms:.0f}ms"
+        for cog, ms in sorted(timings['cogs'].items(), key=lambda item: item[1], reverse=True)
+    )
+    if cogs_str:
+        embed.add_field(name="Cogs 載入", value=cogs_str[:1024], inline=False)
+    
+    datasets_str = "\n".join(
+        f"`{key}` {f'{ms}ms' if ms is not None else '未開啟'}"
+        for key, ms in report['datasets'].items()
+    )
+    embed.add_field(name="資料集開啟", value=datasets_str, inline=False)
+    
+    await ctx.send(embed=embed)
+
+
 @bot.command(name="shutdown", hidden=True)
 @commands.is_owner()
 async def shutdown(ctx: commands.Context):
@@ -0,0 +1,379 @@
+"""
+自動管理重播效能測試 - 以輕量替身物件重播訊息，測量 AutoMod.on_message 的吞吐量
+不需要連線 Discord，可在離線環境比較規則修改前後的效能
+
+用法:
+    python benchmarks/automod_replay.py                       # 合成語料（預設 20000 則）
+    python benchmarks/automod_replay.py --messages 50000 --seed 7
+    python benchmarks/automod_replay.py --corpus messages.jsonl
+    python benchmarks/automod_replay.py --workers 0 --json
+    python benchmarks/automod_replay.py --check-signatures      # 檢查不同 PYTHONHASHSEED 的行程簽章是否一致
+
+語料檔每行一個 JSON：{"channel_id": 1, "author_id": 2, "content": "..."}
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from types import SimpleNamespace
+
+# 設定檔要求的環境變數在離線測試時給預設值
+for name in ("API_SERVER_PORT", "ALARM_CHANNEL_ID", "ASSISTANT_CHANNEL_ID"):
+    os.environ.setdefault(name, "0")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.database import JSONDatabase  # noqa: E402
+import utils.tracking as tracking  # noqa: E402
+import cogs.automod as automod  # noqa: E402
+
+GUILD_ID = 1000
+
+# ===== 合成語料 =====
+_WORDS_EN = (
+    "the quick brown fox jumps over lazy dog hello world game tonight anyone want to play "
+    "server update patch notes nice build gg wp lol maybe later thanks everyone"
+).split()
+_WORDS_ZH = "今天 天氣 很好 大家 晚上 一起 玩 遊戲 嗎 謝謝 更新 伺服器 新手 問題 請問".split()
+_EMOJI = ["😀", "🔥", "🎉", "👍", "😂", "❤️"]
+_SPAM_TEMPLATE = "FREE NITRO giveaway at my server, join now before it ends!! "
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    pool = _WORDS_ZH if rng.random() < 0.3 else _WORDS_EN
+    text = " ".join(rng.choice(pool) for _ in range(words))
+    if rng.random() < 0.1:
+        text += " " + rng.choice(_EMOJI)
+    return text
+
+
+def synthetic_corpus(count: int, seed: int, channels: int = 20, authors: int = 500) -> list:
+    """
+    產生合成語料：一般聊天為主，混合長訊息、連結、大寫、重複、多人複製貼上與違禁詞
+
+    Returns:
+        [{'channel_id', 'author_id', 'content', 'mentions'（可省略）}]
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        channel_id = rng.randrange(channels) + 1
+        author_id = rng.randrange(authors) + 1
+        roll = rng.random()
+        if roll < 0.55:
+            content = _sentence(rng, rng.randint(2, 20))
+        elif roll < 0.65:
+            content = _sentence(rng, rng.randint(80, 200))  # 長訊息
+        elif roll < 0.72:
+            host = rng.choice(["youtube.com", "github.com", f"blocked{rng.randrange(1000)}.example", "bit.ly"])
+            content = f"{_sentence(rng, 5)} https://{host}/{rng.randrange(10 ** 6)}"
+        elif roll < 0.76:
+            content = _sentence(rng, rng.randint(3, 12)).upper()
+        elif roll < 0.82:
+            # 少數成員在同一頻道重複發送相同內容
+            content = "same message again"
+            channel_id, author_id = 2, rng.randrange(10) + 1
+        elif roll < 0.90:
+            # 多人複製貼上（加入少量雜訊）
+            chars = list(_SPAM_TEMPLATE)
+            chars.insert(rng.randrange(len(chars)), rng.choice(string.ascii_letters))
+            content = "".join(chars)
+            channel_id = 1
+        elif roll < 0.93:
+            content = f"{_sentence(rng, 6)} badword{rng.randrange(50)}"
+        elif roll < 0.96:
+            content = f"{_sentence(rng, 4)} discord.gg/{rng.randrange(10 ** 6)}"
+        elif roll < 0.98:
+            content = f"{_sentence(rng, 3)} " + "😂" * rng.randint(5, 40)
+        else:
+            # 大量提及（提及數不在內容中掃描，由 entry['mentions'] 提供）
+            content = _sentence(rng, 3)
+            mentions = rng.randint(1, 12)
+            corpus.append({'channel_id': channel_id, 'author_id': author_id, 'content': content, 'mentions': mentions})
+            continue
+        corpus.append({'channel_id': channel_id, 'author_id': author_id, 'content': content})
+    return corpus
+
+
+def load_corpus(path: str) -> list:
+    """讀取 JSONL 語料"""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ===== discord 替身物件 =====
+class _Counter:
+    """記錄 API 呼叫次數"""
+
+    def __init__(self):
+        self.calls = defaultdict(int)
+
+    def hit(self, name: str):
+        self.calls[name] += 1
+
+
+def build_message(entry: dict, api: _Counter, guild) -> SimpleNamespace:
+    """以 SimpleNamespace 建立 AutoMod.on_message 需要的屬性"""
+
+    async def delete():
+        api.hit('delete')
+
+    async def timeout(*args, **kwargs):
+        api.hit('timeout')
+
+    async def send(*args, **kwargs):
+        api.hit('send')
+
+    author = SimpleNamespace(
+        id=entry['author_id'],
+        bot=False,
+        mention=f"<@{entry['author_id']}>",
+        guild_permissions=SimpleNamespace(administrator=False),
+        timeout=timeout,
+    )
+    return SimpleNamespace(
+        guild=guild,
+        channel=SimpleNamespace(id=entry['channel_id'], send=send),
+        author=author,
+        content=entry['content'],
+        mentions=[None] * entry.get('mentions', 0),
+        role_mentions=[],
+        attachments=[],
+        delete=delete,
+    )
+
+
+def configure_guild(database: JSONDatabase, cog, corpus: list):
+    """測試用伺服器設定：啟用自動管理、500 個違禁詞、1000 個封鎖網域"""
+    database.set_guild_settings(
+        GUILD_ID,
+        automod_enabled=True,
+        banned_words=[f"badword{i}" for i in range(500)],
+        link_mode='blocklist',
+        blocked_domains=[f"*.blocked{i}.example" for i in range(1000)],
+    )
+    # 短網址預先放入快取，避免測試時發出網路請求
+    for entry in corpus:
+        for url in cog.link_pattern.findall(entry['content']):
+            if 'bit.ly' in url:
+                cog.shorteners.put(url, "https://github.com/")
+
+
+class SimulatedClock:
+    """模擬訊息到達時間，讓滑動視窗依設定的速率運作（而不是測試本身的執行速度）"""
+
+    def __init__(self, rate: float):
+        self.step = 1 / rate if rate > 0 else 0.0
+        self.now = 1_000_000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self):
+        self.now += self.step
+
+
+def instrument_rules(cog) -> dict:
+    """包裝每個規則的 check，累計耗時與觸發次數"""
+    costs = defaultdict(lambda: {'calls': 0, 'seconds': 0.0, 'verdicts': 0})
+    original = cog.compile_pipeline
+
+    def compile_pipeline(settings):
+        pipeline = original(settings)
+        for rule in pipeline.rules:
+            check = rule.check
+            stats = costs[rule.name]
+
+            def timed(payload, scan, check=check, stats=stats):
+                start = time.perf_counter()
+                verdict = check(payload, scan)
+                stats['seconds'] += time.perf_counter() - start
+                stats['calls'] += 1
+                if verdict is not None:
+                    stats['verdicts'] += 1
+                return verdict
+
+            rule.check = timed
+        return pipeline
+
+    cog.compile_pipeline = compile_pipeline
+    return costs
+
+
+async def replay(corpus: list, workers: int, rate: float, measure_allocations: bool) -> dict:
+    """重播語料並回傳測量結果"""
+    clock = SimulatedClock(rate)
+    real_time = tracking.time
+    tracking.time = clock
+    try:
+        return await _replay(corpus, workers, clock, measure_allocations)
+    finally:
+        tracking.time = real_time
+
+
+async def _replay(corpus: list, workers: int, clock: SimulatedClock, measure_allocations: bool) -> dict:
+    with tempfile.TemporaryDirectory() as data_dir:
+        database = JSONDatabase(data_dir=data_dir)
+        automod.db = database
+
+        bot = SimpleNamespace(wait_until_ready=asyncio.sleep, get_cog=lambda name: None)
+        cog = automod.AutoMod(bot)
+        cog.sweep_trackers.cancel()
+        cog.analysis_pool.workers = workers
+        await cog.cog_load()
+        if workers:
+            await asyncio.sleep(1)  # 等待工作行程啟動
+
+        configure_guild(database, cog, corpus)
+        costs = instrument_rules(cog)
+        api = _Counter()
+        guild = SimpleNamespace(id=GUILD_ID)
+        messages = [build_message(entry, api, guild) for entry in corpus]
+
+        if measure_allocations:
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+
+        start = time.perf_counter()
+        for message in messages:
+            clock.advance()
+            await cog.on_message(message)
+        elapsed = time.perf_counter() - start
+
+        allocations = None
+        if measure_allocations:
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            diff = after.compare_to(before, 'filename')
+            allocations = {
+                'net_bytes': sum(stat.size_diff for stat in diff),
+                'net_blocks': sum(stat.count_diff for stat in diff),
+                'peak_bytes': peak,
+                'top': [
+                    {'file': str(stat.traceback[0].filename), 'bytes': stat.size_diff}
+                    for stat in sorted(diff, key=lambda s: s.size_diff, reverse=True)[:5]
+                ],
+            }
+
+        trackers = {
+            'spam': cog.spam_tracker.stats(),
+            'duplicate': cog.recent_messages.stats(),
+            'near_duplicate': cog.near_duplicates.stats(),
+        }
+        pool = cog.analysis_pool.stats()
+        await cog.cog_unload()
+
+    return {
+        'messages': len(corpus),
+        'seconds': elapsed,
+        'messages_per_second': len(corpus) / elapsed if elapsed else 0.0,
+        'rules': {
+            name: {
+                **stats,
+                'us_per_call': stats['seconds'] / stats['calls'] * 1e6 if stats['calls'] else 0.0,
+            }
+            for name, stats in costs.items()
+        },
+        'api_calls': dict(api.calls),
+        'trackers': trackers,
+        'analysis_pool': pool,
+        'allocations': allocations,
+    }
+
+
+def print_report(result: dict):
+    """以表格輸出結果"""
+    print(f"訊息數: {result['messages']:,}")
+    print(f"耗時: {result['seconds']:.3f}s  ({result['messages_per_second']:,.0f} 則/秒)")
+    print()
+    print(f"{'規則':<16}{'呼叫':>10}{'觸發':>10}{'總耗時(ms)':>14}{'µs/次':>10}")
+    for name, stats in sorted(result['rules'].items(), key=lambda item: -item[1]['seconds']):
+        print(
+            f"{name:<16}{stats['calls']:>10,}{stats['verdicts']:>10,}"
+            f"{stats['seconds'] * 1000:>14.1f}{stats['us_per_call']:>10.1f}"
+        )
+    print()
+    print("API 呼叫:", ", ".join(f"{k}={v:,}" for k, v in sorted(result['api_calls'].items())) or "無")
+    print("分析工作行程:", ", ".join(f"{k}={v:,}" for k, v in result['analysis_pool'].items()))
+    for name, stats in result['trackers'].items():
+        print(f"追蹤 {name}: {stats['keys']:,} 鍵值, {stats['entries']:,} 項目, ~{stats['approx_bytes'] / 1024:.1f} KB")
+    if result['allocations']:
+        alloc = result['allocations']
+        print()
+        print(f"記憶體: 淨增加 {alloc['net_bytes'] / 1024:.1f} KB ({alloc['net_blocks']:,} 區塊), 峰值 {alloc['peak_bytes'] / 1024:.1f} KB")
+        for item in alloc['top']:
+            print(f"  {item['bytes'] / 1024:>8.1f} KB  {item['file']}")
+
+
+# ===== 跨行程簽章檢查 =====
+_SIGNATURE_SCRIPT = (
+    "import json, sys\n"
+    "sys.path.insert(0, sys.argv[1])\n"
+    "from utils.text_match import minhash_signature, normalize_text\n"
+    "texts = json.load(sys.stdin)\n"
+    "print(json.dumps([minhash_signature(normalize_text(text)) for text in texts]))\n"
+)
+
+
+def check_signatures(corpus: list, seeds=(1, 2)) -> bool:
+    """
+    在不同 PYTHONHASHSEED 的行程中計算長訊息的 MinHash 簽章，確認結果一致
+    （長訊息會交給工作行程分析，簽章必須能跨行程比較，相同的洗版訊息才會被偵測）
+    """
+    texts = sorted({entry['content'] for entry in corpus if len(entry['content']) >= 200})[:200]
+    # 不同字元組很多的長文字（例如複製貼上的長篇洗版）最容易受到集合順序影響
+    rng = random.Random(0)
+    texts.append("".join(rng.choice(string.ascii_lowercase + "   ") for _ in range(1400)))
+    root = str(Path(__file__).resolve().parent.parent)
+    results = []
+    for seed in seeds:
+        output = subprocess.run(
+            [sys.executable, "-c", _SIGNATURE_SCRIPT, root],
+            input=json.dumps(texts), capture_output=True, text=True, check=True,
+            env={**os.environ, "PYTHONHASHSEED": str(seed)}
+        )
+        results.append(json.loads(output.stdout))
+    mismatched = sum(1 for a, b in zip(*results) if a != b)
+    print(f"跨行程簽章檢查: {len(texts)} 則長訊息, {mismatched} 則不一致 (PYTHONHASHSEED={', '.join(map(str, seeds))})")
+    return mismatched == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自動管理重播效能測試")
+    parser.add_argument("--corpus", help="JSONL 語料檔（預設使用合成語料）")
+    parser.add_argument("--messages", type=int, default=20000, help="合成語料訊息數")
+    parser.add_argument("--seed", type=int, default=1, help="合成語料亂數種子")
+    parser.add_argument("--rate", type=float, default=50, help="模擬的訊息到達速率（則/秒，影響洗版等時間視窗規則）")
+    parser.add_argument("--workers", type=int, default=0, help="分析工作行程數量（0 為全部在事件循環中檢查）")
+    parser.add_argument("--no-alloc", action="store_true", help="不測量記憶體配置（tracemalloc 會拖慢速度）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 輸出")
+    parser.add_argument("--check-signatures", action="store_true", help="只檢查 MinHash 簽章在不同行程間是否一致")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.messages, args.seed)
+    if args.check_signatures:
+        sys.exit(0 if check_signatures(corpus) else 1)
+
+    # 吞吐量與規則耗時在未開啟 tracemalloc 的情況下測量
+    result = asyncio.run(replay(corpus, args.workers, args.rate, measure_allocations=False))
+    if not args.no_alloc:
+        result['allocations'] = asyncio.run(replay(corpus, args.workers, args.rate, measure_allocations=True))['allocations']
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+防突襲模組 - 偵測短時間內大量成員加入
+包括: 加入速率/新帳號統計、封鎖模式（提高驗證等級）、突襲期間合併歡迎訊息
+"""
+import discord
+from discord.ext import commands, tasks
+from discord import app_commands
+from typing import Optional, Dict
+from datetime import datetime, timezone
+import logging
+import time
+
+from utils.database import db
+from utils.helpers import create_embed
+from utils.tracking import JoinRateTracker
+from config import (
+    Colors, Emojis, TRACKER_MAX_ENTRIES,
+    RAID_BUCKET_SECONDS, RAID_BUCKET_COUNT, RAID_JOIN_THRESHOLD, RAID_YOUNG_ACCOUNT_THRESHOLD,
+    RAID_YOUNG_ACCOUNT_DAYS, RAID_COOLDOWN_MINUTES
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AntiRaid(commands.Cog):
+    """防突襲系統"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.join_rates = JoinRateTracker(
+            bucket_seconds=RAID_BUCKET_SECONDS,
+            bucket_count=RAID_BUCKET_COUNT,
+            young_account_seconds=RAID_YOUNG_ACCOUNT_DAYS * 86400,
+            max_keys=TRACKER_MAX_ENTRIES
+        )
+        self.raids: Dict[int, Dict] = {}  # 伺服器 ID -> {'started': 開始時間, 'last_trip': 最後超過門檻時間, 'joins': 加入人數}
+        self.raid_monitor.start()
+
+    def cog_unload(self):
+        self.raid_monitor.cancel()
+
+    def get_thresholds(self, settings: dict) -> Dict:
+        """獲取伺服器的突襲門檻"""
+        return {
+            'joins': settings.get('raid_join_threshold', RAID_JOIN_THRESHOLD),
+            'young': settings.get('raid_young_threshold', RAID_YOUNG_ACCOUNT_THRESHOLD),
+        }
+
+    def is_raid_active(self, guild_id: int) -> bool:
+        """伺服器是否處於突襲模式（其他模組據此切換為批次處理）"""
+        return guild_id in self.raids
+
+    # ==================== 加入統計 ====================
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        """記錄加入並檢查是否觸發突襲模式"""
+        guild = member.guild
+        account_age = (datetime.now(timezone.utc) - member.created_at).total_seconds()
+        joins, young = self.join_rates.record(guild.id, account_age)
+
+        settings = db.get_guild_settings(guild.id)
+        thresholds = self.get_thresholds(settings)
+        tripped = joins >= thresholds['joins'] or young >= thresholds['young']
+
+        raid = self.raids.get(guild.id)
+        if raid is not None:
+            raid['joins'] += 1
+            if tripped:
+                raid['last_trip'] = time.monotonic()
+        elif tripped:
+            await self.start_raid(guild, settings, joins, young)
+
+    async def start_raid(self, guild: discord.Guild, settings: dict, joins: int, young: int):
+        """進入突襲模式"""
+        now = time.monotonic()
+        self.raids[guild.id] = {'started': now, 'last_trip': now, 'joins': joins}
+        logger.warning(f"{guild.name} 偵測到突襲: {self.join_rates.window_seconds:.0f} 秒內 {joins} 人加入 ({young} 個新帳號)")
+
+        locked = False
+        if settings.get('antiraid_lockdown', False):
+            locked = await self.apply_lockdown(guild, settings)
+
+        await self.notify(
+            guild,
+            create_embed(
+                title=f"{Emojis.WARNING} 偵測到突襲",
+                description=(
+                    f"{self.join_rates.window_seconds:.0f} 秒內有 **{joins}** 位成員加入（**{young}** 個新帳號）\n"
+                    f"歡迎訊息與自動角色已改為批次處理"
+                    + ("\n伺服器驗證等級已暫時提高" if locked else "")
+                ),
+                color=Colors.ERROR
+            )
+        )
+
+    async def end_raid(self, guild: discord.Guild):
+        """解除突襲模式"""
+        raid = self.raids.pop(guild.id, None)
+        if raid is None:
+            return
+        settings = db.get_guild_settings(guild.id)
+        await self.lift_lockdown(guild, settings)
+
+        minutes = (time.monotonic() - raid['started']) / 60
+        logger.info(f"{guild.name} 突襲模式已解除 (持續 {minutes:.1f} 分鐘, {raid['joins']} 人加入)")
+        await self.notify(
+            guild,
+            create_embed(
+                title=f"{Emojis.SUCCESS} 突襲模式已解除",
+                description=f"持續 **{minutes:.1f}** 分鐘，期間共 **{raid['joins']}** 位成員加入",
+                color=Colors.SUCCESS
+            )
+        )
+
+    # ==================== 封鎖模式 ====================
+    async def apply_lockdown(self, guild: discord.Guild, settings: dict) -> bool:
+        """提高伺服器驗證等級（原本的等級記錄在設定中，重新啟動後仍可還原）"""
+        if guild.verification_level >= discord.VerificationLevel.high:
+            return False
+        previous = guild.verification_level.value
+        try:
+            await guild.edit(verification_level=discord.VerificationLevel.high, reason="防突襲：封鎖模式")
+        except Exception as e:
+            logger.error(f"{guild.name} 套用封鎖模式失敗: {e}")
+            return False
+        # 修改成功後才記錄，失敗時不會在之後「還原」一個從未變更的等級
+        if settings.get('raid_previous_verification') is None:
+            db.set_guild_settings(guild.id, raid_previous_verification=previous)
+        return True
+
+    async def lift_lockdown(self, guild: discord.Guild, settings: dict):
+        """還原伺服器驗證等級"""
+        previous = settings.get('raid_previous_verification')
+        if previous is None:
+            return
+        try:
+            await guild.edit(verification_level=discord.VerificationLevel(previous), reason="防突襲：解除封鎖模式")
+            db.set_guild_settings(guild.id, raid_previous_verification=None)
+        except Exception as e:
+            logger.error(f"{guild.name} 解除封鎖模式失敗: {e}")
+
+    async def notify(self, guild: discord.Guild, embed: discord.Embed):
+        """發送通知到日誌頻道（有載入日誌模組時經由其發送佇列）"""
+        logging_cog = self.bot.get_cog('Logging')
+        if logging_cog is not None:
+            logging_cog.send_log(guild.id, embed)
+            return
+        channel_id = db.get_guild_settings(guild.id).get('log_channel_id')
+        channel = guild.get_channel(channel_id) if channel_id else None
+        if channel:
+            try:
+                await channel.send(embed=embed)
+            except:
+                pass
+
+    # ==================== 自動解除 ====================
+    @tasks.loop(seconds=30)
+    async def raid_monitor(self):
+        """加入速率恢復正常一段時間後解除突襲模式"""
+        self.join_rates.sweep()
+        cutoff = time.monotonic() - RAID_COOLDOWN_MINUTES * 60
+        for guild_id, raid in list(self.raids.items()):
+            if raid['last_trip'] > cutoff:
+                continue
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                self.raids.pop(guild_id, None)
+                continue
+            await self.end_raid(guild)
+
+    @raid_monitor.before_loop
+    async def before_raid_monitor(self):
+        await self.bot.wait_until_ready()
+        # 上次執行時仍在封鎖模式（例如機器人重新啟動），還原驗證等級
+        for guild in self.bot.guilds:
+            settings = db.get_guild_settings(guild.id)
+            if settings.get('raid_previous_verification') is not None:
+                await self.lift_lockdown(guild, settings)
+
+    # ==================== 防突襲設定 ====================
+    @commands.hybrid_command(name="antiraid", description="查看或設定防突襲")
+    @commands.has_permissions(administrator=True)
+    @app_commands.describe(
+        lockdown="突襲時是否暫時提高伺服器驗證等級",
+        joins=f"{RAID_BUCKET_SECONDS * RAID_BUCKET_COUNT} 秒內加入人數門檻",
+        young=f"{RAID_BUCKET_SECONDS * RAID_BUCKET_COUNT} 秒內新帳號數量門檻"
+    )
+    async def antiraid(
+        self,
+        ctx: commands.Context,
+        lockdown: Optional[bool] = None,
+        joins: Optional[int] = None,
+        young: Optional[int] = None
+    ):
+        """查看或設定防突襲"""
+        if any(value is not None and value < 2 for value in (joins, young)):
+            return await ctx.send(
+                embed=create_embed(
+                    title=f"{Emojis.ERROR} 錯誤",
+                    description="門檻不能小於 2",
+                    color=Colors.ERROR
+                )
+            )
+
+        updates = {}
+        if lockdown is not None:
+            updates['antiraid_lockdown'] = lockdown
+        if joins is not None:
+            updates['raid_join_threshold'] = joins
+        if young is not None:
+            updates['raid_young_threshold'] = young
+
+        if updates:
+            db.set_guild_settings(ctx.guild.id, **updates)
+            logger.info(f"{ctx.author} 更新了防突襲設定: {updates}")
+
+        settings = db.get_guild_settings(ctx.guild.id)
+        thresholds = self.get_thresholds(settings)
+        current_joins, current_young = self.join_rates.rate(ctx.guild.id)
+        window = f"{self.join_rates.window_seconds:.0f} 秒"
+
+        embed = create_embed(
+            title=f"{Emojis.SUCCESS} 防突襲設定已更新" if updates else "🛡️ 防突襲",
+            color=Colors.SUCCESS if updates else Colors.INFO
+        )
+        embed.add_field(name="狀態", value="⚠️ 突襲模式中" if self.is_raid_active(ctx.guild.id) else "正常", inline=True)
+        embed.add_field(name="封鎖模式", value="啟用" if settings.get('antiraid_lockdown', False) else "停用", inline=True)
+        embed.add_field(name="目前速率", value=f"{window}內 {current_joins} 人 ({current_young} 個新帳號)", inline=False)
+        embed.add_field(name="加入門檻", value=f"{window}內 {thresholds['joins']} 人", inline=True)
+        embed.add_field(name="新帳號門檻", value=f"{window}內 {thresholds['young']} 個", inline=True)
+        await ctx.send(embed=embed)
+
+    @commands.hybrid_command(name="endraid", description="手動解除突襲模式")
+    @commands.has_permissions(administrator=True)
+    async def endraid(self, ctx: commands.Context):
+        """手動解除突襲模式"""
+        if not self.is_raid_active(ctx.guild.id):
+            return await ctx.send(
+                embed=create_embed(
+                    title=f"{Emojis.ERROR} 錯誤",
+                    description="目前不在突襲模式",
+                    color=Colors.ERROR
+                )
+            )
+
+        await self.end_raid(ctx.guild)
+        await ctx.send(
+            embed=create_embed(
+                title=f"{Emojis.SUCCESS} 突襲模式已解除",
+                color=Colors.SUCCESS
+            )
+        )
+        logger.info(f"{ctx.author} 手動解除了突襲模式")
+
+
+async def setup(bot):
+    await bot.add_cog(AntiRaid(bot))
@@ -7,6 +7,7 @@ from flask import Flask, request, jsonify
 import threading
 import io
 import asyncio
+from utils.database import db
 from config import API_SERVER_HOST, API_SERVER_PORT, ALARM_CHANNEL_ID
 
 
@@ -57,6 +58,11 @@ class APIServer(commands.Cog):
                 "bot_ready": self.bot.is_ready(),
                 "bot_user": str(self.bot.user) if self.bot.user else None
             }), 200
+        
+        @self.app.route('/metrics/storage', methods=['GET'])
+        def storage_metrics():
+            """資料層效能統計"""
+            return jsonify(db.metrics.snapshot()), 200
     
     def run_server(self):
         """啟動 Flask 伺服器"""
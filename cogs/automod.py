@@ -1,36 +1,284 @@
 """
 自動管理模組 - 自動處理不當行為
-包括: 垃圾訊息檢測、連結過濾、大寫檢測等
+包括: 垃圾訊息檢測、相似訊息洗版、大量提及、表情符號/zalgo 洗版、連結過濾（網域允許/封鎖）、圖片封鎖列表、大寫檢測等
 """
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
+from typing import Optional
 import re
-from collections import defaultdict
+import asyncio
+import aiohttp
 from datetime import datetime, timedelta, timezone
 import logging
 
 from utils.database import db
 from utils.helpers import create_embed
-from config import Colors, Emojis
+from utils.tracking import RecentMessageTracker, SlidingWindowTracker, NearDuplicateIndex
+from utils.automod_rules import (
+    MessagePayload, Verdict, RulePipeline, SpamRule, DuplicateRule, CapsRule, InviteRule, BannedWordRule,
+    NearDuplicateRule, LinkRule, ImageBlocklistRule, MentionSpamRule, EmojiFloodRule, ZalgoRule
+)
+from utils.text_match import AhoCorasick
+from utils.link_filter import LinkPolicy, ShortenerCache, canonical_host, is_shortener
+from utils.automod_workers import AnalysisPool
+from utils.image_hash import PILLOW_AVAILABLE, BKTree, ImageHashCache, content_digest, perceptual_hash
+from config import (
+    Colors, Emojis,
+    SPAM_MAX_MESSAGES, SPAM_WINDOW_SECONDS, SPAM_TIMEOUT_MINUTES, TRACKER_SWEEP_SECONDS,
+    DUPLICATE_HISTORY_SIZE, DUPLICATE_THRESHOLD, TRACKER_IDLE_SECONDS, TRACKER_MAX_ENTRIES,
+    MAX_BANNED_WORDS, NEAR_DUPLICATE_THRESHOLD, NEAR_DUPLICATE_WINDOW_SECONDS, NEAR_DUPLICATE_HISTORY_SIZE,
+    NEAR_DUPLICATE_SIMILARITY, NEAR_DUPLICATE_MIN_LENGTH,
+    MAX_LINK_RULES, SHORTENER_CACHE_SIZE, SHORTENER_CACHE_TTL, SHORTENER_TIMEOUT_SECONDS,
+    AUTOMOD_WORKERS, AUTOMOD_OFFLOAD_MIN_LENGTH, AUTOMOD_DEADLINE_MS, AUTOMOD_MAX_PENDING,
+    IMAGE_HASH_DISTANCE, IMAGE_HASH_MAX_BYTES, IMAGE_HASH_MAX_ATTACHMENTS, IMAGE_HASH_CACHE_SIZE,
+    MAX_BLOCKED_IMAGES, MENTION_SPAM_THRESHOLD, MENTION_SPAM_TIMEOUT_MINUTES, EMOJI_FLOOD_THRESHOLD,
+    ZALGO_THRESHOLD
+)
 
 logger = logging.getLogger(__name__)
 
+# 可由 automodset 指令調整的設定：名稱 -> (設定鍵值, 最小值, 最大值, 說明)
+AUTOMOD_SETTINGS = {
+    'spam_messages': ('spam_max_messages', 2, 50, "視窗內訊息數達此數量視為洗版"),
+    'spam_seconds': ('spam_window_seconds', 1, 60, "洗版偵測視窗（秒）"),
+    'similar_messages': ('near_duplicate_threshold', 2, 50, "頻道內相似訊息達此數量視為洗版"),
+    'mentions': ('mention_spam_threshold', 2, 50, "單則訊息提及數達此數量視為大量提及"),
+    'emojis': ('emoji_flood_threshold', 5, 200, "單則訊息表情符號數達此數量視為洗版"),
+    'zalgo': ('zalgo_threshold', 5, 500, "單則訊息組合附加符號數達此數量視為 zalgo 文字"),
+}
+
+# 連結策略模式
+LINK_MODES = {
+    'off': "不過濾",
+    'blocklist': "封鎖列出的網域",
+    'allowlist': "只允許列出的網域",
+}
+
+# 各設定的預設值
+DEFAULT_AUTOMOD_VALUES = {
+    'spam_max_messages': SPAM_MAX_MESSAGES,
+    'spam_window_seconds': SPAM_WINDOW_SECONDS,
+    'near_duplicate_threshold': NEAR_DUPLICATE_THRESHOLD,
+    'mention_spam_threshold': MENTION_SPAM_THRESHOLD,
+    'emoji_flood_threshold': EMOJI_FLOOD_THRESHOLD,
+    'zalgo_threshold': ZALGO_THRESHOLD,
+}
+
 
 class AutoMod(commands.Cog):
     """自動管理系統"""
     
     def __init__(self, bot):
         self.bot = bot
-        self.spam_tracker = defaultdict(list)  # 追蹤垃圾訊息
-        self.link_pattern = re.compile(r'https?://\S+')
-        self.invite_pattern = re.compile(r'discord\.gg/\w+|discordapp\.com/invite/\w+')
+        self.spam_tracker = SlidingWindowTracker(  # 追蹤垃圾訊息，鍵值為 (伺服器, 用戶)
+            idle_seconds=TRACKER_IDLE_SECONDS,
+            max_keys=TRACKER_MAX_ENTRIES
+        )
+        self.recent_messages = RecentMessageTracker(  # 追蹤重複訊息（本地環形緩衝區，不呼叫 API）
+            size=DUPLICATE_HISTORY_SIZE,
+            idle_seconds=TRACKER_IDLE_SECONDS,
+            max_keys=TRACKER_MAX_ENTRIES
+        )
+        self.near_duplicates = NearDuplicateIndex(  # 每個頻道最近訊息的 MinHash 簽章（LSH 索引）
+            window_seconds=NEAR_DUPLICATE_WINDOW_SECONDS,
+            history_size=NEAR_DUPLICATE_HISTORY_SIZE,
+            min_similarity=NEAR_DUPLICATE_SIMILARITY,
+            idle_seconds=TRACKER_IDLE_SECONDS,
+            max_keys=TRACKER_MAX_ENTRIES
+        )
+        # 排除包住連結的括號、引號與 markdown 符號（例如隱藏預覽的 <https://...>、||劇透||），結尾的標點不算在網址內
+        self.link_pattern = re.compile(r'https?://[^\s<>()\[\]{}"\'`|*~]*[^\s<>()\[\]{}"\'`|*~.,;:!?]')
+        self.pipelines = {}  # 伺服器 ID -> (設定版本, 規則管線)
+        self.banned_word_automata = {}  # 伺服器 ID -> (違禁詞列表, 自動機)，列表變更時才重建
+        self.link_policies = {}  # 伺服器 ID -> (模式與網域列表, 連結策略)，列表變更時才重建
+        self.shorteners = ShortenerCache(max_entries=SHORTENER_CACHE_SIZE, ttl_seconds=SHORTENER_CACHE_TTL)
+        self.http_session = None  # 展開短網址用，第一次需要時建立
+        self.image_blocklists = {}  # 伺服器 ID -> (封鎖雜湊列表, BK 樹)，列表變更時才重建
+        self.image_hashes = ImageHashCache(max_entries=IMAGE_HASH_CACHE_SIZE)  # 檔案內容雜湊 -> 感知雜湊
+        self.analysis_pool = AnalysisPool(  # 長訊息的內容分析在獨立行程中執行
+            workers=AUTOMOD_WORKERS,
+            max_pending=AUTOMOD_MAX_PENDING,
+            deadline_ms=AUTOMOD_DEADLINE_MS
+        )
+        self.sweep_trackers.start()
+    
+    async def cog_load(self):
+        self.analysis_pool.start()
+    
+    async def cog_unload(self):
+        self.sweep_trackers.cancel()
+        self.analysis_pool.shutdown()
+        if self.http_session is not None:
+            await self.http_session.close()
+    
+    @tasks.loop(seconds=TRACKER_SWEEP_SECONDS)
+    async def sweep_trackers(self):
+        """定期淘汰閒置的追蹤資料"""
+        removed = self.spam_tracker.sweep() + self.recent_messages.sweep() + self.near_duplicates.sweep()
+        if removed:
+            logger.debug(f"自動管理: 淘汰了 {removed} 筆閒置追蹤資料")
     
     def is_automod_enabled(self, guild_id: int) -> bool:
         """檢查是否啟用自動管理"""
         settings = db.get_guild_settings(guild_id)
         return settings.get('automod_enabled', False)
     
+    def get_pipeline(self, guild_id: int, settings: dict) -> RulePipeline:
+        """取得伺服器的規則管線（設定版本變更時才重新編譯）"""
+        version = settings.get('version', 0)
+        cached = self.pipelines.get(guild_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        pipeline = self.compile_pipeline(settings)
+        self.pipelines[guild_id] = (version, pipeline)
+        return pipeline
+    
+    def compile_pipeline(self, settings: dict) -> RulePipeline:
+        """依伺服器設定編譯規則管線"""
+        rules = [
+            SpamRule(
+                self.spam_tracker,
+                max_messages=settings.get('spam_max_messages', SPAM_MAX_MESSAGES),
+                window_seconds=settings.get('spam_window_seconds', SPAM_WINDOW_SECONDS),
+                timeout_minutes=SPAM_TIMEOUT_MINUTES
+            ),
+            MentionSpamRule(
+                max_mentions=settings.get('mention_spam_threshold', MENTION_SPAM_THRESHOLD),
+                timeout_minutes=MENTION_SPAM_TIMEOUT_MINUTES
+            ),
+            DuplicateRule(self.recent_messages, threshold=DUPLICATE_THRESHOLD),
+            CapsRule(),
+            EmojiFloodRule(max_emoji=settings.get('emoji_flood_threshold', EMOJI_FLOOD_THRESHOLD)),
+            ZalgoRule(max_marks=settings.get('zalgo_threshold', ZALGO_THRESHOLD)),
+            InviteRule(),
+            NearDuplicateRule(
+                self.near_duplicates,
+                threshold=settings.get('near_duplicate_threshold', NEAR_DUPLICATE_THRESHOLD),
+                min_length=NEAR_DUPLICATE_MIN_LENGTH
+            ),
+        ]
+        
+        automaton = self.get_banned_word_automaton(settings)
+        if automaton is not None:
+            rules.append(BannedWordRule(automaton))
+        
+        policy = self.get_link_policy(settings)
+        if policy is not None:
+            rules.append(LinkRule(policy, self.link_pattern, self.shorteners))
+        
+        tree = self.get_image_blocklist(settings)
+        if tree is not None:
+            rules.append(ImageBlocklistRule(tree, max_distance=IMAGE_HASH_DISTANCE))
+        
+        return RulePipeline(rules)
+    
+    def get_banned_word_automaton(self, settings: dict):
+        """取得伺服器的違禁詞自動機（列表未變更時沿用快取）"""
+        guild_id = settings['guild_id']
+        words = tuple(settings.get('banned_words') or ())
+        if not words:
+            self.banned_word_automata.pop(guild_id, None)
+            return None
+        
+        cached = self.banned_word_automata.get(guild_id)
+        if cached is not None and cached[0] == words:
+            return cached[1]
+        
+        automaton = AhoCorasick(words)
+        self.banned_word_automata[guild_id] = (words, automaton)
+        return automaton
+    
+    def get_link_policy(self, settings: dict):
+        """取得伺服器的連結策略（模式與列表未變更時沿用快取）"""
+        guild_id = settings['guild_id']
+        mode = settings.get('link_mode', 'off')
+        if mode not in ('blocklist', 'allowlist'):
+            self.link_policies.pop(guild_id, None)
+            return None
+        
+        key = (mode, tuple(settings.get('allowed_domains') or ()), tuple(settings.get('blocked_domains') or ()))
+        cached = self.link_policies.get(guild_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        
+        policy = LinkPolicy(mode, allowed=key[1], blocked=key[2])
+        self.link_policies[guild_id] = (key, policy)
+        return policy
+    
+    def get_image_blocklist(self, settings: dict):
+        """取得伺服器的圖片封鎖列表（列表未變更時沿用快取；未安裝 Pillow 時停用）"""
+        guild_id = settings['guild_id']
+        hashes = tuple(settings.get('blocked_images') or ())
+        if not hashes or not PILLOW_AVAILABLE:
+            self.image_blocklists.pop(guild_id, None)
+            return None
+        
+        cached = self.image_blocklists.get(guild_id)
+        if cached is not None and cached[0] == hashes:
+            return cached[1]
+        
+        tree = BKTree([(int(value, 16), value) for value in hashes])
+        self.image_blocklists[guild_id] = (hashes, tree)
+        return tree
+    
+    async def hash_image(self, attachment: discord.Attachment):
+        """
+        計算圖片附件的感知雜湊（下載後在背景執行緒解碼；相同檔案內容直接使用快取）
+        
+        Returns:
+            感知雜湊，不是圖片、太大或無法解碼時為 None
+        """
+        if not (attachment.content_type or '').startswith('image/') or attachment.size > IMAGE_HASH_MAX_BYTES:
+            return None
+        try:
+            data = await attachment.read()
+        except Exception as e:
+            logger.debug(f"下載附件失敗 {attachment.filename}: {e}")
+            return None
+        
+        key = await asyncio.to_thread(content_digest, data)
+        hit, value = self.image_hashes.get(key)
+        if hit:
+            return value
+        
+        try:
+            value = await asyncio.to_thread(perceptual_hash, data)
+        except Exception as e:
+            logger.debug(f"無法解碼圖片 {attachment.filename}: {e}")
+            value = None
+        self.image_hashes.put(key, value)
+        return value
+    
+    async def hash_attachments(self, message: discord.Message) -> tuple:
+        """計算訊息中圖片附件的感知雜湊"""
+        attachments = message.attachments[:IMAGE_HASH_MAX_ATTACHMENTS]
+        values = await asyncio.gather(*(self.hash_image(attachment) for attachment in attachments))
+        return tuple(value for value in values if value is not None)
+    
+    async def expand_shorteners(self, content: str):
+        """展開訊息中尚未快取的短網址，讓連結規則能判斷真正的目的地"""
+        urls = [
+            url for url in self.link_pattern.findall(content)
+            if url not in self.shorteners and is_shortener(canonical_host(url) or '')
+        ]
+        if not urls:
+            return
+        
+        if self.http_session is None or self.http_session.closed:
+            self.http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=SHORTENER_TIMEOUT_SECONDS))
+        
+        async def expand(url: str):
+            try:
+                async with self.http_session.head(url, allow_redirects=True) as response:
+                    self.shorteners.put(url, str(response.url))
+            except Exception as e:
+                logger.debug(f"展開短網址失敗 {url}: {e}")
+                self.shorteners.put(url, None)
+        
+        await asyncio.gather(*(expand(url) for url in urls[:5]))
+    
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         """訊息監控"""
@@ -42,119 +290,65 @@ class AutoMod(commands.Cog):
             return
         
         # 檢查是否啟用自動管理
-        if not self.is_automod_enabled(message.guild.id):
+        settings = db.get_guild_settings(message.guild.id)
+        if not settings.get('automod_enabled', False):
             return
         
-        # 垃圾訊息檢測
-        await self.check_spam(message)
+        # 短網址需先展開（結果會快取），管線本身只讀取快取
+        if settings.get('link_mode', 'off') != 'off' and '://' in message.content:
+            await self.expand_shorteners(message.content)
         
-        # Discord 邀請連結檢測
-        await self.check_invite_links(message)
+        pipeline = self.get_pipeline(message.guild.id, settings)
+        analysis, cheap_only = await self.analyze_offloaded(message.guild.id, message.content)
         
-        # 大量大寫檢測
-        await self.check_caps(message)
+        payload = MessagePayload.from_message(message)
+        if message.attachments and message.guild.id in self.image_blocklists:
+            payload.image_hashes = await self.hash_attachments(message)
         
-        # 重複訊息檢測
-        await self.check_duplicate(message)
+        # 所有規則在同一個管線中檢查，每則訊息最多執行一個處置
+        verdict = pipeline.evaluate(payload, analysis, cheap_only)
+        if verdict is not None:
+            await self.apply_verdict(message, verdict)
     
-    async def check_spam(self, message: discord.Message):
-        """檢測垃圾訊息（短時間內大量訊息）"""
-        user_id = message.author.id
-        now = datetime.now()
+    async def analyze_offloaded(self, guild_id: int, content: str):
+        """
+        長訊息交給工作行程分析
         
-        # 初始化用戶記錄
-        self.spam_tracker[user_id] = [
-            msg_time for msg_time in self.spam_tracker[user_id]
-            if (now - msg_time).total_seconds() < 5
-        ]
+        Returns:
+            (分析結果, 是否只執行便宜的規則)；短訊息或停用時為 (None, False)，在事件循環中完整檢查
+        """
+        if not self.analysis_pool.enabled or len(content) < AUTOMOD_OFFLOAD_MIN_LENGTH:
+            return None, False
         
-        # 添加當前訊息時間
-        self.spam_tracker[user_id].append(now)
+        # 與管線使用同一份違禁詞列表（get_pipeline 已更新快取）
+        cached = self.banned_word_automata.get(guild_id)
+        terms = cached[0] if cached is not None else None
+        terms_key = (guild_id, hash(terms)) if terms else None
         
-        # 如果 5 秒內超過 5 則訊息
-        if len(self.spam_tracker[user_id]) >= 5:
-            try:
-                await message.author.timeout(
-                    timedelta(minutes=5),
-                    reason="自動管理：垃圾訊息"
-                )
-                await message.channel.send(
-                    embed=create_embed(
-                        title=f"{Emojis.WARNING} 自動管理",
-                        description=f"{message.author.mention} 因發送垃圾訊息被靜音 5 分鐘",
-                        color=Colors.WARNING
-                    ),
-                    delete_after=10
-                )
-                logger.info(f"自動管理: {message.author} 因垃圾訊息被靜音")
-                self.spam_tracker[user_id].clear()
-            except:
-                pass
-    
-    async def check_invite_links(self, message: discord.Message):
-        """檢測 Discord 邀請連結"""
-        if self.invite_pattern.search(message.content):
-            try:
-                await message.delete()
-                await message.channel.send(
-                    embed=create_embed(
-                        title=f"{Emojis.WARNING} 自動管理",
-                        description=f"{message.author.mention} 不允許發送 Discord 邀請連結",
-                        color=Colors.WARNING
-                    ),
-                    delete_after=5
-                )
-                logger.info(f"自動管理: 刪除了 {message.author} 的邀請連結")
-            except:
-                pass
+        analysis = await self.analysis_pool.analyze(content, terms_key, terms)
+        return analysis, analysis is None
     
-    async def check_caps(self, message: discord.Message):
-        """檢測大量大寫"""
-        if len(message.content) < 10:
-            return
-        
-        caps_count = sum(1 for c in message.content if c.isupper())
-        caps_percentage = caps_count / len(message.content)
-        
-        # 如果超過 70% 是大寫
-        if caps_percentage > 0.7:
-            try:
+    async def apply_verdict(self, message: discord.Message, verdict: Verdict):
+        """執行規則判定的處置"""
+        try:
+            if verdict.delete:
                 await message.delete()
-                await message.channel.send(
-                    embed=create_embed(
-                        title=f"{Emojis.WARNING} 自動管理",
-                        description=f"{message.author.mention} 請不要使用過多大寫字母",
-                        color=Colors.WARNING
-                    ),
-                    delete_after=5
-                )
-                logger.info(f"自動管理: 刪除了 {message.author} 的大寫訊息")
-            except:
-                pass
-    
-    async def check_duplicate(self, message: discord.Message):
-        """檢測重複訊息"""
-        # 獲取最近的訊息
-        recent_messages = []
-        async for msg in message.channel.history(limit=5, before=message):
-            if msg.author == message.author:
-                recent_messages.append(msg.content)
-        
-        # 如果有 3 則相同訊息
-        if recent_messages.count(message.content) >= 2:
-            try:
-                await message.delete()
-                await message.channel.send(
-                    embed=create_embed(
-                        title=f"{Emojis.WARNING} 自動管理",
-                        description=f"{message.author.mention} 請不要重複發送相同訊息",
-                        color=Colors.WARNING
-                    ),
-                    delete_after=5
+            if verdict.timeout_minutes:
+                await message.author.timeout(
+                    timedelta(minutes=verdict.timeout_minutes),
+                    reason=f"自動管理：{verdict.rule}"
                 )
-                logger.info(f"自動管理: 刪除了 {message.author} 的重複訊息")
-            except:
-                pass
+            await message.channel.send(
+                embed=create_embed(
+                    title=f"{Emojis.WARNING} 自動管理",
+                    description=verdict.notice.format(mention=message.author.mention),
+                    color=Colors.WARNING
+                ),
+                delete_after=verdict.notice_ttl
+            )
+            logger.info(f"自動管理: {verdict.log.format(author=message.author)}")
+        except:
+            pass
     
     # ==================== 啟用自動管理 ====================
     @commands.hybrid_command(name="automod", description="啟用/停用自動管理")
@@ -167,12 +361,296 @@ class AutoMod(commands.Cog):
         status = "啟用" if enabled else "停用"
         embed = create_embed(
             title=f"{Emojis.SUCCESS} 自動管理已{status}",
-            description=f"自動管理系統已{status}\n\n功能包括:\n• 垃圾訊息檢測\n• Discord 邀請連結過濾\n• 大量大寫檢測\n• 重複訊息檢測",
+            description=f"自動管理系統已{status}\n\n功能包括:\n• 垃圾訊息檢測\n• Discord 邀請連結過濾\n• 大量大寫檢測\n• 重複訊息檢測\n• 相似訊息洗版檢測",
             color=Colors.SUCCESS if enabled else Colors.WARNING
         )
         await ctx.send(embed=embed)
         logger.info(f"{ctx.author} {status}了自動管理")
 
+    
+    # ==================== 自動管理設定 ====================
+    @commands.hybrid_command(name="automodset", description="調整自動管理門檻")
+    @commands.has_permissions(administrator=True)
+    @app_commands.describe(setting="設定名稱", value="數值")
+    async def automodset(self, ctx: commands.Context, setting: str = None, value: int = None):
+        """調整自動管理門檻（不帶參數時列出目前設定）"""
+        settings = db.get_guild_settings(ctx.guild.id)
+        
+        if setting is None or value is None or setting not in AUTOMOD_SETTINGS:
+            embed = create_embed(
+                title="⚙️ 自動管理設定",
+                description="使用 `automodset <名稱> <數值>` 調整",
+                color=Colors.INFO
+            )
+            for name, (key, minimum, maximum, label) in AUTOMOD_SETTINGS.items():
+                current = settings.get(key, DEFAULT_AUTOMOD_VALUES[key])
+                embed.add_field(name=f"`{name}` = {current}", value=f"{label} ({minimum}-{maximum})", inline=False)
+            return await ctx.send(embed=embed)
+        
+        key, minimum, maximum, label = AUTOMOD_SETTINGS[setting]
+        if not minimum <= value <= maximum:
+            return await ctx.send(
+                embed=create_embed(
+                    title=f"{Emojis.ERROR} 錯誤",
+                    description=f"`{setting}` 必須介於 {minimum}-{maximum}",
+                    color=Colors.ERROR
+                )
+            )
+        
+        db.set_guild_settings(ctx.guild.id, **{key: value})
+        await ctx.send(
+            embed=create_embed(
+                title=f"{Emojis.SUCCESS} 自動管理設定已更新",
+                description=f"{label}: **{value}**",
+                color=Colors.SUCCESS
+            )
+        )
+        logger.info(f"{ctx.author} 將自動管理設定 {setting} 設為 {value}")
+    
+    # ==================== 違禁詞 ====================
+    @commands.hybrid_command(name="bannedwords", description="管理違禁詞列表")
+    @commands.has_permissions(administrator=True)
+    @app_commands.describe(action="add / remove / list / clear", words="詞彙（以逗號分隔）")
+    async def bannedwords(self, ctx: commands.Context, action: str = "list", *, words: str = None):
+        """管理違禁詞列表"""
+        action = action.lower()
+        current = list(db.get_guild_settings(ctx.guild.id).get('banned_words') or [])
+        terms = [w.strip() for w in (words or "").split(",") if w.strip()]
+        
+        if action in ("add", "remove") and not terms:
+            return await ctx.send(
+                embed=create_embed(
+                    title=f"{Emojis.ERROR} 錯誤",
+                    description="請提供詞彙，多個詞彙以逗號分隔",
+                    color=Colors.ERROR
+                )
+            )
+        
+        if action == "add":
+            existing = set(current)
+            current.extend(t for t in dict.fromkeys(terms) if t not in existing)
+            if len(current) > MAX_BANNED_WORDS:
+                return await ctx.send(
+                    embed=create_embed(
+                        title=f"{Emojis.ERROR} 錯誤",
+                        description=f"違禁詞最多 {MAX_BANNED_WORDS} 個",
+                        color=Colors.ERROR
+                    )
+                )
+        elif action == "remove":
+            removing = set(terms)
+            current = [w for w in current if w not in removing]
+        elif action == "clear":
+            current = []
+        else:
+            preview = ", ".join(f"`{w}`" for w in current[:50]) or "*無*"
+            if len(current) > 50:
+                preview += f" ...等 {len(current)} 個"
+            return await ctx.send(
+                embed=create_embed(
+                    title="🚫 違禁詞列表",
+                    description=preview[:4000],
+                    color=Colors.INFO
+                )
+            )
+        
+        db.set_guild_settings(ctx.guild.id, banned_words=current)
+        await ctx.send(
+            embed=create_embed(
+                title=f"{Emojis.SUCCESS} 違禁詞列表已更新",
+                description=f"目前共有 **{len(current)}** 個違禁詞",
+                color=Colors.SUCCESS
+            )
+        )
+        logger.info(f"{ctx.author} {action} 違禁詞: {len(terms)} 個")
+    
+    # ==================== 連結策略 ====================
+    @commands.hybrid_command(name="linkfilter", description="設定連結過濾的網域列表")
+    @commands.has_permissions(administrator=True)
+    @app_commands.describe(
+        action="off / blocklist / allowlist / block / allow / remove / list",
+        domains="網域（以逗號分隔，*.example.com 包含所有子網域）"
+    )
+    async def linkfilter(self, ctx: commands.Context, action: str = "list", *, domains: str = None):
+        """設定連結過濾的模式與網域列表"""
+        action = action.lower()
+        settings = db.get_guild_settings(ctx.guild.id)
+        allowed = list(settings.get('allowed_domains') or [])
+        blocked = list(settings.get('blocked_domains') or [])
+        entries = [d.strip().lower() for d in (domains or "").split(",") if d.strip()]
+        
+        if action in LINK_MODES:
+            db.set_guild_settings(ctx.guild.id, link_mode=action)
+            logger.info(f"{ctx.author} 將連結過濾模式設為 {action}")
+            return await ctx.send(
+                embed=create_embed(
+                    title=f"{Emojis.SUCCESS} 連結過濾模式已更新",
+                    description=LINK_MODES[action],
+                    color=Colors.SUCCESS
+                )
+            )
+        
+        if action in ("block", "allow", "remove"):
+            if not entries:
+                return await ctx.send(
+                    embed=create_embed(
+                        title=f"{Emojis.ERROR} 錯誤",
+                        description="請提供網域，多個網域以逗號分隔",
+                        color=Colors.ERROR
+                    )
+                )
+            
+            if action == "remove":
+                allowed = [d for d in allowed if d not in entries]
+                blocked = [d for d in blocked if d not in entries]
+            else:
+                target = blocked if action == "block" else allowed
+                target.extend(d for d in dict.fromkeys(entries) if d not in target)
+                if len(allowed) + len(blocked) > MAX_LINK_RULES:
+                    return await ctx.send(
+                        embed=create_embed(
+                            title=f"{Emojis.ERROR} 錯誤",
+                            description=f"網域規則最多 {MAX_LINK_RULES} 個",
+                            color=Colors.ERROR
+                        )
+                    )
+            
+            db.set_guild_settings(ctx.guild.id, allowed_domains=allowed, blocked_domains=blocked)
+            logger.info(f"{ctx.author} {action} 網域: {', '.join(entries)}")
+        
+        mode = settings.get('link_mode', 'off')
+        embed = create_embed(
+            title="🔗 連結過濾",
+            description=f"模式: **{mode}** ({LINK_MODES.get(mode, mode)})",
+            color=Colors.INFO
+        )
+        for name, items in (("允許", allowed), ("封鎖", blocked)):
+            preview = ", ".join(f"`{d}`" for d in items[:30]) or "*無*"
+            if len(items) > 30:
+                preview += f" ...等 {len(items)} 個"
+            embed.add_field(name=name, value=preview[:1024], inline=False)
+        await ctx.send(embed=embed)
+    
+    # ==================== 圖片封鎖列表 ====================
+    @commands.hybrid_command(name="imageblock", description="管理圖片封鎖列表")
+    @commands.has_permissions(administrator=True)
+    @app_commands.describe(
+        action="add / remove / list / clear",
+        image="要封鎖的圖片（add 時使用，也可以回覆含圖片的訊息）",
+        value="要移除的圖片雜湊（remove 時使用）"
+    )
+    async def imageblock(
+        self,
+        ctx: commands.Context,
+        action: str = "list",
+        image: Optional[discord.Attachment] = None,
+        value: Optional[str] = None
+    ):
+        """管理圖片封鎖列表"""
+        if not PILLOW_AVAILABLE:
+            return await ctx.send(
+                embed=create_embed(
+                    title=f"{Emojis.ERROR} 錯誤",
+                    description="圖片比對需要安裝 Pillow (`pip install Pillow`)",
+                    color=Colors.ERROR
+                )
+            )
+        
+        action = action.lower()
+        blocked = list(db.get_guild_settings(ctx.guild.id).get('blocked_images') or [])
+        
+        if action == "add":
+            attachments = [image] if image else []
+            reference = ctx.message.reference.resolved if ctx.message and ctx.message.reference else None
+            if not attachments and isinstance(reference, discord.Message):
+                attachments = reference.attachments
+            
+            added = []
+            for attachment in attachments[:IMAGE_HASH_MAX_ATTACHMENTS]:
+                hashed = await self.hash_image(attachment)
+                if hashed is not None:
+                    added.append(f"{hashed:016x}")
+            if not added:
+                return await ctx.send(
+                    embed=create_embed(
+                        title=f"{Emojis.ERROR} 錯誤",
+                        description="請附加圖片，或回覆含有圖片的訊息",
+                        color=Colors.ERROR
+                    )
+                )
+            
+            blocked.extend(h for h in dict.fromkeys(added) if h not in blocked)
+            if len(blocked) > MAX_BLOCKED_IMAGES:
+                return await ctx.send(
+                    embed=create_embed(
+                        title=f"{Emojis.ERROR} 錯誤",
+                        description=f"封鎖圖片最多 {MAX_BLOCKED_IMAGES} 張",
+                        color=Colors.ERROR
+                    )
+                )
+            description = "已加入: " + ", ".join(f"`{h}`" for h in added)
+        elif action == "remove":
+            value = (value or "").strip().lower()
+            if value not in blocked:
+                return await ctx.send(
+                    embed=create_embed(
+                        title=f"{Emojis.ERROR} 錯誤",
+                        description="找不到此圖片雜湊，使用 `imageblock list` 查看",
+                        color=Colors.ERROR
+                    )
+                )
+            blocked.remove(value)
+            description = f"已移除: `{value}`"
+        elif action == "clear":
+            blocked = []
+            description = "已清空圖片封鎖列表"
+        else:
+            preview = "\n".join(f"`{h}`" for h in blocked[:30]) or "*無*"
+            if len(blocked) > 30:
+                preview += f"\n...等 {len(blocked)} 張"
+            return await ctx.send(
+                embed=create_embed(
+                    title="🖼️ 圖片封鎖列表",
+                    description=preview,
+                    color=Colors.INFO
+                )
+            )
+        
+        db.set_guild_settings(ctx.guild.id, blocked_images=blocked)
+        await ctx.send(
+            embed=create_embed(
+                title=f"{Emojis.SUCCESS} 圖片封鎖列表已更新",
+                description=f"{description}\n目前共有 **{len(blocked)}** 張",
+                color=Colors.SUCCESS
+            )
+        )
+        logger.info(f"{ctx.author} {action} 封鎖圖片")
+    
+    @commands.command(name="automodstats", hidden=True)
+    @commands.is_owner()
+    async def automodstats(self, ctx: commands.Context):
+        """查看自動管理追蹤資料的記憶體用量"""
+        embed = create_embed(title="📊 自動管理追蹤資料", color=Colors.INFO)
+        trackers = (("洗版視窗", self.spam_tracker), ("重複訊息", self.recent_messages), ("相似訊息", self.near_duplicates))
+        for name, tracker in trackers:
+            stats = tracker.stats()
+            embed.add_field(
+                name=name,
+                value=f"鍵值: {stats['keys']:,}\n項目: {stats['entries']:,}\n記憶體: ~{stats['approx_bytes'] / 1024:.1f} KB",
+                inline=True
+            )
+        
+        pool = self.analysis_pool.stats()
+        embed.add_field(
+            name="分析工作行程",
+            value=(
+                f"行程: {pool['workers']}\n處理中: {pool['pending']}\n完成: {pool['completed']:,}\n"
+                f"滿載略過: {pool['saturated']:,}\n逾時: {pool['deadline_missed']:,}\n錯誤: {pool['errors']:,}"
+            ),
+            inline=True
+        )
+        await ctx.send(embed=embed)
+
 
 async def setup(bot):
     await bot.add_cog(AutoMod(bot))
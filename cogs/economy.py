@@ -47,35 +47,33 @@ class Economy(commands.Cog):
     @commands.hybrid_command(name="daily", description="每日簽到領取獎勵")
     async def daily(self, ctx: commands.Context):
         """每日簽到"""
-        data = db.get_economy_data(ctx.guild.id, ctx.author.id)
-        
         now = datetime.now()
         
-        if data['last_daily']:
+        def claim(data):
+            if data['last_daily']:
+                last_daily = make_naive(datetime.fromisoformat(data['last_daily']))
+                if now - last_daily < timedelta(days=1):
+                    return None
+            return {'balance': data['balance'] + DAILY_REWARD, 'last_daily': now.isoformat()}
+        
+        # 發放獎勵（版本衝突時自動重試，不會重複領取）
+        committed, data = db.update_economy(ctx.guild.id, ctx.author.id, claim)
+        
+        if not committed:
             last_daily = make_naive(datetime.fromisoformat(data['last_daily']))
-            time_diff = now - last_daily
+            remaining = timedelta(days=1) - (now - last_daily)
+            hours, remainder = divmod(remaining.seconds, 3600)
+            minutes = remainder // 60
             
-            if time_diff < timedelta(days=1):
-                remaining = timedelta(days=1) - time_diff
-                hours, remainder = divmod(remaining.seconds, 3600)
-                minutes = remainder // 60
-                
-                return await ctx.send(
-                    embed=create_embed(
-                        title=f"{Emojis.ERROR} 已簽到過",
-                        description=f"你已經領取過今天的簽到獎勵了！\n\n下次簽到時間: **{hours} 小時 {minutes} 分鐘**後",
-                        color=Colors.ERROR
-                    )
+            return await ctx.send(
+                embed=create_embed(
+                    title=f"{Emojis.ERROR} 已簽到過",
+                    description=f"你已經領取過今天的簽到獎勵了！\n\n下次簽到時間: **{hours} 小時 {minutes} 分鐘**後",
+                    color=Colors.ERROR
                 )
+            )
         
-        # 發放獎勵
-        new_balance = data['balance'] + DAILY_REWARD
-        db.set_economy_data(
-            ctx.guild.id,
-            ctx.author.id,
-            balance=new_balance,
-            last_daily=now.isoformat()
-        )
+        new_balance = data['balance']
         
         embed = create_embed(
             title=f"{Emojis.SUCCESS} 簽到成功!",
@@ -89,26 +87,8 @@ class Economy(commands.Cog):
     @commands.hybrid_command(name="work", description="工作賺取金幣")
     async def work(self, ctx: commands.Context):
         """工作"""
-        data = db.get_economy_data(ctx.guild.id, ctx.author.id)
-        
         now = datetime.now()
         
-        if data['last_work']:
-            last_work = make_naive(datetime.fromisoformat(data['last_work']))
-            time_diff = now - last_work
-            
-            if time_diff.total_seconds() < WORK_COOLDOWN:
-                remaining = WORK_COOLDOWN - time_diff.total_seconds()
-                minutes, seconds = divmod(int(remaining), 60)
-                
-                return await ctx.send(
-                    embed=create_embed(
-                        title=f"{Emojis.ERROR} 工作中...",
-                        description=f"你還在工作中！\n\n下次可工作時間: **{minutes} 分鐘 {seconds} 秒**後",
-                        color=Colors.ERROR
-                    )
-                )
-        
         # 隨機工作和獎勵
         jobs = [
             "寫程式", "設計圖案", "賣咖啡", "送外賣", "教學生", 
@@ -117,13 +97,29 @@ class Economy(commands.Cog):
         job = random.choice(jobs)
         reward = random.randint(WORK_REWARD_MIN, WORK_REWARD_MAX)
         
-        new_balance = data['balance'] + reward
-        db.set_economy_data(
-            ctx.guild.id,
-            ctx.author.id,
-            balance=new_balance,
-            last_work=now.isoformat()
-        )
+        def do_work(data):
+            if data['last_work']:
+                last_work = make_naive(datetime.fromisoformat(data['last_work']))
+                if (now - last_work).total_seconds() < WORK_COOLDOWN:
+                    return None
+            return {'balance': data['balance'] + reward, 'last_work': now.isoformat()}
+        
+        committed, data = db.update_economy(ctx.guild.id, ctx.author.id, do_work)
+        
+        if not committed:
+            last_work = make_naive(datetime.fromisoformat(data['last_work']))
+            remaining = WORK_COOLDOWN - (now - last_work).total_seconds()
+            minutes, seconds = divmod(int(remaining), 60)
+            
+            return await ctx.send(
+                embed=create_embed(
+                    title=f"{Emojis.ERROR} 工作中...",
+                    description=f"你還在工作中！\n\n下次可工作時間: **{minutes} 分鐘 {seconds} 秒**後",
+                    color=Colors.ERROR
+                )
+            )
+        
+        new_balance = data['balance']
         
         embed = create_embed(
             title=f"{Emojis.SUCCESS} 工作完成!",
@@ -138,10 +134,8 @@ class Economy(commands.Cog):
     @app_commands.describe(amount="存款金額 (all 為全部)")
     async def deposit(self, ctx: commands.Context, amount: str):
         """存款"""
-        data = db.get_economy_data(ctx.guild.id, ctx.author.id)
-        
         if amount.lower() == "all":
-            amount = data['balance']
+            amount = None  # 於讀取資料後決定
         else:
             try:
                 amount = int(amount)
@@ -154,7 +148,26 @@ class Economy(commands.Cog):
                     )
                 )
         
-        if amount <= 0:
+        moved = 0
+        
+        def deposit_changes(data):
+            nonlocal moved
+            moved = data['balance'] if amount is None else amount
+            if moved <= 0 or moved > data['balance']:
+                return None
+            return {'balance': data['balance'] - moved, 'bank': data['bank'] + moved}
+        
+        committed, data = db.update_economy(ctx.guild.id, ctx.author.id, deposit_changes)
+        
+        if not committed:
+            if moved > data['balance']:
+                return await ctx.send(
+                    embed=create_embed(
+                        title=f"{Emojis.ERROR} 餘額不足",
+                        description=f"你的現金只有 **{format_number(data['balance'])}** 金幣",
+                        color=Colors.ERROR
+                    )
+                )
             return await ctx.send(
                 embed=create_embed(
                     title=f"{Emojis.ERROR} 錯誤",
@@ -163,28 +176,12 @@ class Economy(commands.Cog):
                 )
             )
         
-        if amount > data['balance']:
-            return await ctx.send(
-                embed=create_embed(
-                    title=f"{Emojis.ERROR} 餘額不足",
-                    description=f"你的現金只有 **{format_number(data['balance'])}** 金幣",
-                    color=Colors.ERROR
-                )
-            )
-        
-        new_balance = data['balance'] - amount
-        new_bank = data['bank'] + amount
-        
-        db.set_economy_data(
-            ctx.guild.id,
-            ctx.author.id,
-            balance=new_balance,
-            bank=new_bank
-        )
+        new_balance = data['balance']
+        new_bank = data['bank']
         
         embed = create_embed(
             title=f"{Emojis.SUCCESS} 存款成功!",
-            description=f"成功存入 **{format_number(amount)}** 金幣到銀行\n\n💵 現金: **{format_number(new_balance)}**\n🏦 銀行: **{format_number(new_bank)}**",
+            description=f"成功存入 **{format_number(moved)}** 金幣到銀行\n\n💵 現金: **{format_number(new_balance)}**\n🏦 銀行: **{format_number(new_bank)}**",
             color=Colors.SUCCESS
         )
         await ctx.send(embed=embed)
@@ -194,10 +191,8 @@ class Economy(commands.Cog):
     @app_commands.describe(amount="提款金額 (all 為全部)")
     async def withdraw(self, ctx: commands.Context, amount: str):
         """提款"""
-        data = db.get_economy_data(ctx.guild.id, ctx.author.id)
-        
         if amount.lower() == "all":
-            amount = data['bank']
+            amount = None  # 於讀取資料後決定
         else:
             try:
                 amount = int(amount)
@@ -210,7 +205,26 @@ class Economy(commands.Cog):
                     )
                 )
         
-        if amount <= 0:
+        moved = 0
+        
+        def withdraw_changes(data):
+            nonlocal moved
+            moved = data['bank'] if amount is None else amount
+            if moved <= 0 or moved > data['bank']:
+                return None
+            return {'balance': data['balance'] + moved, 'bank': data['bank'] - moved}
+        
+        committed, data = db.update_economy(ctx.guild.id, ctx.author.id, withdraw_changes)
+        
+        if not committed:
+            if moved > data['bank']:
+                return await ctx.send(
+                    embed=create_embed(
+                        title=f"{Emojis.ERROR} 銀行餘額不足",
+                        description=f"你的銀行只有 **{format_number(data['bank'])}** 金幣",
+                        color=Colors.ERROR
+                    )
+                )
             return await ctx.send(
                 embed=create_embed(
                     title=f"{Emojis.ERROR} 錯誤",
@@ -219,28 +233,12 @@ class Economy(commands.Cog):
                 )
             )
         
-        if amount > data['bank']:
-            return await ctx.send(
-                embed=create_embed(
-                    title=f"{Emojis.ERROR} 銀行餘額不足",
-                    description=f"你的銀行只有 **{format_number(data['bank'])}** 金幣",
-                    color=Colors.ERROR
-                )
-            )
-        
-        new_balance = data['balance'] + amount
-        new_bank = data['bank'] - amount
-        
-        db.set_economy_data(
-            ctx.guild.id,
-            ctx.author.id,
-            balance=new_balance,
-            bank=new_bank
-        )
+        new_balance = data['balance']
+        new_bank = data['bank']
         
         embed = create_embed(
             title=f"{Emojis.SUCCESS} 提款成功!",
-            description=f"成功從銀行提款 **{format_number(amount)}** 金幣\n\n💵 現金: **{format_number(new_balance)}**\n🏦 銀行: **{format_number(new_bank)}**",
+            description=f"成功從銀行提款 **{format_number(moved)}** 金幣\n\n💵 現金: **{format_number(new_balance)}**\n🏦 銀行: **{format_number(new_bank)}**",
             color=Colors.SUCCESS
         )
         await ctx.send(embed=embed)
@@ -277,33 +275,27 @@ class Economy(commands.Cog):
                 )
             )
         
-        author_data = db.get_economy_data(ctx.guild.id, ctx.author.id)
+        # 轉帳（兩個帳戶同時以版本檢查寫入，不會遺失並行的更新）
+        def transfer(accounts):
+            if amount > accounts[ctx.author.id]['balance']:
+                return None
+            return {
+                ctx.author.id: {'balance': accounts[ctx.author.id]['balance'] - amount},
+                member.id: {'balance': accounts[member.id]['balance'] + amount},
+            }
+        
+        committed, accounts = db.update_economy_many(ctx.guild.id, [ctx.author.id, member.id], transfer)
         
-        if amount > author_data['balance']:
+        if not committed:
             return await ctx.send(
                 embed=create_embed(
                     title=f"{Emojis.ERROR} 餘額不足",
-                    description=f"你的現金只有 **{format_number(author_data['balance'])}** 金幣",
+                    description=f"你的現金只有 **{format_number(accounts[ctx.author.id]['balance'])}** 金幣",
                     color=Colors.ERROR
                 )
             )
         
-        member_data = db.get_economy_data(ctx.guild.id, member.id)
-        
-        # 轉帳
-        new_author_balance = author_data['balance'] - amount
-        new_member_balance = member_data['balance'] + amount
-        
-        db.set_economy_data(
-            ctx.guild.id,
-            ctx.author.id,
-            balance=new_author_balance
-        )
-        db.set_economy_data(
-            ctx.guild.id,
-            member.id,
-            balance=new_member_balance
-        )
+        new_author_balance = accounts[ctx.author.id]['balance']
         
         embed = create_embed(
             title=f"{Emojis.SUCCESS} 轉帳成功!",
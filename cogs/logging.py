@@ -1,25 +1,140 @@
 """
 日誌記錄模組 - 記錄伺服器事件
-包括: 訊息刪除、成員加入/離開、角色變更等
+包括: 訊息刪除/編輯（使用本地訊息快取）、成員加入/離開、角色變更等
+日誌以每個頻道一個佇列批次發送（每則訊息最多 10 個 embed）
 """
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
-from datetime import datetime
+from typing import Optional, Literal
+from datetime import datetime, timezone
+import asyncio
+import io
 import logging
+import time
 
 from utils.database import db
 from utils.helpers import create_embed
-from config import Colors, Emojis
+from utils.log_queue import LogDispatcher, WebhookPool
+from utils.message_cache import MessageCache, CachedMessage
+from utils.audit_store import AuditStore
+from utils.text_diff import render_diff
+from config import (
+    Colors, Emojis, LOG_FLUSH_SECONDS, LOG_SEND_INTERVAL, LOG_MAX_PENDING, LOG_WEBHOOK_POOL_SIZE,
+    MESSAGE_CACHE_MAX_MB, MESSAGE_CACHE_GUILD_QUOTA_MB, MESSAGE_CACHE_SPILL_PATH, MESSAGE_CACHE_SPILL_MAX_ENTRIES,
+    MESSAGE_CACHE_FLUSH_SECONDS, AUDIT_DB_PATH, AUDIT_BATCH_SIZE, AUDIT_FLUSH_SECONDS, AUDIT_RETENTION_DAYS,
+    AUDIT_PAGE_SIZE
+)
 
 logger = logging.getLogger(__name__)
 
+# 稽核日誌的事件類型
+AUDIT_EVENT_LABELS = {
+    'message_delete': "🗑️ 訊息刪除",
+    'message_edit': "✏️ 訊息編輯",
+    'member_join': "📥 成員加入",
+    'member_remove': "📤 成員離開",
+    'nick_change': "✏️ 暱稱變更",
+    'role_change': "🎭 角色變更",
+    'channel_create': "➕ 頻道創建",
+    'channel_delete': "➖ 頻道刪除",
+}
+AuditEventType = Literal[
+    'message_delete', 'message_edit', 'member_join', 'member_remove',
+    'nick_change', 'role_change', 'channel_create', 'channel_delete'
+]
+
+
+class AuditLogPaginator(discord.ui.View):
+    """稽核日誌搜尋結果的分頁（每次換頁才查詢該頁）"""
+    
+    def __init__(self, *, author: discord.abc.User, fetch_page, total: int):
+        super().__init__(timeout=120)
+        self.author_id = author.id
+        self.fetch_page = fetch_page
+        self.page = 1
+        self.max_page = max(1, (total - 1) // AUDIT_PAGE_SIZE + 1)
+        self._sync_buttons()
+    
+    def _sync_buttons(self):
+        for item in self.children:
+            if isinstance(item, discord.ui.Button):
+                if item.custom_id == "prev":
+                    item.disabled = self.page <= 1
+                elif item.custom_id == "next":
+                    item.disabled = self.page >= self.max_page
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user and interaction.user.id == self.author_id
+    
+    async def _show(self, interaction: discord.Interaction):
+        self._sync_buttons()
+        embed = await self.fetch_page(self.page)
+        await interaction.response.edit_message(embed=embed, view=self)
+    
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary, custom_id="prev")
+    async def prev(self, interaction: discord.Interaction, button: discord.ui.Button):  # type: ignore[override]
+        self.page = max(1, self.page - 1)
+        await self._show(interaction)
+    
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary, custom_id="next")
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):  # type: ignore[override]
+        self.page = min(self.max_page, self.page + 1)
+        await self._show(interaction)
+
 
 class Logging(commands.Cog):
     """日誌記錄系統"""
     
     def __init__(self, bot):
         self.bot = bot
+        self.dispatcher = LogDispatcher(
+            flush_seconds=LOG_FLUSH_SECONDS,
+            send_interval=LOG_SEND_INTERVAL,
+            max_pending=LOG_MAX_PENDING,
+            webhooks=WebhookPool(size=LOG_WEBHOOK_POOL_SIZE)
+        )
+        self.message_cache = MessageCache(
+            max_bytes=MESSAGE_CACHE_MAX_MB * 1024 * 1024,
+            guild_quota_bytes=MESSAGE_CACHE_GUILD_QUOTA_MB * 1024 * 1024,
+            spill_path=MESSAGE_CACHE_SPILL_PATH,
+            spill_max_entries=MESSAGE_CACHE_SPILL_MAX_ENTRIES
+        )
+        if MESSAGE_CACHE_SPILL_PATH:
+            self.flush_message_cache.start()
+        self.audit = AuditStore(AUDIT_DB_PATH, batch_size=AUDIT_BATCH_SIZE)
+        self.audit_writes = set()  # 進行中的提早寫入（保留參考，卸載時等待完成）
+        self.flush_audit.start()
+        if AUDIT_RETENTION_DAYS:
+            self.prune_audit.start()
+    
+    async def cog_unload(self):
+        self.flush_message_cache.cancel()
+        self.flush_audit.cancel()
+        self.prune_audit.cancel()
+        await self.message_cache.close()
+        if self.audit_writes:
+            await asyncio.gather(*self.audit_writes, return_exceptions=True)
+        await asyncio.to_thread(self.audit.close)
+        await self.dispatcher.close()
+    
+    def send_log(self, guild_id: int, embed: discord.Embed) -> bool:
+        """
+        將日誌加入伺服器日誌頻道的發送佇列（其他模組也可使用）
+        
+        Returns:
+            是否有設定日誌頻道
+        """
+        log_channel = self.get_log_channel(guild_id)
+        if not log_channel:
+            return False
+        self.deliver(log_channel, embed)
+        return True
+    
+    def deliver(self, log_channel: discord.TextChannel, embed: discord.Embed, file: Optional[discord.File] = None):
+        """加入日誌頻道的發送佇列（伺服器啟用時經由 webhook 池發送）"""
+        settings = db.get_guild_settings(log_channel.guild.id)
+        self.dispatcher.enqueue(log_channel, embed, use_webhook=settings.get('log_webhooks', False), file=file)
     
     def get_log_channel(self, guild_id: int):
         """獲取日誌頻道"""
@@ -31,14 +146,95 @@ class Logging(commands.Cog):
             return guild.get_channel(log_channel_id)
         return None
     
-    # ==================== 訊息刪除 ====================
+    # ==================== 訊息快取 ====================
     @commands.Cog.listener()
-    async def on_message_delete(self, message: discord.Message):
-        """訊息刪除事件"""
+    async def on_message(self, message: discord.Message):
+        """記錄訊息內容（只記錄有設定日誌頻道的伺服器），刪除/編輯時不依賴 discord.py 的訊息快取"""
         if message.author.bot or not message.guild:
             return
+        if not db.get_guild_settings(message.guild.id).get('log_channel_id'):
+            return
+        self.message_cache.put(
+            message.id,
+            message.guild.id,
+            message.channel.id,
+            message.author.id,
+            message.created_at.timestamp(),
+            message.content,
+            [attachment.filename for attachment in message.attachments]
+        )
+    
+    @tasks.loop(seconds=MESSAGE_CACHE_FLUSH_SECONDS)
+    async def flush_message_cache(self):
+        """將淘汰的訊息批次寫入磁碟（在執行緒中）"""
+        await self.message_cache.flush()
+    
+    # ==================== 稽核日誌 ====================
+    def record_audit(self, guild_id: int, event_type: str, author_id: Optional[int] = None,
+                     channel_id: Optional[int] = None, content: str = ""):
+        """記錄事件到稽核資料庫（暫存達批次大小時提早寫入）"""
+        self.audit.record(guild_id, event_type, author_id, channel_id, content)
+        if self.audit.needs_flush and not self.audit_writes:
+            task = asyncio.create_task(self.write_audit())
+            self.audit_writes.add(task)
+            task.add_done_callback(self.finish_audit_write)
+    
+    def finish_audit_write(self, task: asyncio.Task):
+        self.audit_writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"寫入稽核日誌失敗: {task.exception()}")
+    
+    async def write_audit(self):
+        """在執行緒中以單一交易寫入暫存的事件"""
+        events = self.audit.drain()
+        if events:
+            await asyncio.to_thread(self.audit.write, events)
+    
+    @tasks.loop(seconds=AUDIT_FLUSH_SECONDS)
+    async def flush_audit(self):
+        """定期寫入暫存的事件"""
+        await self.write_audit()
+    
+    @tasks.loop(hours=1)
+    async def prune_audit(self):
+        """刪除超過保留天數的事件"""
+        removed = await asyncio.to_thread(self.audit.prune, time.time() - AUDIT_RETENTION_DAYS * 86400)
+        if removed:
+            logger.info(f"稽核日誌已刪除 {removed} 筆過期事件")
+    
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        """機器人離開伺服器時移除快取的訊息"""
+        await self.message_cache.forget_guild(guild.id)
+    
+    def describe_content(self, message: Optional[CachedMessage]) -> str:
+        """日誌中顯示的訊息內容"""
+        if message is None:
+            return "*內容不在快取中*"
+        content = message.content[:1024] if message.content else "*無文字內容*"
+        if message.attachments:
+            attachments = "\n📎 " + ", ".join(message.attachments)
+            content = content[:1024 - len(attachments)] + attachments
+        return content
+    
+    # ==================== 訊息刪除 ====================
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        """訊息刪除事件（不論訊息是否在 discord.py 的快取中都會觸發）"""
+        if not payload.guild_id:
+            return
+        cached = await self.message_cache.pop(payload.guild_id, payload.message_id)
+        if cached is None and payload.cached_message is not None:
+            message = payload.cached_message
+            cached = CachedMessage(
+                message.id, payload.guild_id, message.channel.id, message.author.id,
+                message.created_at.timestamp(), message.content,
+                tuple(attachment.filename for attachment in message.attachments)
+            )
+        if payload.cached_message is not None and payload.cached_message.author.bot:
+            return
         
-        log_channel = self.get_log_channel(message.guild.id)
+        log_channel = self.get_log_channel(payload.guild_id)
         if not log_channel:
             return
         
@@ -46,42 +242,145 @@ class Logging(commands.Cog):
             title="🗑️ 訊息已刪除",
             color=Colors.ERROR
         )
-        embed.add_field(name="作者", value=message.author.mention, inline=True)
-        embed.add_field(name="頻道", value=message.channel.mention, inline=True)
-        embed.add_field(name="內容", value=message.content[:1024] if message.content else "*無文字內容*", inline=False)
-        embed.set_footer(text=f"用戶 ID: {message.author.id}")
+        embed.add_field(name="作者", value=f"<@{cached.author_id}>" if cached else "*未知*", inline=True)
+        embed.add_field(name="頻道", value=f"<#{payload.channel_id}>", inline=True)
+        embed.add_field(name="內容", value=self.describe_content(cached), inline=False)
+        embed.set_footer(text=f"用戶 ID: {cached.author_id}" if cached else f"訊息 ID: {payload.message_id}")
+        self.deliver(log_channel, embed)
+        self.record_audit(
+            payload.guild_id, 'message_delete', cached.author_id if cached else None, payload.channel_id,
+            cached.content if cached else ""
+        )
+    
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        """批次刪除事件（例如 clear 指令）：整批只發送一則日誌，內容以文字檔附上"""
+        if not payload.guild_id:
+            return
+        messages = await self.message_cache.pop_many(payload.guild_id, payload.message_ids)
+        
+        log_channel = self.get_log_channel(payload.guild_id)
+        if not log_channel:
+            return
+        
+        # 本地快取沒有的訊息改用 discord.py 快取中的內容
+        found = {message.id for message in messages}
+        for message in payload.cached_messages:
+            if message.id not in found and not message.author.bot:
+                messages.append(CachedMessage(
+                    message.id, payload.guild_id, message.channel.id, message.author.id,
+                    message.created_at.timestamp(), message.content,
+                    tuple(attachment.filename for attachment in message.attachments)
+                ))
+        messages.sort(key=lambda message: message.id)
         
-        try:
-            await log_channel.send(embed=embed)
-        except:
-            pass
+        authors = {}
+        for message in messages:
+            authors[message.author_id] = authors.get(message.author_id, 0) + 1
+        top_authors = sorted(authors.items(), key=lambda item: item[1], reverse=True)[:5]
+        
+        embed = create_embed(
+            title=f"🗑️ 已批次刪除 {len(payload.message_ids)} 則訊息",
+            description="完整內容請見附件" if messages else "*訊息內容都不在快取中*",
+            color=Colors.ERROR
+        )
+        embed.add_field(name="頻道", value=f"<#{payload.channel_id}>", inline=True)
+        embed.add_field(name="有內容", value=f"{len(messages)} 則", inline=True)
+        if top_authors:
+            embed.add_field(
+                name="作者",
+                value="\n".join(f"<@{author_id}>: {count} 則" for author_id, count in top_authors),
+                inline=False
+            )
+        
+        file = None
+        if messages:
+            guild = self.bot.get_guild(payload.guild_id)
+            file = discord.File(
+                io.BytesIO(self.build_transcript(guild, payload.channel_id, len(payload.message_ids), messages)),
+                filename=f"purge-{payload.channel_id}-{int(time.time())}.txt"
+            )
+        self.deliver(log_channel, embed, file=file)
+        for message in messages:
+            self.record_audit(payload.guild_id, 'message_delete', message.author_id, payload.channel_id, message.content)
+    
+    def build_transcript(self, guild: Optional[discord.Guild], channel_id: int, deleted: int,
+                         messages: list) -> bytes:
+        """產生批次刪除的文字紀錄（在記憶體中建立，不寫入磁碟）"""
+        channel = guild.get_channel(channel_id) if guild else None
+        names = {}
+        lines = [
+            f"# 批次刪除紀錄 - #{channel.name if channel else channel_id} ({channel_id})",
+            f"# {datetime.now(timezone.utc):%Y-%m-%d %H:%M:%S} UTC，共刪除 {deleted} 則，其中 {len(messages)} 則有內容",
+            "",
+        ]
+        for message in messages:
+            if message.author_id not in names:
+                member = guild.get_member(message.author_id) if guild else None
+                names[message.author_id] = f"{member} ({message.author_id})" if member else str(message.author_id)
+            timestamp = datetime.fromtimestamp(message.created_at, timezone.utc)
+            lines.append(f"[{timestamp:%Y-%m-%d %H:%M:%S}] {names[message.author_id]}: {message.content}")
+            for attachment in message.attachments:
+                lines.append(f"    📎 {attachment}")
+        return "\n".join(lines).encode('utf-8')
     
     # ==================== 訊息編輯 ====================
     @commands.Cog.listener()
-    async def on_message_edit(self, before: discord.Message, after: discord.Message):
-        """訊息編輯事件"""
-        if before.author.bot or not before.guild or before.content == after.content:
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        """訊息編輯事件（不論訊息是否在 discord.py 的快取中都會觸發）"""
+        data = payload.data
+        if not payload.guild_id:
             return
-        
-        log_channel = self.get_log_channel(before.guild.id)
+        # MESSAGE_UPDATE 一律包含完整訊息：連結預覽、釘選等更新不會改變 edited_timestamp
+        edited_at = data.get('edited_timestamp')
+        if not edited_at:
+            return
+        cached = payload.cached_message
+        if cached is not None and cached.edited_at is not None and cached.edited_at == discord.utils.parse_time(edited_at):
+            return
+        author = data.get('author') or {}
+        if author.get('bot'):
+            return
+        log_channel = self.get_log_channel(payload.guild_id)
         if not log_channel:
             return
         
+        before = await self.message_cache.get(payload.guild_id, payload.message_id)
+        before_content = before.content if before else (cached.content if cached is not None else None)
+        after_content = data.get('content', "")
+        if before_content == after_content:
+            return
+        
+        author_id = int(author['id']) if 'id' in author else (before.author_id if before else None)
+        if author_id is not None:
+            self.message_cache.put(
+                payload.message_id,
+                payload.guild_id,
+                payload.channel_id,
+                author_id,
+                discord.utils.snowflake_time(payload.message_id).timestamp(),
+                after_content,
+                [attachment['filename'] for attachment in data.get('attachments', [])]
+            )
+        
+        jump_url = f"https://discord.com/channels/{payload.guild_id}/{payload.channel_id}/{payload.message_id}"
         embed = create_embed(
             title="✏️ 訊息已編輯",
             color=Colors.WARNING
         )
-        embed.add_field(name="作者", value=before.author.mention, inline=True)
-        embed.add_field(name="頻道", value=before.channel.mention, inline=True)
-        embed.add_field(name="編輯前", value=before.content[:1024] if before.content else "*無內容*", inline=False)
-        embed.add_field(name="編輯後", value=after.content[:1024] if after.content else "*無內容*", inline=False)
-        embed.add_field(name="跳轉", value=f"[點擊查看]({after.jump_url})", inline=False)
-        embed.set_footer(text=f"用戶 ID: {before.author.id}")
-        
-        try:
-            await log_channel.send(embed=embed)
-        except:
-            pass
+        embed.add_field(name="作者", value=f"<@{author_id}>" if author_id else "*未知*", inline=True)
+        embed.add_field(name="頻道", value=f"<#{payload.channel_id}>", inline=True)
+        if before_content:
+            diff = await asyncio.to_thread(render_diff, before_content, after_content)
+            embed.add_field(name="變更", value=diff or "*無內容*", inline=False)
+        else:
+            embed.add_field(name="編輯前", value="*內容不在快取中*" if before_content is None else "*無內容*", inline=False)
+            embed.add_field(name="編輯後", value=after_content[:1024] if after_content else "*無內容*", inline=False)
+        embed.add_field(name="跳轉", value=f"[點擊查看]({jump_url})", inline=False)
+        if author_id:
+            embed.set_footer(text=f"用戶 ID: {author_id}")
+        self.deliver(log_channel, embed)
+        self.record_audit(payload.guild_id, 'message_edit', author_id, payload.channel_id, after_content)
     
     # ==================== 成員加入 ====================
     @commands.Cog.listener()
@@ -100,11 +399,8 @@ class Logging(commands.Cog):
         embed.add_field(name="帳號創建", value=f"<t:{int(member.created_at.timestamp())}:R>", inline=True)
         embed.add_field(name="成員數", value=str(member.guild.member_count), inline=True)
         embed.set_footer(text=f"用戶 ID: {member.id}")
-        
-        try:
-            await log_channel.send(embed=embed)
-        except:
-            pass
+        self.deliver(log_channel, embed)
+        self.record_audit(member.guild.id, 'member_join', member.id, content=str(member))
     
     # ==================== 成員離開 ====================
     @commands.Cog.listener()
@@ -131,11 +427,8 @@ class Logging(commands.Cog):
             embed.add_field(name="角色", value=roles, inline=False)
         
         embed.set_footer(text=f"用戶 ID: {member.id}")
-        
-        try:
-            await log_channel.send(embed=embed)
-        except:
-            pass
+        self.deliver(log_channel, embed)
+        self.record_audit(member.guild.id, 'member_remove', member.id, content=str(member))
     
     # ==================== 成員更新 ====================
     @commands.Cog.listener()
@@ -155,11 +448,8 @@ class Logging(commands.Cog):
             embed.add_field(name="舊暱稱", value=before.nick or "*無*", inline=True)
             embed.add_field(name="新暱稱", value=after.nick or "*無*", inline=True)
             embed.set_footer(text=f"用戶 ID: {after.id}")
-            
-            try:
-                await log_channel.send(embed=embed)
-            except:
-                pass
+            self.deliver(log_channel, embed)
+            self.record_audit(after.guild.id, 'nick_change', after.id, content=f"{before.nick or ''} -> {after.nick or ''}")
         
         # 檢測角色變更
         if before.roles != after.roles:
@@ -182,11 +472,11 @@ class Logging(commands.Cog):
                     embed.add_field(name="➖ 移除角色", value=roles_str, inline=False)
                 
                 embed.set_footer(text=f"用戶 ID: {after.id}")
-                
-                try:
-                    await log_channel.send(embed=embed)
-                except:
-                    pass
+                self.deliver(log_channel, embed)
+                self.record_audit(
+                    after.guild.id, 'role_change', after.id,
+                    content=" ".join([f"+{r.name}" for r in added_roles] + [f"-{r.name}" for r in removed_roles])
+                )
     
     # ==================== 頻道創建 ====================
     @commands.Cog.listener()
@@ -204,11 +494,8 @@ class Logging(commands.Cog):
             color=Colors.SUCCESS
         )
         embed.set_footer(text=f"頻道 ID: {channel.id}")
-        
-        try:
-            await log_channel.send(embed=embed)
-        except:
-            pass
+        self.deliver(log_channel, embed)
+        self.record_audit(channel.guild.id, 'channel_create', channel_id=channel.id, content=channel.name)
     
     # ==================== 頻道刪除 ====================
     @commands.Cog.listener()
@@ -226,27 +513,135 @@ class Logging(commands.Cog):
             color=Colors.ERROR
         )
         embed.set_footer(text=f"頻道 ID: {channel.id}")
-        
-        try:
-            await log_channel.send(embed=embed)
-        except:
-            pass
+        self.deliver(log_channel, embed)
+        self.record_audit(channel.guild.id, 'channel_delete', channel_id=channel.id, content=channel.name)
     
     # ==================== 設定日誌頻道 ====================
     @commands.hybrid_command(name="setlog", description="設定日誌頻道")
     @commands.has_permissions(administrator=True)
-    @app_commands.describe(channel="日誌頻道")
-    async def setlog(self, ctx: commands.Context, channel: discord.TextChannel):
+    @app_commands.describe(channel="日誌頻道", webhooks="是否經由 webhook 發送（需要管理 Webhook 權限，大量事件時較不會被限速）")
+    async def setlog(self, ctx: commands.Context, channel: discord.TextChannel, webhooks: bool = False):
         """設定日誌頻道"""
-        db.set_guild_settings(ctx.guild.id, log_channel_id=channel.id)
+        db.set_guild_settings(ctx.guild.id, log_channel_id=channel.id, log_webhooks=webhooks)
+        self.dispatcher.webhooks.forget(channel.id)
         
         embed = create_embed(
             title=f"{Emojis.SUCCESS} 日誌頻道已設定",
-            description=f"日誌將發送到 {channel.mention}",
+            description=f"日誌將{'經由 webhook ' if webhooks else ''}發送到 {channel.mention}",
             color=Colors.SUCCESS
         )
         await ctx.send(embed=embed)
         logger.info(f"{ctx.author} 設定日誌頻道為 {channel}")
+    
+    # ==================== 搜尋稽核日誌 ====================
+    @commands.hybrid_command(name="logsearch", description="搜尋稽核日誌")
+    @commands.has_permissions(administrator=True)
+    @app_commands.describe(
+        member="只顯示此成員的事件",
+        channel="只顯示此頻道的事件",
+        event="事件類型",
+        query="搜尋內容（多個詞以空白分隔，全部都要符合）"
+    )
+    async def logsearch(
+        self,
+        ctx: commands.Context,
+        member: Optional[discord.User] = None,
+        channel: Optional[discord.TextChannel] = None,
+        event: Optional[AuditEventType] = None,
+        *,
+        query: str = ""
+    ):
+        """搜尋稽核日誌"""
+        # 先寫入暫存的事件，剛發生的事件也能搜尋到
+        await self.write_audit()
+        
+        async def search(page: int):
+            return await asyncio.to_thread(
+                self.audit.search,
+                ctx.guild.id,
+                query,
+                event,
+                member.id if member else None,
+                channel.id if channel else None,
+                AUDIT_PAGE_SIZE,
+                (page - 1) * AUDIT_PAGE_SIZE
+            )
+        
+        total, rows = await search(1)
+        filters = [f"`{query}`" if query else None, member.mention if member else None,
+                   channel.mention if channel else None, AUDIT_EVENT_LABELS[event] if event else None]
+        filters = " · ".join(f for f in filters if f) or "全部事件"
+        
+        def build_embed(page: int, rows: list) -> discord.Embed:
+            lines = []
+            for row in rows:
+                line = f"<t:{int(row['created_at'])}:f> {AUDIT_EVENT_LABELS.get(row['type'], row['type'])}"
+                if row['author_id']:
+                    line += f" <@{row['author_id']}>"
+                if row['channel_id']:
+                    line += f" <#{row['channel_id']}>"
+                if row['content']:
+                    content = row['content'].replace("\n", " ")
+                    line += f"\n> {content[:200]}{'…' if len(content) > 200 else ''}"
+                lines.append(line)
+            max_page = max(1, (total - 1) // AUDIT_PAGE_SIZE + 1)
+            return create_embed(
+                title=f"🔎 稽核日誌 ({total:,} 筆)",
+                description=f"**條件:** {filters}\n\n" + ("\n".join(lines) or "*沒有符合的事件*"),
+                color=Colors.INFO,
+                footer=f"第 {page}/{max_page} 頁"
+            )
+        
+        async def fetch_page(page: int) -> discord.Embed:
+            _, page_rows = await search(page)
+            return build_embed(page, page_rows)
+        
+        embed = build_embed(1, rows)
+        if total <= AUDIT_PAGE_SIZE:
+            return await ctx.send(embed=embed)
+        await ctx.send(embed=embed, view=AuditLogPaginator(author=ctx.author, fetch_page=fetch_page, total=total))
+    
+    @commands.command(name="logstats", hidden=True)
+    @commands.is_owner()
+    async def logstats(self, ctx: commands.Context):
+        """查看日誌發送佇列的狀態"""
+        stats = self.dispatcher.stats()
+        embed = create_embed(title="📊 日誌發送佇列", color=Colors.INFO)
+        embed.add_field(name="頻道", value=f"{stats['channels']:,}", inline=True)
+        embed.add_field(name="排隊中", value=f"{stats['pending']:,}", inline=True)
+        embed.add_field(name="已捨棄", value=f"{stats['dropped']:,}", inline=True)
+        embed.add_field(name="累計加入", value=f"{stats['queued']:,}", inline=True)
+        embed.add_field(name="已發送", value=f"{stats['sent_embeds']:,} 筆 / {stats['sent_messages']:,} 則訊息", inline=True)
+        embed.add_field(name="重試", value=f"{stats['retries']:,}", inline=True)
+        
+        pool = self.dispatcher.webhooks.stats()
+        embed.add_field(
+            name="Webhook",
+            value=(
+                f"頻道: {pool['channels']:,}\nWebhook: {pool['webhooks']:,}\n已建立: {pool['created']:,}\n"
+                f"已失效: {pool['discarded']:,}\n無權限頻道: {pool['unavailable']:,}"
+            ),
+            inline=False
+        )
+        
+        cache = self.message_cache.stats()
+        embed.add_field(
+            name="訊息快取",
+            value=(
+                f"伺服器: {cache['guilds']:,}\n訊息: {cache['entries']:,}\n記憶體: ~{cache['approx_bytes'] / 1024:.1f} KB\n"
+                f"命中: {cache['hits']:,} / 未命中: {cache['misses']:,}\n淘汰: {cache['evicted']:,}\n"
+                f"寫入磁碟: {cache['spilled']:,} (等待 {cache['spill_pending']:,})"
+            ),
+            inline=False
+        )
+        
+        audit = self.audit.stats()
+        embed.add_field(
+            name="稽核日誌",
+            value=f"暫存: {audit['pending']:,}\n已寫入: {audit['written']:,} ({audit['flushes']:,} 次交易)\n錯誤: {audit['errors']:,}",
+            inline=False
+        )
+        await ctx.send(embed=embed)
 
 
 async def setup(bot):
@@ -0,0 +1,297 @@
+"""
+資料維護模組 - 定期壓縮資料檔案
+包括: 移除已離開成員的等級/經濟資料、機器人已離開伺服器的資料、過期警告
+"""
+import discord
+from discord.ext import commands, tasks
+from discord import app_commands
+from typing import Optional, Dict
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import time
+
+from utils.database import db
+from utils.helpers import create_embed, make_naive
+from config import (
+    Colors, Emojis,
+    RETENTION_INTERVAL_HOURS, RETENTION_BATCH_SIZE, RETENTION_DEPARTED_DAYS,
+    RETENTION_WARNING_DAYS, RETENTION_ARCHIVE, GUILD_DATA_GRACE_DAYS
+)
+
+logger = logging.getLogger(__name__)
+
+# 以 (guild_id, user_id) 為單位的成員資料
+MEMBER_DATASETS = ('levels', 'economy')
+
+# 機器人離開伺服器後需要清除的資料集
+GUILD_DATASETS = ('levels', 'economy', 'warnings', 'reaction_roles', 'mutes', 'departures', 'guild_settings')
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    """解析 ISO 時間字串，失敗時回傳 None"""
+    if not value:
+        return None
+    try:
+        return make_naive(datetime.fromisoformat(value))
+    except ValueError:
+        return None
+
+
+class Maintenance(commands.Cog):
+    """資料維護系統"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.running = asyncio.Lock()
+        self.last_report: Optional[Dict] = None
+        self.compaction_loop.start()
+
+    def cog_unload(self):
+        self.compaction_loop.cancel()
+
+    def get_policy(self, guild_id: int) -> Dict:
+        """獲取伺服器的資料保留策略"""
+        settings = db.get_guild_settings(guild_id)
+        return {
+            'departed_days': settings.get('retention_departed_days', RETENTION_DEPARTED_DAYS),
+            'warning_days': settings.get('retention_warning_days', RETENTION_WARNING_DAYS),
+            'archive': settings.get('retention_archive', RETENTION_ARCHIVE),
+        }
+
+    # ==================== 事件追蹤 ====================
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        """記錄成員離開時間"""
+        db.mark_departed(member.guild.id, member.id, datetime.now().isoformat())
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        """成員重新加入時取消離開記錄"""
+        db.clear_departed(member.guild.id, member.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        """記錄機器人離開伺服器的時間（寬限期後才清除資料）"""
+        db.set_guild_settings(guild.id, removed_at=datetime.now().isoformat())
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        """重新加入伺服器時取消清除"""
+        if db.get_guild_settings(guild.id).get('removed_at'):
+            db.set_guild_settings(guild.id, removed_at=None)
+
+    # ==================== 壓縮工作 ====================
+    @tasks.loop(hours=RETENTION_INTERVAL_HOURS)
+    async def compaction_loop(self):
+        """定期執行資料壓縮"""
+        try:
+            await self.run_compaction()
+        except Exception as e:
+            logger.error(f"資料壓縮失敗: {e}")
+
+    @compaction_loop.before_loop
+    async def before_compaction(self):
+        await self.bot.wait_until_ready()
+
+    async def _prune(self, report: Dict, key: str, selector):
+        """在背景執行緒移除記錄並累計到報告"""
+        result = await asyncio.to_thread(db.prune_records, key, selector)
+        stats = report['datasets'].setdefault(key, {'removed': 0, 'archived': 0, 'bytes_reclaimed': 0})
+        for field, value in result.items():
+            stats[field] += value
+
+    async def run_compaction(self) -> Dict:
+        """
+        執行一次資料壓縮
+
+        每批處理 RETENTION_BATCH_SIZE 個伺服器，檔案讀寫在背景執行緒進行，
+        批次之間會交還事件循環，不會阻塞訊息處理。
+
+        Returns:
+            壓縮報告
+        """
+        async with self.running:
+            start = time.perf_counter()
+            now = datetime.now()
+            report = {'started_at': now.isoformat(), 'datasets': {}, 'guilds_purged': 0}
+            known_guilds = {g.id: g for g in self.bot.guilds}
+
+            # 機器人已離開的伺服器：超過寬限期後清除所有資料
+            expired_guilds = set()
+            for guild_id in await asyncio.to_thread(db.get_stored_guild_ids):
+                if guild_id in known_guilds:
+                    continue
+                removed_at = _parse_time(db.get_guild_settings(guild_id).get('removed_at'))
+                if removed_at is None:
+                    # 機器人離線期間被移除，從現在開始計算寬限期
+                    db.set_guild_settings(guild_id, removed_at=now.isoformat())
+                elif now - removed_at >= timedelta(days=GUILD_DATA_GRACE_DAYS):
+                    expired_guilds.add(guild_id)
+
+            if expired_guilds:
+                action = 'archive' if RETENTION_ARCHIVE else 'delete'
+                for key in GUILD_DATASETS:
+                    await self._prune(report, key, lambda r: action if r.get('guild_id') in expired_guilds else None)
+                report['guilds_purged'] = len(expired_guilds)
+
+            # 現有伺服器：已離開成員與過期警告
+            departures = {
+                key: _parse_time(d.get('left_at'))
+                for key, d in db.get_departures().items()
+            }
+            guilds = list(known_guilds.values())
+
+            for i in range(0, len(guilds), RETENTION_BATCH_SIZE):
+                batch = guilds[i:i + RETENTION_BATCH_SIZE]
+                policies = {g.id: self.get_policy(g.id) for g in batch}
+
+                # 只有成員列表完整的伺服器才能判斷誰已離開
+                members = {g.id: {m.id for m in g.members} for g in batch if g.chunked}
+                departed_cutoff = {
+                    gid: now - timedelta(days=policies[gid]['departed_days'])
+                    for gid in members if policies[gid]['departed_days'] > 0
+                }
+                warning_cutoff = {
+                    gid: now - timedelta(days=policy['warning_days'])
+                    for gid, policy in policies.items() if policy['warning_days'] > 0
+                }
+                newly_departed = set()
+
+                def member_selector(record):
+                    gid = record.get('guild_id')
+                    if gid not in departed_cutoff or record.get('user_id') in members[gid]:
+                        return None
+                    key = f"{gid}_{record['user_id']}"
+                    left_at = departures.get(key)
+                    if left_at is None:
+                        newly_departed.add((gid, record['user_id']))
+                        return None
+                    if left_at > departed_cutoff[gid]:
+                        return None
+                    return 'archive' if policies[gid]['archive'] else 'delete'
+
+                def warning_selector(record):
+                    gid = record.get('guild_id')
+                    if gid not in warning_cutoff:
+                        return None
+                    timestamp = _parse_time(record.get('timestamp'))
+                    if timestamp is None or timestamp > warning_cutoff[gid]:
+                        return None
+                    return 'archive' if policies[gid]['archive'] else 'delete'
+
+                def departure_selector(record):
+                    gid = record.get('guild_id')
+                    left_at = _parse_time(record.get('left_at'))
+                    if gid not in departed_cutoff or left_at is None or left_at > departed_cutoff[gid]:
+                        return None
+                    return 'delete'
+
+                for key in MEMBER_DATASETS:
+                    await self._prune(report, key, member_selector)
+                await self._prune(report, 'warnings', warning_selector)
+                await self._prune(report, 'departures', departure_selector)
+
+                # 離線期間離開的成員：從現在開始計算保留期限
+                if newly_departed:
+                    entries = [(gid, uid, now.isoformat()) for gid, uid in newly_departed]
+                    await asyncio.to_thread(db.mark_departed_many, entries)
+
+            report['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            report['bytes_reclaimed'] = sum(d['bytes_reclaimed'] for d in report['datasets'].values())
+            self.last_report = report
+
+            removed = sum(d['removed'] for d in report['datasets'].values())
+            logger.info(
+                f"資料壓縮完成: 移除 {removed} 筆記錄, 釋放 {report['bytes_reclaimed']:,} 位元組, "
+                f"清除 {report['guilds_purged']} 個伺服器, 耗時 {report['elapsed_ms']}ms"
+            )
+            return report
+
+    # ==================== 保留策略 ====================
+    @commands.hybrid_command(name="retention", description="查看或設定資料保留策略")
+    @commands.has_permissions(administrator=True)
+    @app_commands.describe(
+        departed_days="成員離開多少天後移除其等級/經濟資料 (0 為不移除)",
+        warning_days="警告保留天數 (0 為永久保留)",
+        archive="移除前是否封存"
+    )
+    async def retention(
+        self,
+        ctx: commands.Context,
+        departed_days: Optional[int] = None,
+        warning_days: Optional[int] = None,
+        archive: Optional[bool] = None
+    ):
+        """查看或設定資料保留策略"""
+        if any(days is not None and days < 0 for days in (departed_days, warning_days)):
+            return await ctx.send(
+                embed=create_embed(
+                    title=f"{Emojis.ERROR} 錯誤",
+                    description="天數不能小於 0",
+                    color=Colors.ERROR
+                )
+            )
+
+        updates = {}
+        if departed_days is not None:
+            updates['retention_departed_days'] = departed_days
+        if warning_days is not None:
+            updates['retention_warning_days'] = warning_days
+        if archive is not None:
+            updates['retention_archive'] = archive
+
+        if updates:
+            db.set_guild_settings(ctx.guild.id, **updates)
+            logger.info(f"{ctx.author} 更新了資料保留策略: {updates}")
+
+        policy = self.get_policy(ctx.guild.id)
+        embed = create_embed(
+            title=f"{Emojis.SUCCESS} 資料保留策略已更新" if updates else "🗄️ 資料保留策略",
+            color=Colors.SUCCESS if updates else Colors.INFO
+        )
+        embed.add_field(
+            name="離開成員資料",
+            value=f"{policy['departed_days']} 天後移除" if policy['departed_days'] else "永久保留",
+            inline=True
+        )
+        embed.add_field(
+            name="警告記錄",
+            value=f"保留 {policy['warning_days']} 天" if policy['warning_days'] else "永久保留",
+            inline=True
+        )
+        embed.add_field(name="封存", value="是" if policy['archive'] else "否", inline=True)
+        await ctx.send(embed=embed)
+
+    # ==================== 手動壓縮 ====================
+    @commands.command(name="compact", hidden=True)
+    @commands.is_owner()
+    async def compact(self, ctx: commands.Context):
+        """立即執行資料壓縮"""
+        if self.running.locked():
+            return await ctx.send("⏳ 資料壓縮正在進行中")
+
+        await ctx.send("⏳ 正在執行資料壓縮...")
+        report = await self.run_compaction()
+
+        embed = create_embed(
+            title=f"{Emojis.SUCCESS} 資料壓縮完成",
+            description=(
+                f"釋放空間: **{report['bytes_reclaimed']:,}** 位元組\n"
+                f"清除伺服器: **{report['guilds_purged']}** 個\n"
+                f"耗時: **{report['elapsed_ms']}ms**"
+            ),
+            color=Colors.SUCCESS
+        )
+        for key, stats in report['datasets'].items():
+            if stats['removed']:
+                embed.add_field(
+                    name=key,
+                    value=f"移除 {stats['removed']} 筆 (封存 {stats['archived']})\n{stats['bytes_reclaimed']:,} B",
+                    inline=True
+                )
+        await ctx.send(embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Maintenance(bot))
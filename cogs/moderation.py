@@ -446,6 +446,10 @@ class Moderation(commands.Cog):
         
         try:
             await ctx.channel.edit(slowmode_delay=seconds)
+            # 手動設定後不再由自動慢速模式調整此頻道
+            auto_slowmode = self.bot.get_cog('AutoSlowmode')
+            if auto_slowmode is not None:
+                auto_slowmode.release(ctx.channel.id)
             
             if seconds == 0:
                 description = f"{ctx.channel.mention} 的慢速模式已關閉"
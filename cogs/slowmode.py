@@ -0,0 +1,241 @@
+"""
+自動慢速模式模組 - 依頻道即時訊息量自動調整慢速模式
+包括: 固定時間桶訊息速率統計、分級套用/放寬（含遲滯）、批次頻道編輯
+"""
+import discord
+from discord.ext import commands, tasks
+from discord import app_commands
+from typing import Optional, Dict, Set
+import asyncio
+import logging
+import time
+
+from utils.database import db
+from utils.helpers import create_embed
+from utils.tracking import MessageRateTracker
+from config import (
+    Colors, Emojis, TRACKER_MAX_ENTRIES,
+    AUTO_SLOWMODE_BUCKET_SECONDS, AUTO_SLOWMODE_BUCKET_COUNT, AUTO_SLOWMODE_THRESHOLD, AUTO_SLOWMODE_LEVELS,
+    AUTO_SLOWMODE_RELAX_RATIO, AUTO_SLOWMODE_HOLD_SECONDS, AUTO_SLOWMODE_CHECK_SECONDS, AUTO_SLOWMODE_MAX_EDITS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AutoSlowmode(commands.Cog):
+    """自動慢速模式"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.rates = MessageRateTracker(
+            bucket_seconds=AUTO_SLOWMODE_BUCKET_SECONDS,
+            bucket_count=AUTO_SLOWMODE_BUCKET_COUNT,
+            max_keys=TRACKER_MAX_ENTRIES
+        )
+        self.active: Set[int] = set()  # 上次檢查後有新訊息的頻道
+        # 由本模組調整中的頻道：頻道 ID -> {'level': 等級, 'delay': 目前秒數, 'previous': 原本秒數, 'since': 變更時間}
+        self.managed: Dict[int, Dict] = {}
+        self.counters = {'applied': 0, 'relaxed': 0, 'deferred': 0, 'failed': 0}
+        self.evaluate.start()
+
+    def cog_unload(self):
+        self.evaluate.cancel()
+
+    def get_threshold(self, settings: dict) -> int:
+        """第一級的觸發門檻（視窗內訊息數）；第 n 級為 門檻 * 2^(n-1)"""
+        return settings.get('auto_slowmode_threshold', AUTO_SLOWMODE_THRESHOLD)
+
+    def target_level(self, rate: int, threshold: int, level: int, held: float) -> int:
+        """
+        計算頻道應處的等級：升級可一次跳多級，降級每次一級且需低於該級門檻的一定比例並維持一段時間
+
+        Args:
+            rate: 視窗內訊息數
+            threshold: 第一級門檻
+            level: 目前等級（0 為未啟用）
+            held: 已維持目前等級的秒數
+        """
+        target = level
+        while target < len(AUTO_SLOWMODE_LEVELS) and rate >= threshold * 2 ** target:
+            target += 1
+        if (target == level and level > 0 and held >= AUTO_SLOWMODE_HOLD_SECONDS
+                and rate < threshold * 2 ** (level - 1) * AUTO_SLOWMODE_RELAX_RATIO):
+            target = level - 1
+        return target
+
+    def release(self, channel_id: int):
+        """停止調整頻道（例如管理員手動設定了慢速模式）"""
+        state = self.managed.pop(channel_id, None)
+        if state is not None:
+            channel = self.bot.get_channel(channel_id)
+            if channel is not None:
+                self.save_state(channel.guild.id)
+
+    def save_state(self, guild_id: int):
+        """記錄調整中頻道的原本秒數，重新啟動後仍可還原"""
+        channels = {}
+        for channel_id, state in self.managed.items():
+            channel = self.bot.get_channel(channel_id)
+            if channel is not None and channel.guild.id == guild_id:
+                channels[str(channel_id)] = [state['previous'], state['delay']]
+        db.set_guild_settings(guild_id, auto_slowmode_channels=channels)
+
+    # ==================== 訊息統計 ====================
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        """記錄頻道訊息量（只更新計數，實際調整在定期檢查中批次進行）"""
+        if message.author.bot or not message.guild:
+            return
+        settings = db.get_guild_settings(message.guild.id)
+        if not settings.get('auto_slowmode', False):
+            return
+        self.rates.record(message.channel.id)
+        self.active.add(message.channel.id)
+
+    # ==================== 定期檢查 ====================
+    @tasks.loop(seconds=AUTO_SLOWMODE_CHECK_SECONDS)
+    async def evaluate(self):
+        """計算各頻道的目標等級並批次套用"""
+        now = time.monotonic()
+        candidates, self.active = self.active | set(self.managed), set()
+        self.rates.sweep(now)
+
+        edits = []  # (是否為降級, 頻道, 等級, 秒數, 原本秒數)
+        for channel_id in candidates:
+            channel = self.bot.get_channel(channel_id)
+            state = self.managed.get(channel_id)
+            if not isinstance(channel, discord.TextChannel):
+                self.managed.pop(channel_id, None)
+                continue
+
+            if state is not None and channel.slowmode_delay != state['delay']:
+                # 慢速模式被其他人修改，交還給管理員
+                self.release(channel_id)
+                continue
+
+            settings = db.get_guild_settings(channel.guild.id)
+            level = state['level'] if state else 0
+            if not settings.get('auto_slowmode', False):
+                target = 0
+            else:
+                rate = self.rates.rate(channel_id, now)
+                held = now - state['since'] if state else 0
+                target = self.target_level(rate, self.get_threshold(settings), level, held)
+            if target == level:
+                continue
+
+            if target == 0:
+                delay = state['previous']
+            else:
+                delay = AUTO_SLOWMODE_LEVELS[target - 1]
+                if state is None and channel.slowmode_delay >= delay:
+                    continue  # 已手動設定更長的慢速模式
+            # 升級優先於降級
+            edits.append((target <= level, channel, target, delay, channel.slowmode_delay))
+
+        if not edits:
+            return
+        edits.sort(key=lambda edit: edit[0])
+        batch, deferred = edits[:AUTO_SLOWMODE_MAX_EDITS], edits[AUTO_SLOWMODE_MAX_EDITS:]
+        for _, channel, _, _, _ in deferred:
+            self.active.add(channel.id)  # 下次檢查再處理
+        self.counters['deferred'] += len(deferred)
+
+        results = await asyncio.gather(
+            *(channel.edit(slowmode_delay=delay, reason="自動慢速模式") for _, channel, _, delay, _ in batch),
+            return_exceptions=True
+        )
+        guilds = set()
+        for (relax, channel, target, delay, previous), result in zip(batch, results):
+            if isinstance(result, Exception):
+                logger.warning(f"調整 {channel} 的慢速模式失敗: {result}")
+                self.counters['failed'] += 1
+                if isinstance(result, discord.Forbidden):
+                    self.managed.pop(channel.id, None)
+                continue
+
+            state = self.managed.get(channel.id)
+            if target == 0:
+                self.managed.pop(channel.id, None)
+            elif state is None:
+                self.managed[channel.id] = {'level': target, 'delay': delay, 'previous': previous, 'since': now}
+            else:
+                state.update(level=target, delay=delay, since=now)
+            self.counters['relaxed' if relax else 'applied'] += 1
+            guilds.add(channel.guild.id)
+            logger.info(f"{channel.guild.name} #{channel} 自動慢速模式: 等級 {target} ({delay} 秒)")
+
+        for guild_id in guilds:
+            self.save_state(guild_id)
+
+    @evaluate.before_loop
+    async def before_evaluate(self):
+        await self.bot.wait_until_ready()
+        # 上次執行時仍在調整中的頻道（例如機器人重新啟動），還原原本的秒數
+        for guild in self.bot.guilds:
+            channels = db.get_guild_settings(guild.id).get('auto_slowmode_channels')
+            if not channels:
+                continue
+            for channel_id, (previous, delay) in channels.items():
+                channel = guild.get_channel(int(channel_id))
+                if isinstance(channel, discord.TextChannel) and channel.slowmode_delay == delay:
+                    try:
+                        await channel.edit(slowmode_delay=previous, reason="自動慢速模式：還原")
+                    except Exception as e:
+                        logger.error(f"還原 {channel} 的慢速模式失敗: {e}")
+            db.set_guild_settings(guild.id, auto_slowmode_channels={})
+
+    # ==================== 自動慢速模式設定 ====================
+    @commands.hybrid_command(name="autoslowmode", description="查看或設定自動慢速模式")
+    @commands.has_permissions(administrator=True)
+    @app_commands.describe(
+        enabled="是否啟用自動慢速模式",
+        threshold=f"{AUTO_SLOWMODE_BUCKET_SECONDS * AUTO_SLOWMODE_BUCKET_COUNT} 秒內訊息數達此數量開始慢速模式"
+    )
+    async def autoslowmode(self, ctx: commands.Context, enabled: Optional[bool] = None, threshold: Optional[int] = None):
+        """查看或設定自動慢速模式"""
+        if threshold is not None and not 5 <= threshold <= 1000:
+            return await ctx.send(
+                embed=create_embed(
+                    title=f"{Emojis.ERROR} 錯誤",
+                    description="門檻必須介於 5-1000",
+                    color=Colors.ERROR
+                )
+            )
+
+        updates = {}
+        if enabled is not None:
+            updates['auto_slowmode'] = enabled
+        if threshold is not None:
+            updates['auto_slowmode_threshold'] = threshold
+
+        if updates:
+            db.set_guild_settings(ctx.guild.id, **updates)
+            logger.info(f"{ctx.author} 更新了自動慢速模式設定: {updates}")
+
+        settings = db.get_guild_settings(ctx.guild.id)
+        threshold = self.get_threshold(settings)
+        window = f"{self.rates.window_seconds:.0f} 秒"
+        levels = "\n".join(
+            f"{window}內 {threshold * 2 ** index} 則 → {delay} 秒"
+            for index, delay in enumerate(AUTO_SLOWMODE_LEVELS)
+        )
+        managed = []
+        for channel_id, state in self.managed.items():
+            channel = ctx.guild.get_channel(channel_id)
+            if channel is not None:
+                managed.append(f"{channel.mention}: {state['delay']} 秒")
+
+        embed = create_embed(
+            title=f"{Emojis.SUCCESS} 自動慢速模式設定已更新" if updates else "🐢 自動慢速模式",
+            color=Colors.SUCCESS if updates else Colors.INFO
+        )
+        embed.add_field(name="狀態", value="啟用" if settings.get('auto_slowmode', False) else "停用", inline=True)
+        embed.add_field(name="目前頻道速率", value=f"{window}內 {self.rates.rate(ctx.channel.id)} 則", inline=True)
+        embed.add_field(name="等級", value=levels, inline=False)
+        embed.add_field(name="調整中的頻道", value="\n".join(managed[:20]) or "無", inline=False)
+        await ctx.send(embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(AutoSlowmode(bot))
@@ -2,13 +2,24 @@
 歡迎系統模組 - 處理成員加入/離開訊息
 """
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
+import io
 import logging
+from typing import Optional
 
 from utils.database import db
 from utils.helpers import create_embed
-from config import Colors, Emojis
+from utils.role_queue import RoleAssignmentQueue
+from utils.tracking import JoinRateTracker
+from utils.welcome_card import PILLOW_AVAILABLE, WelcomeCardRenderer, is_public_url
+from config import (
+    Colors, Emojis, TRACKER_MAX_ENTRIES,
+    WELCOME_BURST_BUCKET_SECONDS, WELCOME_BURST_BUCKET_COUNT, WELCOME_BURST_THRESHOLD,
+    WELCOME_BATCH_SECONDS, WELCOME_BATCH_SIZE,
+    AUTOROLE_RATE_PER_SECOND, AUTOROLE_MAX_RETRIES, AUTOROLE_MAX_PENDING,
+    WELCOME_CARD_WORKERS, WELCOME_CARD_TEMPLATE_CACHE, WELCOME_CARD_AVATAR_CACHE, WELCOME_CARD_FONT_PATH
+)
 
 logger = logging.getLogger(__name__)
 
@@ -18,13 +29,74 @@ class Welcome(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
+        self.join_rates = JoinRateTracker(
+            bucket_seconds=WELCOME_BURST_BUCKET_SECONDS,
+            bucket_count=WELCOME_BURST_BUCKET_COUNT,
+            max_keys=TRACKER_MAX_ENTRIES
+        )
+        self.pending = {}  # 加入高峰期間等待合併歡迎的成員：伺服器 ID -> [成員]
+        # 所有自動角色都經由同一個速率限制佇列添加
+        self.autoroles = RoleAssignmentQueue(
+            rate_per_second=AUTOROLE_RATE_PER_SECOND,
+            max_retries=AUTOROLE_MAX_RETRIES,
+            max_pending=AUTOROLE_MAX_PENDING
+        )
+        self.cards = WelcomeCardRenderer(
+            workers=WELCOME_CARD_WORKERS,
+            template_cache_size=WELCOME_CARD_TEMPLATE_CACHE,
+            avatar_cache_size=WELCOME_CARD_AVATAR_CACHE,
+            font_path=WELCOME_CARD_FONT_PATH
+        )
+        self.flush_batches.start()
+    
+    async def cog_unload(self):
+        self.flush_batches.cancel()
+        self.autoroles.close()
+        await self.cards.close()
+    
+    def is_raid_active(self, guild_id: int) -> bool:
+        """檢查伺服器是否處於突襲模式"""
+        antiraid = self.bot.get_cog('AntiRaid')
+        return antiraid is not None and antiraid.is_raid_active(guild_id)
+    
+    def is_burst(self, guild_id: int, joins: int) -> bool:
+        """加入速率過高（或突襲模式中）時改為合併歡迎訊息"""
+        return joins >= WELCOME_BURST_THRESHOLD or self.is_raid_active(guild_id)
+    
+    async def render_card(self, member: discord.Member, settings: dict) -> Optional[discord.File]:
+        """產生成員的歡迎卡片（未啟用、未安裝 Pillow 或失敗時為 None）"""
+        if not settings.get('welcome_card') or not self.cards.enabled:
+            return None
+        # 內建字型沒有中文字形
+        subtitle = f"第 {member.guild.member_count} 位成員" if WELCOME_CARD_FONT_PATH else f"Member #{member.guild.member_count}"
+        data = await self.cards.render(
+            member.guild.id, member.display_avatar, member.display_name, subtitle,
+            accent=Colors.DEFAULT, background_url=settings.get('welcome_card_background')
+        )
+        if data is None:
+            return None
+        return discord.File(io.BytesIO(data), filename="welcome.png")
     
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
         """成員加入事件"""
-        # 獲取歡迎頻道
+        account_age = (discord.utils.utcnow() - member.created_at).total_seconds()
+        joins, _ = self.join_rates.record(member.guild.id, account_age)
         settings = db.get_guild_settings(member.guild.id)
         
+        # 自動角色交給佇列以固定速率添加
+        if settings.get('autorole_id'):
+            role = member.guild.get_role(settings['autorole_id'])
+            if role:
+                self.autoroles.enqueue(member, role)
+        
+        # 加入高峰期間改為合併處理，避免每位成員各發送一次 API 請求
+        # （已有成員在等待時也一併排隊，維持歡迎順序）
+        if self.is_burst(member.guild.id, joins) or member.guild.id in self.pending:
+            self.pending.setdefault(member.guild.id, []).append(member)
+            logger.info(f"{member} 加入了 {member.guild.name} (加入高峰，合併歡迎)")
+            return
+        
         if settings.get('welcome_channel_id'):
             channel = member.guild.get_channel(settings['welcome_channel_id'])
             if channel:
@@ -40,20 +112,52 @@ class Welcome(commands.Cog):
                     value=f"<t:{int(member.created_at.timestamp())}:R>",
                     inline=True
                 )
-                await channel.send(embed=embed)
-        
-        # 自動角色
-        if settings.get('autorole_id'):
-            role = member.guild.get_role(settings['autorole_id'])
-            if role:
-                try:
-                    await member.add_roles(role, reason="自動角色")
-                    logger.info(f"為 {member} 添加了自動角色 {role.name}")
-                except Exception as e:
-                    logger.error(f"添加自動角色失敗: {e}")
+                card = await self.render_card(member, settings)
+                if card is not None:
+                    embed.set_thumbnail(url=None)
+                    embed.set_image(url="attachment://welcome.png")
+                    await channel.send(embed=embed, file=card)
+                else:
+                    await channel.send(embed=embed)
         
         logger.info(f"{member} 加入了 {member.guild.name}")
     
+    @tasks.loop(seconds=WELCOME_BATCH_SECONDS)
+    async def flush_batches(self):
+        """合併發送加入高峰期間的歡迎訊息"""
+        self.join_rates.sweep()
+        pending, self.pending = self.pending, {}
+        for guild_id, members in pending.items():
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                continue
+            # 批次處理前已離開（或被踢出）的成員不再處理
+            members = [m for m in members if guild.get_member(m.id) is not None]
+            if not members:
+                continue
+            
+            settings = db.get_guild_settings(guild_id)
+            channel = guild.get_channel(settings['welcome_channel_id']) if settings.get('welcome_channel_id') else None
+            if channel:
+                for i in range(0, len(members), WELCOME_BATCH_SIZE):
+                    batch = members[i:i + WELCOME_BATCH_SIZE]
+                    try:
+                        await channel.send(
+                            embed=create_embed(
+                                title=f"{Emojis.SUCCESS} 歡迎加入!",
+                                description=f"歡迎 {len(batch)} 位新成員來到 **{guild.name}**!\n\n" + " ".join(m.mention for m in batch),
+                                color=Colors.SUCCESS
+                            ),
+                            allowed_mentions=discord.AllowedMentions(users=False)
+                        )
+                    except Exception as e:
+                        logger.error(f"發送批次歡迎訊息失敗: {e}")
+            logger.info(f"{guild.name} 合併歡迎了 {len(members)} 位新成員")
+    
+    @flush_batches.before_loop
+    async def before_flush_batches(self):
+        await self.bot.wait_until_ready()
+    
     @commands.Cog.listener()
     async def on_member_remove(self, member: discord.Member):
         """成員離開事件"""
@@ -119,6 +223,53 @@ class Welcome(commands.Cog):
         )
         await ctx.send(embed=embed)
         logger.info(f"{ctx.author} 設定自動角色為 {role}")
+    
+    # ==================== 歡迎卡片 ====================
+    @commands.hybrid_command(name="welcomecard", description="設定歡迎卡片圖片")
+    @commands.has_permissions(administrator=True)
+    @app_commands.describe(enabled="是否在歡迎訊息中附上卡片圖片", background="背景圖片網址（default 為預設漸層）")
+    async def welcomecard(self, ctx: commands.Context, enabled: bool, background: Optional[str] = None):
+        """設定歡迎卡片"""
+        if enabled and not PILLOW_AVAILABLE:
+            return await ctx.send(
+                embed=create_embed(
+                    title=f"{Emojis.ERROR} 錯誤",
+                    description="歡迎卡片需要安裝 Pillow (`pip install Pillow`)",
+                    color=Colors.ERROR
+                )
+            )
+        
+        updates = {'welcome_card': enabled}
+        if background is not None:
+            if background.lower() == "default":
+                updates['welcome_card_background'] = None
+            elif is_public_url(background):
+                updates['welcome_card_background'] = background
+            else:
+                return await ctx.send(
+                    embed=create_embed(
+                        title=f"{Emojis.ERROR} 錯誤",
+                        description="背景必須是公開的圖片網址，或輸入 `default` 使用預設背景",
+                        color=Colors.ERROR
+                    )
+                )
+            # 背景變更後重新繪製模板
+            self.cards.forget_guild(ctx.guild.id)
+        db.set_guild_settings(ctx.guild.id, **updates)
+        
+        settings = db.get_guild_settings(ctx.guild.id)
+        embed = create_embed(
+            title=f"{Emojis.SUCCESS} 歡迎卡片已{'啟用' if enabled else '停用'}",
+            description=f"背景: {settings.get('welcome_card_background') or '預設漸層'}",
+            color=Colors.SUCCESS
+        )
+        card = await self.render_card(ctx.author, settings) if enabled else None
+        if card is not None:
+            embed.set_image(url="attachment://welcome.png")
+            await ctx.send(embed=embed, file=card)
+        else:
+            await ctx.send(embed=embed)
+        logger.info(f"{ctx.author} 設定歡迎卡片: {updates}")
 
 
 async def setup(bot):
@@ -49,6 +49,8 @@ class Emojis:
 
 # 資料庫設定
 DATABASE_PATH = "data/bot_database.db"
+STORAGE_MODE = os.getenv("STORAGE_MODE", "local")  # local: 單一行程；multiprocess: 多個行程（分片叢集）共用 data/
+CAS_MAX_RETRIES = 5  # 版本衝突時的最大重試次數
 
 # 日誌設定
 LOG_FILE = "logs/bot.log"
@@ -70,6 +72,95 @@ WORK_REWARD_MAX = 200  # 工作最大獎勵
 MAX_WARNINGS = 3  # 最大警告次數
 AUTO_BAN_ON_MAX_WARNINGS = True  # 達到最大警告次數自動封禁
 
+# 自動管理設定（垃圾訊息門檻可在各伺服器以 automodset 指令覆蓋）
+SPAM_MAX_MESSAGES = 5  # 視窗內訊息數達此數量視為洗版
+SPAM_WINDOW_SECONDS = 5  # 洗版偵測視窗（秒）
+SPAM_TIMEOUT_MINUTES = 5  # 洗版禁言時間（分鐘）
+MENTION_SPAM_THRESHOLD = 6  # 單則訊息提及用戶與身分組數達此數量視為大量提及
+MENTION_SPAM_TIMEOUT_MINUTES = 10  # 大量提及禁言時間（分鐘）
+EMOJI_FLOOD_THRESHOLD = 20  # 單則訊息表情符號數達此數量視為洗版
+ZALGO_THRESHOLD = 30  # 單則訊息組合附加符號數達此數量視為 zalgo 文字
+TRACKER_SWEEP_SECONDS = 60  # 清理閒置追蹤資料的間隔（秒）
+MAX_BANNED_WORDS = 5000  # 每個伺服器最多的違禁詞數量
+DUPLICATE_HISTORY_SIZE = 5  # 每位成員在每個頻道記錄的最近訊息數
+DUPLICATE_THRESHOLD = 2  # 最近訊息中相同內容達此數量即視為重複
+NEAR_DUPLICATE_THRESHOLD = 4  # 同頻道視窗內相似訊息達此數量即視為洗版（跨成員）
+NEAR_DUPLICATE_WINDOW_SECONDS = 30  # 相似訊息比對視窗（秒）
+NEAR_DUPLICATE_HISTORY_SIZE = 50  # 每個頻道保留的訊息簽章數
+NEAR_DUPLICATE_SIMILARITY = 0.6  # MinHash 估計相似度達此值視為相似
+NEAR_DUPLICATE_MIN_LENGTH = 20  # 太短的訊息不做相似比對
+MAX_LINK_RULES = 2000  # 每個伺服器最多的網域規則數量
+SHORTENER_CACHE_SIZE = 2048  # 短網址展開結果快取數量
+SHORTENER_CACHE_TTL = 3600  # 短網址展開結果保留秒數
+SHORTENER_TIMEOUT_SECONDS = 3  # 展開短網址的逾時（秒）
+IMAGE_HASH_DISTANCE = 6  # 圖片感知雜湊漢明距離不超過此值視為相同圖片
+IMAGE_HASH_MAX_BYTES = 8 * 1024 * 1024  # 超過此大小的附件不做比對
+IMAGE_HASH_MAX_ATTACHMENTS = 4  # 每則訊息最多比對的附件數
+IMAGE_HASH_CACHE_SIZE = 4096  # 圖片雜湊快取數量
+MAX_BLOCKED_IMAGES = 500  # 每個伺服器最多的封鎖圖片數量
+AUTOMOD_WORKERS = 2  # 內容分析工作行程數量（0 為停用，全部在事件循環中檢查）
+AUTOMOD_OFFLOAD_MIN_LENGTH = 400  # 訊息長度達此值才交給工作行程分析
+AUTOMOD_DEADLINE_MS = 250  # 每則訊息的分析截止時間（毫秒），逾時只執行便宜的規則
+AUTOMOD_MAX_PENDING = 32  # 同時分析中的訊息上限，超過時只執行便宜的規則
+TRACKER_IDLE_SECONDS = 300  # 追蹤資料閒置多久後淘汰（秒）
+TRACKER_MAX_ENTRIES = 10000  # 最多追蹤的項目數
+
+# 防突襲設定（門檻可在各伺服器以 antiraid 指令覆蓋）
+RAID_BUCKET_SECONDS = 10  # 加入統計的時間桶長度（秒）
+RAID_BUCKET_COUNT = 6  # 時間桶數量（統計視窗 = 60 秒）
+RAID_JOIN_THRESHOLD = 10  # 視窗內加入人數達此數量視為突襲
+RAID_YOUNG_ACCOUNT_THRESHOLD = 5  # 視窗內新帳號達此數量視為突襲
+RAID_YOUNG_ACCOUNT_DAYS = 7  # 帳號建立未滿此天數視為新帳號
+RAID_COOLDOWN_MINUTES = 10  # 加入速率恢復正常多久後解除突襲模式（分鐘）
+
+# 歡迎設定
+WELCOME_BURST_BUCKET_SECONDS = 10  # 加入統計的時間桶長度（秒）
+WELCOME_BURST_BUCKET_COUNT = 3  # 時間桶數量（統計視窗 = 30 秒）
+WELCOME_BURST_THRESHOLD = 5  # 視窗內加入人數達此數量（或突襲模式中）改為合併歡迎訊息
+WELCOME_BATCH_SECONDS = 15  # 合併歡迎訊息的間隔（秒）
+WELCOME_BATCH_SIZE = 20  # 每則合併歡迎訊息最多提及的成員數
+AUTOROLE_RATE_PER_SECOND = 2  # 每秒最多添加的自動角色數
+AUTOROLE_MAX_RETRIES = 3  # 自動角色遇到速率限制或伺服器錯誤時的重試次數
+AUTOROLE_MAX_PENDING = 5000  # 最多排隊的自動角色數
+WELCOME_CARD_WORKERS = 2  # 歡迎卡片繪製執行緒數量
+WELCOME_CARD_TEMPLATE_CACHE = 32  # 快取的伺服器背景模板數量
+WELCOME_CARD_AVATAR_CACHE = 512  # 快取的頭像數量（依頭像雜湊）
+WELCOME_CARD_FONT_PATH = None  # 歡迎卡片字型檔，例如 "assets/NotoSansTC-Bold.otf"（顯示中文需要 CJK 字型，None 為 Pillow 內建字型）
+
+# 日誌發送設定
+LOG_FLUSH_SECONDS = 2  # 日誌未滿一則訊息（10 個 embed）時最多等待的秒數
+LOG_SEND_INTERVAL = 1  # 同一日誌頻道兩次發送之間的最短間隔（秒）
+LOG_MAX_PENDING = 500  # 每個日誌頻道最多排隊的日誌數，超過時捨棄最舊的
+LOG_WEBHOOK_POOL_SIZE = 3  # 以 webhook 發送日誌時每個日誌頻道使用的 webhook 數量（輪流發送）
+MESSAGE_CACHE_MAX_MB = 32  # 訊息內容快取（供刪除/編輯日誌）的記憶體上限（MB）
+MESSAGE_CACHE_GUILD_QUOTA_MB = 4  # 每個伺服器的訊息快取上限（MB）
+MESSAGE_CACHE_SPILL_PATH = None  # 淘汰的訊息寫入此 SQLite 檔案，例如 "data/message_cache.db"（None 為直接捨棄）
+MESSAGE_CACHE_SPILL_MAX_ENTRIES = 200000  # 磁碟上最多保留的訊息數
+MESSAGE_CACHE_FLUSH_SECONDS = 30  # 淘汰的訊息寫入磁碟的間隔（秒）
+AUDIT_DB_PATH = "data/audit_log.db"  # 稽核日誌資料庫（logsearch 指令搜尋）
+AUDIT_BATCH_SIZE = 200  # 暫存事件達此數量時提早寫入
+AUDIT_FLUSH_SECONDS = 5  # 暫存事件寫入資料庫的間隔（秒）
+AUDIT_RETENTION_DAYS = 90  # 稽核日誌保留天數（0 為永久保留）
+AUDIT_PAGE_SIZE = 10  # logsearch 每頁顯示的事件數
+
+# 自動慢速模式設定（門檻可在各伺服器以 autoslowmode 指令覆蓋）
+AUTO_SLOWMODE_BUCKET_SECONDS = 10  # 訊息統計的時間桶長度（秒）
+AUTO_SLOWMODE_BUCKET_COUNT = 6  # 時間桶數量（統計視窗 = 60 秒）
+AUTO_SLOWMODE_THRESHOLD = 40  # 視窗內訊息數達此數量進入第一級，之後每級門檻加倍
+AUTO_SLOWMODE_LEVELS = (5, 10, 30, 60)  # 各級慢速模式秒數
+AUTO_SLOWMODE_RELAX_RATIO = 0.5  # 訊息數低於目前等級門檻的此比例才降一級（遲滯）
+AUTO_SLOWMODE_HOLD_SECONDS = 120  # 每個等級至少維持的秒數
+AUTO_SLOWMODE_CHECK_SECONDS = 10  # 檢查與批次套用的間隔（秒）
+AUTO_SLOWMODE_MAX_EDITS = 5  # 每次檢查最多編輯的頻道數，其餘延到下次
+
+# 資料保留設定（可在各伺服器以 retention 指令覆蓋）
+RETENTION_INTERVAL_HOURS = 24  # 壓縮工作執行間隔（小時）
+RETENTION_BATCH_SIZE = 25  # 每批處理的伺服器數量
+RETENTION_DEPARTED_DAYS = 30  # 成員離開多少天後移除等級/經濟資料（0 為不移除）
+RETENTION_WARNING_DAYS = 365  # 警告保留天數（0 為永久保留）
+RETENTION_ARCHIVE = True  # 移除前是否封存到 data/archive/
+GUILD_DATA_GRACE_DAYS = 7  # 機器人離開伺服器多少天後移除該伺服器的所有資料
+
 # 歡迎訊息設定
 WELCOME_CHANNEL_NAME = "歡迎"  # 預設歡迎頻道名稱
 FAREWELL_CHANNEL_NAME = "歡迎"  # 預設離開頻道名稱
@@ -85,7 +176,10 @@ INITIAL_COGS = [
     "cogs.music",          # 音樂播放
     "cogs.reaction_roles", # 反應角色
     "cogs.automod",        # 自動管理
+    "cogs.antiraid",       # 防突襲
+    "cogs.slowmode",       # 自動慢速模式
     "cogs.logging",        # 日誌記錄
     "cogs.api_server",     # API 伺服器
     "cogs.n8n",            # n8n 整合
+    "cogs.maintenance",    # 資料維護
 ]
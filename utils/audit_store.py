@@ -0,0 +1,212 @@
+"""
+稽核日誌模組 - 以 SQLite 保存伺服器事件並建立全文索引
+事件先暫存在記憶體，定期以單一交易批次寫入；內容以 FTS5 索引（支援時使用 trigram，中文也能以子字串搜尋）
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MIN_TRIGRAM = 3  # trigram 索引只能比對 3 個字元以上的詞
+
+
+class AuditStore:
+    """伺服器事件的稽核資料庫"""
+
+    def __init__(self, path: str, batch_size: int = 200):
+        """
+        Args:
+            path: SQLite 檔案路徑
+            batch_size: 暫存的事件達此數量時應提早寫入（見 needs_flush）
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self._pending: List[tuple] = []
+        # 寫入在執行緒中進行，連線以鎖保護
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self.trigram = self._create_schema()
+        self.counters = {'recorded': 0, 'written': 0, 'flushes': 0, 'errors': 0}
+
+    def _create_schema(self) -> bool:
+        """建立資料表，回傳是否使用 trigram 索引"""
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "id INTEGER PRIMARY KEY, guild_id INTEGER NOT NULL, type TEXT NOT NULL, "
+                "author_id INTEGER, channel_id INTEGER, created_at REAL NOT NULL, content TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS events_guild ON events (guild_id, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS events_author ON events (guild_id, author_id, id)")
+            existing = self._conn.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'events_fts'"
+            ).fetchone()
+            if existing is None:
+                try:
+                    self._conn.execute(
+                        "CREATE VIRTUAL TABLE events_fts USING fts5("
+                        "content, content='events', content_rowid='id', tokenize='trigram')"
+                    )
+                except sqlite3.OperationalError:
+                    # SQLite 3.34 以前沒有 trigram
+                    self._conn.execute(
+                        "CREATE VIRTUAL TABLE events_fts USING fts5(content, content='events', content_rowid='id')"
+                    )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS events_ai AFTER INSERT ON events BEGIN "
+                "INSERT INTO events_fts (rowid, content) VALUES (new.id, new.content); END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS events_ad AFTER DELETE ON events BEGIN "
+                "INSERT INTO events_fts (events_fts, rowid, content) VALUES ('delete', old.id, old.content); END"
+            )
+            sql = self._conn.execute("SELECT sql FROM sqlite_master WHERE name = 'events_fts'").fetchone()[0]
+        return 'trigram' in sql
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    @property
+    def needs_flush(self) -> bool:
+        return len(self._pending) >= self.batch_size
+
+    def record(self, guild_id: int, event_type: str, author_id: Optional[int] = None,
+               channel_id: Optional[int] = None, content: str = "", created_at: Optional[float] = None):
+        """
+        暫存一筆事件（不寫入磁碟）
+
+        Args:
+            guild_id: 伺服器 ID
+            event_type: 事件類型
+            author_id: 相關成員 ID
+            channel_id: 相關頻道 ID
+            content: 可搜尋的內容
+            created_at: 事件時間（UNIX 時間戳，預設為現在）
+        """
+        self._pending.append((
+            guild_id, event_type, author_id, channel_id,
+            time.time() if created_at is None else created_at, content
+        ))
+        self.counters['recorded'] += 1
+
+    def drain(self) -> List[tuple]:
+        """取出暫存的事件（在事件循環中呼叫，再交給 write 在執行緒中寫入）"""
+        pending, self._pending = self._pending, []
+        return pending
+
+    def write(self, events: List[tuple]) -> int:
+        """
+        以單一交易寫入事件（會阻塞，請在執行緒中呼叫）
+
+        Returns:
+            寫入的數量
+        """
+        if not events:
+            return 0
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT INTO events (guild_id, type, author_id, channel_id, created_at, content) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    events
+                )
+        except sqlite3.Error as e:
+            logger.error(f"寫入稽核日誌失敗 ({len(events)} 筆): {e}")
+            self.counters['errors'] += 1
+            return 0
+        self.counters['written'] += len(events)
+        self.counters['flushes'] += 1
+        return len(events)
+
+    def flush(self) -> int:
+        """同步寫入所有暫存的事件"""
+        return self.write(self.drain())
+
+    def _text_filter(self, text: str) -> Tuple[str, list]:
+        """將搜尋文字轉為 SQL 條件（每個詞都必須出現）"""
+        clauses, params, terms = [], [], []
+        for word in text.split():
+            if self.trigram and len(word) < _MIN_TRIGRAM:
+                clauses.append("e.content LIKE ? ESCAPE '\\'")
+                params.append('%' + word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+            else:
+                terms.append('"' + word.replace('"', '""') + '"')
+        if terms:
+            clauses.append("e.id IN (SELECT rowid FROM events_fts WHERE events_fts MATCH ?)")
+            params.append(" ".join(terms))
+        return " AND ".join(clauses), params
+
+    def search(self, guild_id: int, text: str = "", event_type: Optional[str] = None,
+               author_id: Optional[int] = None, channel_id: Optional[int] = None,
+               limit: int = 10, offset: int = 0) -> Tuple[int, List[Dict]]:
+        """
+        搜尋事件（會阻塞，請在執行緒中呼叫）
+
+        Returns:
+            (符合的總數, 本頁事件，由新到舊)
+        """
+        clauses, params = ["e.guild_id = ?"], [guild_id]
+        if event_type:
+            clauses.append("e.type = ?")
+            params.append(event_type)
+        if author_id:
+            clauses.append("e.author_id = ?")
+            params.append(author_id)
+        if channel_id:
+            clauses.append("e.channel_id = ?")
+            params.append(channel_id)
+        if text.strip():
+            clause, text_params = self._text_filter(text)
+            clauses.append(clause)
+            params.extend(text_params)
+        where = " AND ".join(clauses)
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM events e WHERE {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT e.id, e.type, e.author_id, e.channel_id, e.created_at, e.content FROM events e "
+                f"WHERE {where} ORDER BY e.id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return total, [
+            {'id': row[0], 'type': row[1], 'author_id': row[2], 'channel_id': row[3], 'created_at': row[4],
+             'content': row[5]}
+            for row in rows
+        ]
+
+    def prune(self, before: float, guild_id: Optional[int] = None) -> int:
+        """
+        刪除早於指定時間的事件（會阻塞，請在執行緒中呼叫）
+
+        Args:
+            before: UNIX 時間戳
+            guild_id: 只刪除此伺服器（None 為全部）
+
+        Returns:
+            刪除的數量
+        """
+        with self._lock, self._conn:
+            if guild_id is None:
+                cursor = self._conn.execute("DELETE FROM events WHERE created_at < ?", (before,))
+            else:
+                cursor = self._conn.execute(
+                    "DELETE FROM events WHERE guild_id = ? AND created_at < ?", (guild_id, before)
+                )
+        return cursor.rowcount
+
+    def close(self):
+        """寫入剩餘的事件並關閉資料庫"""
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {'pending': self.pending, **self.counters}
@@ -0,0 +1,391 @@
+"""
+自動管理規則模組 - 將每個伺服器的規則編譯成單次掃描的管線
+"""
+import re
+from typing import Optional, List
+
+from utils.tracking import RecentMessageTracker, SlidingWindowTracker, NearDuplicateIndex
+from utils.text_match import AhoCorasick, normalize_text, minhash_signature, count_characters
+from utils.link_filter import LinkPolicy, ShortenerCache, canonical_host, is_shortener
+from utils.image_hash import BKTree
+
+
+class MessagePayload:
+    """規則檢查所需的精簡訊息資料（不依賴 discord 物件）"""
+
+    __slots__ = ('guild_id', 'channel_id', 'author_id', 'content', 'mentions', 'image_hashes')
+
+    def __init__(self, guild_id: int, channel_id: int, author_id: int, content: str,
+                 mentions: int = 0, image_hashes: tuple = ()):
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.content = content
+        self.mentions = mentions  # 提及的用戶與身分組數量
+        self.image_hashes = image_hashes  # 附件圖片的感知雜湊（需先以非同步方式計算）
+
+    @classmethod
+    def from_message(cls, message) -> "MessagePayload":
+        """從 discord.Message 建立"""
+        return cls(
+            guild_id=message.guild.id,
+            channel_id=message.channel.id,
+            author_id=message.author.id,
+            content=message.content,
+            # discord.py 已解析好的提及列表，不需再掃描內容
+            mentions=len(message.mentions) + len(message.role_mentions)
+        )
+
+
+_UNSET = object()
+
+
+class ContentScan:
+    """單次掃描訊息內容取得的統計，供所有規則共用"""
+
+    __slots__ = ('content', 'length', 'upper', 'emoji', 'combining', '_normalized', '_signature', '_banned')
+
+    def __init__(self, content: str, analysis: Optional[dict] = None):
+        """
+        Args:
+            content: 訊息內容
+            analysis: 工作行程預先計算的分析結果（見 utils.automod_workers.analyze_content）
+        """
+        self.content = content
+        self._banned = _UNSET
+        if analysis is not None:
+            self.length = analysis['length']
+            self.upper = analysis['upper']
+            self.emoji = analysis['emoji']
+            self.combining = analysis['combining']
+            self._normalized = analysis['normalized']
+            self._signature = analysis['signature']
+            self._banned = analysis['banned']
+            return
+
+        self.length = len(content)
+        self.upper, self.emoji, self.combining = count_characters(content)
+        self._normalized = None
+        self._signature = None
+
+    @property
+    def normalized(self) -> str:
+        """正規化後的內容（第一次使用時才計算）"""
+        if self._normalized is None:
+            self._normalized = normalize_text(self.content)
+        return self._normalized
+
+    @property
+    def signature(self) -> tuple:
+        """MinHash 簽章（第一次使用時才計算）"""
+        if self._signature is None:
+            self._signature = minhash_signature(self.normalized)
+        return self._signature
+
+    def banned_match(self, automaton: AhoCorasick) -> Optional[str]:
+        """違禁詞比對結果（有預先計算的結果時直接使用）"""
+        if self._banned is _UNSET:
+            self._banned = automaton.search(self.normalized)
+        return self._banned
+
+
+class Verdict:
+    """規則判定結果（每則訊息最多一個，多個規則觸發時合併）"""
+
+    __slots__ = ('rule', 'notice', 'log', 'delete', 'timeout_minutes', 'notice_ttl')
+
+    def __init__(self, rule: str, notice: str, log: str, delete: bool = True,
+                 timeout_minutes: Optional[int] = None, notice_ttl: int = 5):
+        """
+        Args:
+            rule: 觸發的規則名稱
+            notice: 發送到頻道的提示（{mention} 會替換為作者提及）
+            log: 日誌內容（{author} 會替換為作者）
+            delete: 是否刪除訊息
+            timeout_minutes: 禁言分鐘數（None 為不禁言）
+            notice_ttl: 提示訊息保留秒數
+        """
+        self.rule = rule
+        self.notice = notice
+        self.log = log
+        self.delete = delete
+        self.timeout_minutes = timeout_minutes
+        self.notice_ttl = notice_ttl
+
+    def merge(self, other: "Verdict") -> "Verdict":
+        """合併另一個規則的判定：任一個要求刪除就刪除，禁言取較長者，提示保留先觸發的"""
+        timeouts = [minutes for minutes in (self.timeout_minutes, other.timeout_minutes) if minutes]
+        return Verdict(
+            f"{self.rule}, {other.rule}",
+            notice=self.notice,
+            log=f"{self.log}；{other.log}",
+            delete=self.delete or other.delete,
+            timeout_minutes=max(timeouts) if timeouts else None,
+            notice_ttl=max(self.notice_ttl, other.notice_ttl)
+        )
+
+
+class Rule:
+    """規則基底類別"""
+
+    name = ""
+    cost = 0  # 越小越先執行
+    needs_scan = False  # 是否需要 ContentScan
+    expensive = False  # 工作行程滿載時是否略過
+
+    def check(self, payload: MessagePayload, scan: Optional[ContentScan]) -> Optional[Verdict]:
+        raise NotImplementedError
+
+
+class SpamRule(Rule):
+    """短時間內大量訊息"""
+
+    name = "spam"
+    cost = 0
+
+    def __init__(self, tracker: SlidingWindowTracker, max_messages: int, window_seconds: float, timeout_minutes: int):
+        self.tracker = tracker
+        self.max_messages = max_messages
+        self.window_seconds = window_seconds
+        self.timeout_minutes = timeout_minutes
+
+    def check(self, payload, scan):
+        key = (payload.guild_id, payload.author_id)
+        if self.tracker.hit(key, self.window_seconds) < self.max_messages:
+            return None
+        self.tracker.reset(key)
+        return Verdict(
+            self.name,
+            notice=f"{{mention}} 因發送垃圾訊息被靜音 {self.timeout_minutes} 分鐘",
+            log="{author} 因垃圾訊息被靜音",
+            delete=False,
+            timeout_minutes=self.timeout_minutes,
+            notice_ttl=10
+        )
+
+
+class MentionSpamRule(Rule):
+    """大量提及"""
+
+    name = "mention_spam"
+    cost = 0
+
+    def __init__(self, max_mentions: int, timeout_minutes: int):
+        self.max_mentions = max_mentions
+        self.timeout_minutes = timeout_minutes
+
+    def check(self, payload, scan):
+        if payload.mentions < self.max_mentions:
+            return None
+        return Verdict(
+            self.name,
+            notice=f"{{mention}} 因大量提及被靜音 {self.timeout_minutes} 分鐘",
+            log=f"刪除了 {{author}} 提及 {payload.mentions} 人的訊息並靜音",
+            timeout_minutes=self.timeout_minutes,
+            notice_ttl=10
+        )
+
+
+class DuplicateRule(Rule):
+    """重複發送相同訊息"""
+
+    name = "duplicate"
+    cost = 1
+
+    def __init__(self, tracker: RecentMessageTracker, threshold: int):
+        self.tracker = tracker
+        self.threshold = threshold
+
+    def check(self, payload, scan):
+        # 沒有文字內容（例如只有附件）不列入比對
+        if not payload.content:
+            return None
+        if self.tracker.record(payload.channel_id, payload.author_id, payload.content) < self.threshold:
+            return None
+        return Verdict(self.name, notice="{mention} 請不要重複發送相同訊息", log="刪除了 {author} 的重複訊息")
+
+
+class CapsRule(Rule):
+    """大量大寫字母"""
+
+    name = "caps"
+    cost = 2
+    needs_scan = True
+
+    def __init__(self, min_length: int = 10, max_ratio: float = 0.7):
+        self.min_length = min_length
+        self.max_ratio = max_ratio
+
+    def check(self, payload, scan):
+        if scan.length < self.min_length or scan.upper / scan.length <= self.max_ratio:
+            return None
+        return Verdict(self.name, notice="{mention} 請不要使用過多大寫字母", log="刪除了 {author} 的大寫訊息")
+
+
+class EmojiFloodRule(Rule):
+    """大量表情符號"""
+
+    name = "emoji_flood"
+    cost = 2
+    needs_scan = True
+
+    def __init__(self, max_emoji: int):
+        self.max_emoji = max_emoji
+
+    def check(self, payload, scan):
+        if scan.emoji < self.max_emoji:
+            return None
+        return Verdict(self.name, notice="{mention} 請不要使用過多表情符號", log="刪除了 {author} 的大量表情符號訊息")
+
+
+class ZalgoRule(Rule):
+    """大量組合附加符號（zalgo 文字）"""
+
+    name = "zalgo"
+    cost = 2
+    needs_scan = True
+
+    def __init__(self, max_marks: int):
+        self.max_marks = max_marks
+
+    def check(self, payload, scan):
+        if scan.combining < self.max_marks:
+            return None
+        return Verdict(self.name, notice="{mention} 請不要發送亂碼文字", log="刪除了 {author} 的 zalgo 訊息")
+
+
+class BannedWordRule(Rule):
+    """伺服器自訂的違禁詞/片語"""
+
+    name = "banned_word"
+    cost = 2
+    needs_scan = True
+    expensive = True
+
+    def __init__(self, automaton: AhoCorasick):
+        self.automaton = automaton
+
+    def check(self, payload, scan):
+        if scan.banned_match(self.automaton) is None:
+            return None
+        return Verdict(self.name, notice="{mention} 訊息包含違禁詞", log="刪除了 {author} 含違禁詞的訊息")
+
+
+class ImageBlocklistRule(Rule):
+    """與封鎖列表相似的圖片附件"""
+
+    name = "blocked_image"
+    cost = 1
+
+    def __init__(self, tree: BKTree, max_distance: int):
+        self.tree = tree
+        self.max_distance = max_distance
+
+    def check(self, payload, scan):
+        for value in payload.image_hashes:
+            if self.tree.find(value, self.max_distance) is not None:
+                return Verdict(self.name, notice="{mention} 不允許發送此圖片", log="刪除了 {author} 的封鎖圖片")
+        return None
+
+
+class InviteRule(Rule):
+    """Discord 邀請連結"""
+
+    name = "invite"
+    cost = 3
+
+    pattern = re.compile(r'discord\.gg/\w+|discordapp\.com/invite/\w+')
+
+    def check(self, payload, scan):
+        if not self.pattern.search(payload.content):
+            return None
+        return Verdict(self.name, notice="{mention} 不允許發送 Discord 邀請連結", log="刪除了 {author} 的邀請連結")
+
+
+class LinkRule(Rule):
+    """伺服器連結策略（封鎖/允許網域，短網址以快取的展開結果判斷）"""
+
+    name = "link"
+    cost = 3
+
+    def __init__(self, policy: LinkPolicy, pattern: re.Pattern, shorteners: ShortenerCache):
+        self.policy = policy
+        self.pattern = pattern
+        self.shorteners = shorteners
+
+    def check(self, payload, scan):
+        if '://' not in payload.content:
+            return None
+        for url in self.pattern.findall(payload.content):
+            host = canonical_host(url)
+            if host is None:
+                # 允許列表模式下無法判斷的網址視為違規（不可因解析失敗而放行）
+                if self.policy.mode == 'allowlist':
+                    return Verdict(self.name, notice="{mention} 不允許發送此網域的連結", log="刪除了 {author} 的連結 (無法解析的網址)")
+                continue
+            if is_shortener(host):
+                target = self.shorteners.get(url)
+                if target is not None:
+                    host = canonical_host(target) or host
+            if self.policy.is_blocked(host):
+                safe_host = host.replace('{', '{{').replace('}', '}}')
+                return Verdict(self.name, notice="{mention} 不允許發送此網域的連結", log=f"刪除了 {{author}} 的連結 ({safe_host})")
+        return None
+
+
+class NearDuplicateRule(Rule):
+    """同頻道短時間內大量相似訊息（可跨多位成員，例如突襲時的複製貼上）"""
+
+    name = "near_duplicate"
+    cost = 4
+    needs_scan = True
+    expensive = True
+
+    def __init__(self, index: NearDuplicateIndex, threshold: int, min_length: int = 20):
+        self.index = index
+        self.threshold = threshold
+        self.min_length = min_length
+
+    def check(self, payload, scan):
+        if len(scan.normalized) < self.min_length:
+            return None
+        matches, _ = self.index.add(payload.channel_id, payload.author_id, scan.signature)
+        if matches + 1 < self.threshold:
+            return None
+        return Verdict(self.name, notice="{mention} 偵測到大量相似訊息", log="刪除了 {author} 的相似洗版訊息")
+
+
+class RulePipeline:
+    """編譯後的規則管線：依成本排序、共用一次內容掃描、第一個刪除訊息的判定即停止"""
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = sorted(rules, key=lambda rule: rule.cost)
+        self.needs_scan = any(rule.needs_scan for rule in self.rules)
+
+    def evaluate(self, payload: MessagePayload, analysis: Optional[dict] = None,
+                 cheap_only: bool = False) -> Optional[Verdict]:
+        """
+        檢查訊息
+
+        Args:
+            payload: 訊息資料
+            analysis: 工作行程預先計算的分析結果
+            cheap_only: 只執行便宜的規則（分析工作行程滿載或逾時時）
+
+        Returns:
+            觸發的規則判定，沒有則為 None
+            （不刪除訊息的判定，例如垃圾訊息禁言，會繼續檢查其餘規則並合併結果，
+            違規內容仍會被刪除）
+        """
+        scan = ContentScan(payload.content, analysis) if self.needs_scan else None
+        verdict = None
+        for rule in self.rules:
+            if cheap_only and rule.expensive:
+                continue
+            result = rule.check(payload, scan)
+            if result is None:
+                continue
+            verdict = result if verdict is None else verdict.merge(result)
+            if verdict.delete:
+                return verdict
+        return verdict
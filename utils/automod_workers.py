@@ -0,0 +1,171 @@
+"""
+自動管理分析模組 - 在獨立行程中執行 CPU 密集的內容分析
+長訊息的正規化、違禁詞比對與 MinHash 簽章在工作行程中計算，不佔用事件循環
+"""
+import asyncio
+import logging
+import multiprocessing
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Hashable, Optional, Sequence
+
+from utils.text_match import AhoCorasick, normalize_text, minhash_signature, count_characters
+
+logger = logging.getLogger(__name__)
+
+MISSING_TERMS = 'missing_terms'
+
+# 工作行程內的違禁詞自動機快取：鍵值 -> 自動機
+_automata: "OrderedDict[Hashable, AhoCorasick]" = OrderedDict()
+_MAX_AUTOMATA = 64
+
+
+def analyze_content(content: str, terms_key: Optional[Hashable] = None,
+                    terms: Optional[Sequence[str]] = None) -> Dict:
+    """
+    分析訊息內容（在工作行程中執行）
+
+    Args:
+        content: 訊息內容
+        terms_key: 違禁詞列表的鍵值（None 為不比對違禁詞）
+        terms: 違禁詞列表；工作行程尚未快取此鍵值時才需要傳送
+
+    Returns:
+        分析結果；工作行程沒有對應的自動機且未提供 terms 時回傳 {MISSING_TERMS: True}
+    """
+    automaton = None
+    if terms_key is not None:
+        automaton = _automata.get(terms_key)
+        if automaton is None:
+            if terms is None:
+                return {MISSING_TERMS: True}
+            automaton = AhoCorasick(terms)
+            _automata[terms_key] = automaton
+            while len(_automata) > _MAX_AUTOMATA:
+                _automata.popitem(last=False)
+        else:
+            _automata.move_to_end(terms_key)
+
+    normalized = normalize_text(content)
+    upper, emoji, combining = count_characters(content)
+    return {
+        'length': len(content),
+        'upper': upper,
+        'emoji': emoji,
+        'combining': combining,
+        'normalized': normalized,
+        'banned': automaton.search(normalized) if automaton is not None else None,
+        'signature': minhash_signature(normalized),
+    }
+
+
+class AnalysisPool:
+    """分析工作行程池：有截止時間，池滿載時立即回傳 None 讓呼叫端改用便宜的檢查"""
+
+    def __init__(self, workers: int = 2, max_pending: int = 32, deadline_ms: float = 250):
+        """
+        Args:
+            workers: 工作行程數量（0 為停用）
+            max_pending: 同時處理中的工作上限，超過視為滿載
+            deadline_ms: 每則訊息的分析截止時間（毫秒）
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.deadline = deadline_ms / 1000
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight = set()
+        self.counters = {'submitted': 0, 'completed': 0, 'saturated': 0, 'deadline_missed': 0, 'errors': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._inflight)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            if sys.platform == 'win32':
+                context = multiprocessing.get_context('spawn')
+            else:
+                # forkserver 只預先載入本模組，工作行程不會繼承事件循環與連線
+                # （工作行程仍會以 __mp_main__ 匯入主程式，啟動程式碼必須在 if __name__ == "__main__" 之下）
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload([__name__])
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._executor
+
+    def start(self):
+        """預先啟動工作行程，避免第一則長訊息等待行程建立"""
+        if not self.enabled:
+            return
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(analyze_content, "")
+
+    async def _run(self, timeout: float, *args) -> Dict:
+        future = self._get_executor().submit(analyze_content, *args)
+        self._inflight.add(future)
+        future.add_done_callback(self._inflight.discard)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            # 尚未開始執行的工作直接取消
+            future.cancel()
+            raise
+
+    async def analyze(self, content: str, terms_key: Optional[Hashable] = None,
+                      terms: Optional[Sequence[str]] = None) -> Optional[Dict]:
+        """
+        在工作行程中分析訊息
+
+        Args:
+            content: 訊息內容
+            terms_key: 違禁詞列表的鍵值（列表變更時必須不同）
+            terms: 違禁詞列表
+
+        Returns:
+            分析結果；停用、滿載、超過截止時間或失敗時為 None
+        """
+        if not self.enabled:
+            return None
+        if self.pending >= self.max_pending:
+            self.counters['saturated'] += 1
+            return None
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        self.counters['submitted'] += 1
+        try:
+            # 先只傳鍵值；工作行程沒有快取時才傳送完整列表
+            result = await self._run(self.deadline, content, terms_key if terms else None)
+            if result.get(MISSING_TERMS):
+                result = await self._run(max(deadline - loop.time(), 0), content, terms_key, terms)
+        except asyncio.TimeoutError:
+            self.counters['deadline_missed'] += 1
+            return None
+        except BrokenProcessPool as e:
+            logger.error(f"自動管理工作行程異常結束，將重新建立: {e}")
+            self.counters['errors'] += 1
+            self._executor = None
+            return None
+        except Exception as e:
+            logger.error(f"自動管理分析失敗: {e}")
+            self.counters['errors'] += 1
+            return None
+
+        self.counters['completed'] += 1
+        return result
+
+    def shutdown(self):
+        """關閉工作行程"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, int]:
+        """目前的處理中數量與累計計數"""
+        return {'workers': self.workers, 'pending': self.pending, **self.counters}
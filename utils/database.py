@@ -3,60 +3,223 @@ JSON 資料管理模組 - 使用 JSON 檔案管理所有資料
 """
 import json
 import logging
-from typing import Optional, List, Dict, Any
+import functools
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Callable, Tuple
 from pathlib import Path
 from datetime import datetime, timezone
 import threading
 
+from utils.metrics import StorageMetrics
+from config import STORAGE_MODE, CAS_MAX_RETRIES
+
+try:
+    import fcntl  # 跨行程檔案鎖（僅 Unix）
+except ImportError:
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
 
+def _instrumented(dataset: Optional[str] = None):
+    """記錄公開方法的呼叫次數與延遲（dataset 為 None 時以第一個參數作為資料集名稱）"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                name = dataset if dataset is not None else args[0]
+                self.metrics.record_call(name, func.__name__, (time.perf_counter() - start) * 1000)
+        return wrapper
+    return decorator
+
+
+class VersionConflictError(Exception):
+    """樂觀並行控制重試次數用盡"""
+
+
+# 各資料集的預設內容
+DEFAULT_DATA = {
+    'warnings': [],
+    'levels': {},
+    'economy': {},
+    'guild_settings': {},
+    'reaction_roles': [],
+    'mutes': {},
+    'departures': {},
+}
+
+
 class JSONDatabase:
     """JSON 資料庫管理類"""
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", mode: str = "local"):
+        init_start = time.perf_counter()
         self.data_dir = Path(data_dir)
-        self.data_dir.mkdir(exist_ok=True)
+        
+        # local: 單一行程；multiprocess: 多個行程共用 data/ 目錄，寫入時加上檔案鎖
+        if mode == "multiprocess" and fcntl is None:
+            logger.warning("此平台不支援 fcntl，儲存模式退回 local")
+            mode = "local"
+        self.mode = mode
+        self._lock_fds: Dict[str, int] = {}
         
         # 資料檔案路徑
-        self.files = {
-            'warnings': self.data_dir / 'warnings.json',
-            'levels': self.data_dir / 'levels.json',
-            'economy': self.data_dir / 'economy.json',
-            'guild_settings': self.data_dir / 'guild_settings.json',
-            'reaction_roles': self.data_dir / 'reaction_roles.json',
-            'mutes': self.data_dir / 'mutes.json',
-        }
+        self.files = {key: self.data_dir / f'{key}.json' for key in DEFAULT_DATA}
         
         # 執行緒鎖（防止同時寫入）
         self.locks = {key: threading.Lock() for key in self.files.keys()}
+        self._open_lock = threading.Lock()
+        
+        # 效能指標
+        self.metrics = StorageMetrics()
         
-        # 初始化所有檔案
-        self.init_files()
+        # 延遲開啟：資料集在第一次存取時才建立/讀取
+        self._opened: Dict[str, float] = {}  # 資料集 -> 開啟耗時（毫秒）
+        self._cache: Dict[str, tuple] = {}   # 資料集 -> (檔案簽章, 解析後資料)
+        self.startup_timings: Dict[str, Any] = {
+            'init_ms': (time.perf_counter() - init_start) * 1000,
+            'prewarm_ms': None,
+        }
         
         logger.info("JSON 資料庫初始化成功")
     
     def init_files(self):
         """初始化 JSON 檔案"""
-        default_data = {
-            'warnings': [],
-            'levels': {},
-            'economy': {},
-            'guild_settings': {},
-            'reaction_roles': [],
-            'mutes': {},
-        }
+        for key in self.files:
+            self._ensure_dataset(key)
+    
+    def _ensure_dataset(self, key: str):
+        """第一次存取資料集時建立資料目錄與檔案"""
+        if key in self._opened:
+            return
         
-        for key, filepath in self.files.items():
+        with self._open_lock:
+            if key in self._opened:
+                return
+            
+            start = time.perf_counter()
+            filepath = self.files[key]
             if not filepath.exists():
-                self._save_json(filepath, default_data[key])
-                logger.info(f"創建資料檔案: {filepath}")
+                self.data_dir.mkdir(exist_ok=True)
+                # multiprocess 模式下避免兩個行程同時以預設值覆蓋對方剛建立的檔案
+                fd = self._lock_fd(key) if self.mode == "multiprocess" else None
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    if not filepath.exists():
+                        self._write_file(key, DEFAULT_DATA[key])
+                        logger.info(f"創建資料檔案: {filepath}")
+                finally:
+                    if fd is not None:
+                        fcntl.flock(fd, fcntl.LOCK_UN)
+            self._opened[key] = (time.perf_counter() - start) * 1000
+    
+    def prewarm(self) -> Dict[str, float]:
+        """
+        預先開啟並快取所有資料集（供 on_ready 後在背景執行緒呼叫）
+        
+        Returns:
+            各資料集的載入耗時（毫秒）
+        """
+        start = time.perf_counter()
+        timings = {}
+        for key in self.files:
+            dataset_start = time.perf_counter()
+            self._load_json(key)
+            timings[key] = (time.perf_counter() - dataset_start) * 1000
+        self.startup_timings['prewarm_ms'] = (time.perf_counter() - start) * 1000
+        return timings
+    
+    def startup_report(self) -> Dict[str, Any]:
+        """
+        啟動耗時報告
+        
+        Returns:
+            {'init_ms', 'prewarm_ms', 'datasets': {資料集: 開啟耗時或 None}}
+        """
+        return {
+            'init_ms': round(self.startup_timings['init_ms'], 3),
+            'prewarm_ms': round(self.startup_timings['prewarm_ms'], 3) if self.startup_timings['prewarm_ms'] is not None else None,
+            'datasets': {
+                key: round(self._opened[key], 3) if key in self._opened else None
+                for key in self.files
+            },
+        }
+    
+    @contextmanager
+    def _locked(self, key: str):
+        """
+        取得資料集的寫入鎖，並記錄等待時間
+        
+        multiprocess 模式下會再取得檔案鎖，並捨棄快取，
+        確保讀取-修改-寫入期間看到的是其他行程最新寫入的內容。
+        """
+        self._ensure_dataset(key)
+        lock = self.locks[key]
+        start = time.perf_counter()
+        lock.acquire()
+        fd = None
+        try:
+            if self.mode == "multiprocess":
+                fd = self._lock_fd(key)
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                self._cache.pop(key, None)
+            self.metrics.record_lock_wait(key, (time.perf_counter() - start) * 1000)
+            yield
+        finally:
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            lock.release()
     
-    def _load_json(self, filepath: Path) -> Any:
-        """載入 JSON 檔案"""
+    def _lock_fd(self, key: str) -> int:
+        """取得（或開啟）資料集的鎖檔案描述子"""
+        fd = self._lock_fds.get(key)
+        if fd is None:
+            lock_path = self.data_dir / f'.{key}.lock'
+            fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._lock_fds[key] = fd
+        return fd
+    
+    def _signature(self, key: str) -> Optional[tuple]:
+        """檔案簽章（用於判斷快取是否仍有效）"""
+        try:
+            st = self.files[key].stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    
+    def _load_json(self, key: str) -> Any:
+        """
+        載入 JSON 檔案
+        
+        檔案未變更時直接回傳快取的資料，呼叫端不應修改回傳的物件，
+        除非隨後會以 _save_json 寫回。
+        """
+        self._ensure_dataset(key)
+        filepath = self.files[key]
+        
+        signature = self._signature(key)
+        cached = self._cache.get(key)
+        if cached is not None and signature is not None and cached[0] == signature:
+            self.metrics.record_cache_hit(key)
+            return cached[1]
+        
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            start = time.perf_counter()
+            with open(filepath, 'rb') as f:
+                raw = f.read()
+            loaded = time.perf_counter()
+            data = json.loads(raw.decode('utf-8'))
+            parsed = time.perf_counter()
+            self.metrics.record_read(key, len(raw), (loaded - start) * 1000, (parsed - loaded) * 1000)
+            self._cache[key] = (signature, data)
+            return data
         except json.JSONDecodeError:
             logger.error(f"JSON 解析錯誤: {filepath}")
             return [] if filepath.name in ['warnings.json', 'reaction_roles.json'] else {}
@@ -64,19 +227,44 @@ class JSONDatabase:
             logger.error(f"讀取檔案錯誤 {filepath}: {e}")
             return [] if filepath.name in ['warnings.json', 'reaction_roles.json'] else {}
     
-    def _save_json(self, filepath: Path, data: Any):
+    def _save_json(self, key: str, data: Any):
         """儲存 JSON 檔案"""
+        self._ensure_dataset(key)
+        self._write_file(key, data)
+    
+    def _write_file(self, key: str, data: Any):
+        """序列化並寫入檔案，同時更新快取"""
+        filepath = self.files[key]
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            start = time.perf_counter()
+            raw = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+            serialized = time.perf_counter()
+            # 先寫入暫存檔再原子替換，其他行程/執行緒不會讀到寫到一半的檔案
+            fd, tmp_path = tempfile.mkstemp(dir=self.data_dir, prefix=f'.{key}.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(raw)
+                os.replace(tmp_path, filepath)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+            written = time.perf_counter()
+            self.metrics.record_write(key, len(raw), (serialized - start) * 1000, (written - serialized) * 1000)
+            self._cache[key] = (self._signature(key), data)
         except Exception as e:
+            # 寫入失敗時快取可能已被修改，捨棄以便下次重新讀取
+            self._cache.pop(key, None)
             logger.error(f"儲存檔案錯誤 {filepath}: {e}")
     
     # ==================== 警告系統 ====================
+    @_instrumented('warnings')
     def add_warning(self, guild_id: int, user_id: int, moderator_id: int, reason: str) -> bool:
         """新增警告"""
-        with self.locks['warnings']:
-            warnings = self._load_json(self.files['warnings'])
+        with self._locked('warnings'):
+            warnings = self._load_json('warnings')
             warning = {
                 'id': len(warnings) + 1,
                 'guild_id': guild_id,
@@ -86,90 +274,87 @@ class JSONDatabase:
                 'timestamp': datetime.now().isoformat()
             }
             warnings.append(warning)
-            self._save_json(self.files['warnings'], warnings)
+            self._save_json('warnings', warnings)
             return True
     
+    @_instrumented('warnings')
     def get_warnings(self, guild_id: int, user_id: int) -> List[Dict]:
         """獲取用戶警告"""
-        warnings = self._load_json(self.files['warnings'])
+        warnings = self._load_json('warnings')
         return [w for w in warnings if w['guild_id'] == guild_id and w['user_id'] == user_id]
     
+    @_instrumented('warnings')
     def count_warnings(self, guild_id: int, user_id: int) -> int:
-        """計算警告次數"""
-        return len(self.get_warnings(guild_id, user_id))
+        """計算警告次數（不經由 get_warnings，避免同一次呼叫被記錄兩次）"""
+        warnings = self._load_json('warnings')
+        return sum(1 for w in warnings if w['guild_id'] == guild_id and w['user_id'] == user_id)
     
+    @_instrumented('warnings')
     def clear_warnings(self, guild_id: int, user_id: int) -> bool:
         """清除用戶警告"""
-        with self.locks['warnings']:
-            warnings = self._load_json(self.files['warnings'])
+        with self._locked('warnings'):
+            warnings = self._load_json('warnings')
             warnings = [w for w in warnings if not (w['guild_id'] == guild_id and w['user_id'] == user_id)]
-            self._save_json(self.files['warnings'], warnings)
+            self._save_json('warnings', warnings)
             return True
     
     # ==================== 等級系統 ====================
+    @_instrumented('levels')
     def get_level_data(self, guild_id: int, user_id: int) -> Optional[Dict]:
         """獲取等級資料"""
-        levels = self._load_json(self.files['levels'])
+        levels = self._load_json('levels')
         key = f"{guild_id}_{user_id}"
         return levels.get(key)
     
+    @_instrumented('levels')
     def set_level_data(self, guild_id: int, user_id: int, xp: int, level: int, last_xp_time: str = None):
         """設定等級資料"""
-        with self.locks['levels']:
-            levels = self._load_json(self.files['levels'])
+        with self._locked('levels'):
+            levels = self._load_json('levels')
             key = f"{guild_id}_{user_id}"
             levels[key] = {
                 'user_id': user_id,
                 'guild_id': guild_id,
                 'xp': xp,
                 'level': level,
-                'last_xp_time': last_xp_time
+                'last_xp_time': last_xp_time,
+                'version': levels.get(key, {}).get('version', 0) + 1
             }
-            self._save_json(self.files['levels'], levels)
+            self._save_json('levels', levels)
     
+    @_instrumented('levels')
     def get_top_levels(self, guild_id: int, limit: int = 10) -> List[Dict]:
         """獲取等級排行榜"""
-        levels = self._load_json(self.files['levels'])
+        levels = self._load_json('levels')
         guild_levels = [v for v in levels.values() if v['guild_id'] == guild_id]
         return sorted(guild_levels, key=lambda x: x['xp'], reverse=True)[:limit]
     
+    @_instrumented('levels')
     def delete_all_levels(self, guild_id: int):
         """刪除伺服器所有等級資料"""
-        with self.locks['levels']:
-            levels = self._load_json(self.files['levels'])
+        with self._locked('levels'):
+            levels = self._load_json('levels')
             levels = {k: v for k, v in levels.items() if v['guild_id'] != guild_id}
-            self._save_json(self.files['levels'], levels)
+            self._save_json('levels', levels)
     
     # ==================== 經濟系統 ====================
+    @_instrumented('economy')
     def get_economy_data(self, guild_id: int, user_id: int) -> Dict:
         """獲取經濟資料"""
-        economy = self._load_json(self.files['economy'])
+        economy = self._load_json('economy')
         key = f"{guild_id}_{user_id}"
-        return economy.get(key, {
-            'user_id': user_id,
-            'guild_id': guild_id,
-            'balance': 0,
-            'bank': 0,
-            'last_daily': None,
-            'last_work': None
-        })
+        return economy.get(key, self._default_record('economy', key))
     
+    @_instrumented('economy')
     def set_economy_data(self, guild_id: int, user_id: int, balance: int = None, 
                         bank: int = None, last_daily: str = None, last_work: str = None):
         """設定經濟資料"""
-        with self.locks['economy']:
-            economy = self._load_json(self.files['economy'])
+        with self._locked('economy'):
+            economy = self._load_json('economy')
             key = f"{guild_id}_{user_id}"
             
             if key not in economy:
-                economy[key] = {
-                    'user_id': user_id,
-                    'guild_id': guild_id,
-                    'balance': 0,
-                    'bank': 0,
-                    'last_daily': None,
-                    'last_work': None
-                }
+                economy[key] = self._default_record('economy', key)
             
             if balance is not None:
                 economy[key]['balance'] = balance
@@ -179,56 +364,199 @@ class JSONDatabase:
                 economy[key]['last_daily'] = last_daily
             if last_work is not None:
                 economy[key]['last_work'] = last_work
+            economy[key]['version'] = economy[key].get('version', 0) + 1
             
-            self._save_json(self.files['economy'], economy)
+            self._save_json('economy', economy)
     
+    @_instrumented('economy')
+    def update_economy(self, guild_id: int, user_id: int,
+                       mutate: Callable[[Dict], Optional[Dict]]) -> Tuple[bool, Dict]:
+        """
+        以樂觀並行控制更新經濟資料
+        
+        Args:
+            mutate: 接收目前資料，回傳要更新的欄位；回傳 None 表示放棄更新
+        
+        Returns:
+            (是否已寫入, 寫入後的資料或放棄時看到的資料)
+        """
+        key = f"{guild_id}_{user_id}"
+        committed, records = self.update_with_retry(
+            'economy', [key], lambda records: self._wrap_single(key, mutate(records[key]))
+        )
+        return committed, records[key]
+    
+    @_instrumented('economy')
+    def update_economy_many(self, guild_id: int, user_ids: List[int],
+                            mutate: Callable[[Dict[int, Dict]], Optional[Dict[int, Dict]]]) -> Tuple[bool, Dict[int, Dict]]:
+        """
+        以樂觀並行控制同時更新多位成員的經濟資料（全部成功或全部放棄）
+        
+        Args:
+            mutate: 接收 {user_id: 資料}，回傳 {user_id: 要更新的欄位}；回傳 None 表示放棄更新
+        
+        Returns:
+            (是否已寫入, {user_id: 資料})
+        """
+        keys = {user_id: f"{guild_id}_{user_id}" for user_id in user_ids}
+        
+        def mutate_records(records):
+            changes = mutate({user_id: records[key] for user_id, key in keys.items()})
+            if changes is None:
+                return None
+            return {keys[user_id]: fields for user_id, fields in changes.items()}
+        
+        committed, records = self.update_with_retry('economy', list(keys.values()), mutate_records)
+        return committed, {user_id: records[key] for user_id, key in keys.items()}
+    
+    @_instrumented('economy')
     def get_top_economy(self, guild_id: int, limit: int = 10) -> List[Dict]:
         """獲取財富排行榜"""
-        economy = self._load_json(self.files['economy'])
+        economy = self._load_json('economy')
         guild_economy = [v for v in economy.values() if v['guild_id'] == guild_id]
         return sorted(guild_economy, key=lambda x: x['balance'] + x['bank'], reverse=True)[:limit]
     
     # ==================== 伺服器設定 ====================
+    @_instrumented('guild_settings')
     def get_guild_settings(self, guild_id: int) -> Dict:
         """獲取伺服器設定"""
-        settings = self._load_json(self.files['guild_settings'])
-        return settings.get(str(guild_id), {
-            'guild_id': guild_id,
-            'welcome_channel_id': None,
-            'farewell_channel_id': None,
-            'log_channel_id': None,
-            'muted_role_id': None,
-            'autorole_id': None,
-            'level_up_message': True,
-            'automod_enabled': False
-        })
+        settings = self._load_json('guild_settings')
+        return settings.get(str(guild_id), self._default_record('guild_settings', str(guild_id)))
     
+    @_instrumented('guild_settings')
     def set_guild_settings(self, guild_id: int, **kwargs):
         """設定伺服器設定"""
-        with self.locks['guild_settings']:
-            settings = self._load_json(self.files['guild_settings'])
+        with self._locked('guild_settings'):
+            settings = self._load_json('guild_settings')
             key = str(guild_id)
             
             if key not in settings:
-                settings[key] = {
-                    'guild_id': guild_id,
-                    'welcome_channel_id': None,
-                    'farewell_channel_id': None,
-                    'log_channel_id': None,
-                    'muted_role_id': None,
-                    'autorole_id': None,
-                    'level_up_message': True,
-                    'automod_enabled': False
-                }
+                settings[key] = self._default_record('guild_settings', key)
             
             settings[key].update(kwargs)
-            self._save_json(self.files['guild_settings'], settings)
+            settings[key]['version'] = settings[key].get('version', 0) + 1
+            self._save_json('guild_settings', settings)
+    
+    # ==================== 版本控制 ====================
+    def _default_record(self, key: str, record_key: str) -> Dict:
+        """資料集中不存在的記錄的預設內容"""
+        if key == 'guild_settings':
+            return {
+                'guild_id': int(record_key),
+                'welcome_channel_id': None,
+                'farewell_channel_id': None,
+                'log_channel_id': None,
+                'muted_role_id': None,
+                'autorole_id': None,
+                'level_up_message': True,
+                'automod_enabled': False,
+                'version': 0
+            }
+        
+        guild_id, user_id = (int(part) for part in record_key.split('_'))
+        record = {'user_id': user_id, 'guild_id': guild_id}
+        if key == 'economy':
+            record.update({'balance': 0, 'bank': 0, 'last_daily': None, 'last_work': None})
+        elif key == 'levels':
+            record.update({'xp': 0, 'level': 0, 'last_xp_time': None})
+        record['version'] = 0
+        return record
+    
+    @staticmethod
+    def _wrap_single(record_key: str, changes: Optional[Dict]) -> Optional[Dict[str, Dict]]:
+        return None if changes is None else {record_key: changes}
+    
+    @_instrumented()
+    def update_if_version(self, key: str, record_key: str, expected_version: int, changes: Dict) -> bool:
+        """
+        比較並交換：只有在記錄版本等於 expected_version 時才寫入
+        
+        Args:
+            key: 資料集名稱（levels、economy、guild_settings）
+            record_key: 記錄鍵值（如 "guild_user"）
+            expected_version: 讀取時的版本
+            changes: 要更新的欄位
+        
+        Returns:
+            是否寫入成功（False 表示記錄已被其他操作修改）
+        """
+        return self.update_many_if_version(key, {record_key: (expected_version, changes)})
+    
+    @_instrumented()
+    def update_many_if_version(self, key: str, updates: Dict[str, Tuple[int, Dict]]) -> bool:
+        """
+        同時對多筆記錄進行比較並交換（全部版本相符才寫入）
+        
+        Args:
+            key: 資料集名稱
+            updates: {記錄鍵值: (預期版本, 要更新的欄位)}
+        
+        Returns:
+            是否寫入成功
+        """
+        with self._locked(key):
+            data = self._load_json(key)
+            for record_key, (expected_version, _) in updates.items():
+                if data.get(record_key, {}).get('version', 0) != expected_version:
+                    return False
+            
+            for record_key, (expected_version, changes) in updates.items():
+                record = data.setdefault(record_key, self._default_record(key, record_key))
+                record.update(changes)
+                record['version'] = expected_version + 1
+            
+            self._save_json(key, data)
+            return True
+    
+    @_instrumented()
+    def update_with_retry(self, key: str, record_keys: List[str],
+                          mutate: Callable[[Dict[str, Dict]], Optional[Dict[str, Dict]]],
+                          retries: int = CAS_MAX_RETRIES) -> Tuple[bool, Dict[str, Dict]]:
+        """
+        讀取記錄、計算變更並以比較並交換寫入，版本衝突時自動重試
+        
+        Args:
+            key: 資料集名稱
+            record_keys: 要更新的記錄鍵值
+            mutate: 接收 {記錄鍵值: 資料副本}，回傳 {記錄鍵值: 要更新的欄位}；回傳 None 表示放棄
+            retries: 最大重試次數
+        
+        Returns:
+            (是否已寫入, {記錄鍵值: 寫入後的資料或放棄時看到的資料})
+        
+        Raises:
+            VersionConflictError: 重試次數用盡
+        """
+        for _ in range(retries):
+            data = self._load_json(key)
+            records = {
+                record_key: dict(data.get(record_key) or self._default_record(key, record_key))
+                for record_key in record_keys
+            }
+            changes = mutate({record_key: dict(record) for record_key, record in records.items()})
+            if changes is None:
+                return False, records
+            
+            updates = {
+                record_key: (records[record_key].get('version', 0), fields)
+                for record_key, fields in changes.items()
+            }
+            if self.update_many_if_version(key, updates):
+                for record_key, (version, fields) in updates.items():
+                    records[record_key].update(fields)
+                    records[record_key]['version'] = version + 1
+                return True, records
+            
+            self.metrics.record_conflict(key)
+        
+        raise VersionConflictError(f"{key}: {', '.join(record_keys)} 更新衝突次數過多")
     
     # ==================== 反應角色 ====================
+    @_instrumented('reaction_roles')
     def add_reaction_role(self, guild_id: int, message_id: int, role_id: int, emoji: str):
         """新增反應角色"""
-        with self.locks['reaction_roles']:
-            reaction_roles = self._load_json(self.files['reaction_roles'])
+        with self._locked('reaction_roles'):
+            reaction_roles = self._load_json('reaction_roles')
             reaction_role = {
                 'id': len(reaction_roles) + 1,
                 'guild_id': guild_id,
@@ -237,36 +565,40 @@ class JSONDatabase:
                 'emoji': emoji
             }
             reaction_roles.append(reaction_role)
-            self._save_json(self.files['reaction_roles'], reaction_roles)
+            self._save_json('reaction_roles', reaction_roles)
     
+    @_instrumented('reaction_roles')
     def get_reaction_role(self, guild_id: int, message_id: int, emoji: str) -> Optional[Dict]:
         """獲取反應角色"""
-        reaction_roles = self._load_json(self.files['reaction_roles'])
+        reaction_roles = self._load_json('reaction_roles')
         for rr in reaction_roles:
             if rr['guild_id'] == guild_id and rr['message_id'] == message_id and rr['emoji'] == emoji:
                 return rr
         return None
     
+    @_instrumented('reaction_roles')
     def get_all_reaction_roles(self, guild_id: int) -> List[Dict]:
         """獲取所有反應角色"""
-        reaction_roles = self._load_json(self.files['reaction_roles'])
+        reaction_roles = self._load_json('reaction_roles')
         return [rr for rr in reaction_roles if rr['guild_id'] == guild_id]
     
+    @_instrumented('reaction_roles')
     def remove_reaction_role(self, guild_id: int, message_id: int, emoji: str):
         """移除反應角色"""
-        with self.locks['reaction_roles']:
-            reaction_roles = self._load_json(self.files['reaction_roles'])
+        with self._locked('reaction_roles'):
+            reaction_roles = self._load_json('reaction_roles')
             reaction_roles = [
                 rr for rr in reaction_roles 
                 if not (rr['guild_id'] == guild_id and rr['message_id'] == message_id and rr['emoji'] == emoji)
             ]
-            self._save_json(self.files['reaction_roles'], reaction_roles)
+            self._save_json('reaction_roles', reaction_roles)
     
     # ==================== 靜音記錄 ====================
+    @_instrumented('mutes')
     def set_mute(self, guild_id: int, user_id: int, muted_until: str, reason: str):
         """設定靜音記錄"""
-        with self.locks['mutes']:
-            mutes = self._load_json(self.files['mutes'])
+        with self._locked('mutes'):
+            mutes = self._load_json('mutes')
             key = f"{guild_id}_{user_id}"
             mutes[key] = {
                 'user_id': user_id,
@@ -274,17 +606,147 @@ class JSONDatabase:
                 'muted_until': muted_until,
                 'reason': reason
             }
-            self._save_json(self.files['mutes'], mutes)
+            self._save_json('mutes', mutes)
     
+    @_instrumented('mutes')
     def remove_mute(self, guild_id: int, user_id: int):
         """移除靜音記錄"""
-        with self.locks['mutes']:
-            mutes = self._load_json(self.files['mutes'])
+        with self._locked('mutes'):
+            mutes = self._load_json('mutes')
             key = f"{guild_id}_{user_id}"
             if key in mutes:
                 del mutes[key]
-                self._save_json(self.files['mutes'], mutes)
+                self._save_json('mutes', mutes)
+
+    
+    # ==================== 離開記錄 ====================
+    @_instrumented('departures')
+    def mark_departed(self, guild_id: int, user_id: int, left_at: str):
+        """記錄成員離開時間（已有記錄時保留最早的時間）"""
+        with self._locked('departures'):
+            departures = self._load_json('departures')
+            key = f"{guild_id}_{user_id}"
+            if key not in departures:
+                departures[key] = {
+                    'user_id': user_id,
+                    'guild_id': guild_id,
+                    'left_at': left_at
+                }
+                self._save_json('departures', departures)
+    
+    @_instrumented('departures')
+    def mark_departed_many(self, entries: List[tuple]):
+        """批次記錄成員離開時間，entries 為 (guild_id, user_id, left_at) 列表"""
+        if not entries:
+            return
+        with self._locked('departures'):
+            departures = self._load_json('departures')
+            for guild_id, user_id, left_at in entries:
+                departures.setdefault(f"{guild_id}_{user_id}", {
+                    'user_id': user_id,
+                    'guild_id': guild_id,
+                    'left_at': left_at
+                })
+            self._save_json('departures', departures)
+    
+    @_instrumented('departures')
+    def clear_departed(self, guild_id: int, user_id: int):
+        """成員重新加入時移除離開記錄"""
+        with self._locked('departures'):
+            departures = self._load_json('departures')
+            key = f"{guild_id}_{user_id}"
+            if key in departures:
+                del departures[key]
+                self._save_json('departures', departures)
+    
+    @_instrumented('departures')
+    def get_departures(self) -> Dict[str, Dict]:
+        """獲取所有離開記錄"""
+        return dict(self._load_json('departures'))
+    
+    # ==================== 資料保留 ====================
+    @_instrumented('all')
+    def get_stored_guild_ids(self) -> set:
+        """獲取所有資料集中出現過的伺服器 ID"""
+        guild_ids = set()
+        for key in self.files:
+            # 在執行緒中呼叫時，快取的資料會被事件循環中的寫入直接修改：持有寫入鎖時只複製記錄列表
+            with self._locked(key):
+                data = self._load_json(key)
+                records = list(data.values()) if isinstance(data, dict) else list(data)
+            guild_ids.update(r['guild_id'] for r in records if 'guild_id' in r)
+        return guild_ids
+    
+    def dataset_size(self, key: str) -> int:
+        """資料檔案大小（位元組）"""
+        try:
+            return self.files[key].stat().st_size
+        except OSError:
+            return 0
+    
+    @_instrumented()
+    def prune_records(self, key: str, selector: Callable[[Dict], Optional[str]]) -> Dict[str, int]:
+        """
+        依 selector 移除或封存資料集中的記錄
+        
+        Args:
+            key: 資料集名稱
+            selector: 對每筆記錄回傳 None（保留）、'delete'（刪除）或 'archive'（封存後刪除）
+        
+        Returns:
+            {'removed': 刪除筆數, 'archived': 封存筆數, 'bytes_reclaimed': 釋放的位元組}
+        """
+        with self._locked(key):
+            size_before = self.dataset_size(key)
+            data = self._load_json(key)
+            
+            removed = []
+            archived = []
+            if isinstance(data, dict):
+                kept = {}
+                for record_key, record in data.items():
+                    action = selector(record)
+                    if action is None:
+                        kept[record_key] = record
+                    else:
+                        removed.append(record)
+                        if action == 'archive':
+                            archived.append(record)
+            else:
+                kept = []
+                for record in data:
+                    action = selector(record)
+                    if action is None:
+                        kept.append(record)
+                    else:
+                        removed.append(record)
+                        if action == 'archive':
+                            archived.append(record)
+            
+            if removed:
+                if archived:
+                    self._archive_records(key, archived)
+                self._save_json(key, kept)
+            
+            return {
+                'removed': len(removed),
+                'archived': len(archived),
+                'bytes_reclaimed': max(size_before - self.dataset_size(key), 0),
+            }
+    
+    def _archive_records(self, key: str, records: List[Dict]):
+        """將記錄附加到 data/archive/<資料集>.jsonl"""
+        archive_dir = self.data_dir / 'archive'
+        archive_dir.mkdir(exist_ok=True)
+        archived_at = datetime.now().isoformat()
+        try:
+            with open(archive_dir / f'{key}.jsonl', 'a', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps({'archived_at': archived_at, 'record': record}, ensure_ascii=False) + '\n')
+        except Exception as e:
+            logger.error(f"封存記錄錯誤 {key}: {e}")
+            raise
 
 
 # 全局資料庫實例
-db = JSONDatabase()
+db = JSONDatabase(mode=STORAGE_MODE)
@@ -0,0 +1,148 @@
+"""
+圖片雜湊模組 - 感知雜湊 (dHash) 與 BK 樹最近鄰查詢
+需要 Pillow；未安裝時 PILLOW_AVAILABLE 為 False，圖片比對功能停用
+"""
+import hashlib
+import io
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PILLOW_AVAILABLE = Image is not None
+
+HASH_SIZE = 8  # 8x8 = 64 位元
+
+
+def content_digest(data: bytes) -> str:
+    """檔案內容雜湊（用來快取感知雜湊，相同檔案不需重新解碼）"""
+    return hashlib.sha1(data).hexdigest()
+
+
+def perceptual_hash(data: bytes) -> int:
+    """
+    計算圖片的 64 位元差異雜湊：縮小為 9x8 灰階後比較相鄰像素
+    重新壓縮、縮放或輕微調色後的圖片仍會得到漢明距離很小的雜湊
+
+    Args:
+        data: 圖片檔案內容
+
+    Returns:
+        雜湊值
+
+    Raises:
+        RuntimeError: 未安裝 Pillow
+        OSError: 無法解碼圖片
+    """
+    if Image is None:
+        raise RuntimeError("需要安裝 Pillow")
+    with Image.open(io.BytesIO(data)) as image:
+        # JPEG 可直接以較小的尺寸解碼
+        image.draft('L', (HASH_SIZE * 8, HASH_SIZE * 8))
+        pixels = list(image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS).getdata())
+
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """兩個雜湊的漢明距離"""
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """以漢明距離建立的 BK 樹：查詢時依三角不等式略過不可能符合的子樹"""
+
+    def __init__(self, items: Optional[List[Tuple[int, str]]] = None):
+        """
+        Args:
+            items: [(雜湊, 標籤)]
+        """
+        # 節點: [雜湊, 標籤, {距離: 子節點}]
+        self._root: Optional[list] = None
+        self.size = 0
+        for value, label in items or ():
+            self.add(value, label)
+
+    def add(self, value: int, label: str):
+        """加入雜湊"""
+        if self._root is None:
+            self._root = [value, label, {}]
+            self.size = 1
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, label, {}]
+                self.size += 1
+                return
+            node = child
+
+    def find(self, value: int, max_distance: int) -> Optional[Tuple[int, str]]:
+        """
+        尋找距離最近且不超過 max_distance 的雜湊
+
+        Returns:
+            (距離, 標籤)，沒有則為 None
+        """
+        if self._root is None:
+            return None
+        best = None
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= max_distance and (best is None or distance < best[0]):
+                best = (distance, node[1])
+                if distance == 0:
+                    break
+            low, high = distance - max_distance, distance + max_distance
+            for child_distance, child in node[2].items():
+                if low <= child_distance <= high:
+                    stack.append(child)
+        return best
+
+
+class ImageHashCache:
+    """檔案內容雜湊 -> 感知雜湊 的有界快取（重複轉貼的圖片不需重新下載解碼）"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Optional[int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Tuple[bool, Optional[int]]:
+        """
+        Returns:
+            (是否命中, 感知雜湊；無法解碼的圖片為 None)
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, self._entries[key]
+        self.misses += 1
+        return False, None
+
+    def put(self, key: str, value: Optional[int]):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,172 @@
+"""
+連結過濾模組 - 網域正規化、反向網域標籤字典樹與短網址展開快取
+"""
+import re
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterable, Optional
+from urllib.parse import unquote, urlsplit
+
+# 常見短網址服務（需要展開才能判斷真正的目的地）
+SHORTENER_DOMAINS = frozenset({
+    'bit.ly', 'tinyurl.com', 't.co', 'goo.gl', 'is.gd', 'ow.ly', 'buff.ly',
+    'rebrand.ly', 'cutt.ly', 'shorturl.at', 'rb.gy', 't.ly', 'tiny.cc', 'v.gd',
+})
+
+# 合法的主機名稱（網域標籤或 IPv6 位址）
+_HOSTNAME_PATTERN = re.compile(r'[a-z0-9_-]+(?:\.[a-z0-9_-]+)*|[0-9a-f:.]+')
+
+ALLOW = 'allow'
+BLOCK = 'block'
+
+
+@lru_cache(maxsize=4096)
+def canonical_host(url: str) -> Optional[str]:
+    """
+    取得網址的正規化主機名稱：解碼百分比編碼、小寫、移除結尾的點與 www.、國際化網域轉為 punycode
+
+    Args:
+        url: 網址（可省略 scheme）
+
+    Returns:
+        主機名稱，無法解析或含有主機名稱不允許的字元時為 None
+    """
+    if '://' not in url:
+        url = 'http://' + url
+    # 瀏覽器（WHATWG 規範）將 \ 視為 /：https://evil.com\@good.com 實際開啟的是 evil.com
+    url = url.replace('\\', '/')
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    # 瀏覽器會解碼主機名稱中的百分比編碼（evil%2ecom 即 evil.com）
+    host = unquote(host).lower().rstrip('.')
+    try:
+        host = host.encode('idna').decode('ascii')
+    except UnicodeError:
+        pass
+    if not _HOSTNAME_PATTERN.fullmatch(host):
+        return None
+    if host.startswith('www.'):
+        host = host[4:]
+    return host or None
+
+
+def is_shortener(host: str) -> bool:
+    """是否為短網址服務"""
+    return host in SHORTENER_DOMAINS
+
+
+class DomainTrie:
+    """以反向網域標籤（com -> example -> www）儲存的字典樹，查詢成本只與網域層數有關"""
+
+    _VALUE = 0  # 完全符合此網域
+    _WILDCARD = 1  # 此網域及所有子網域
+
+    def __init__(self):
+        self._root: dict = {}
+        self.size = 0
+
+    def add(self, pattern: str, value: str):
+        """
+        加入網域規則
+
+        Args:
+            pattern: "example.com"（僅此網域）或 "*.example.com"（此網域及所有子網域）
+            value: 符合時回傳的值
+        """
+        pattern = pattern.strip().lower()
+        wildcard = pattern.startswith('*.')
+        host = canonical_host(pattern[2:] if wildcard else pattern)
+        if not host:
+            return
+        node = self._root
+        for label in reversed(host.split('.')):
+            node = node.setdefault(label, {})
+        node[self._WILDCARD if wildcard else self._VALUE] = value
+        self.size += 1
+
+    def match(self, host: str) -> Optional[str]:
+        """
+        查詢主機名稱（最具體的規則優先）
+
+        Args:
+            host: canonical_host 的結果
+
+        Returns:
+            符合規則的值，沒有則為 None
+        """
+        node = self._root
+        result = None
+        for label in reversed(host.split('.')):
+            node = node.get(label)
+            if node is None:
+                return result
+            result = node.get(self._WILDCARD, result)
+        return node.get(self._VALUE, result)
+
+
+class LinkPolicy:
+    """伺服器的連結策略"""
+
+    def __init__(self, mode: str, allowed: Iterable[str] = (), blocked: Iterable[str] = ()):
+        """
+        Args:
+            mode: "blocklist"（封鎖列出的網域）或 "allowlist"（只允許列出的網域）
+            allowed: 允許的網域規則
+            blocked: 封鎖的網域規則
+        """
+        self.mode = mode
+        self.trie = DomainTrie()
+        for pattern in blocked:
+            self.trie.add(pattern, BLOCK)
+        # 允許規則後加入，同一網域同時出現時以允許為準
+        for pattern in allowed:
+            self.trie.add(pattern, ALLOW)
+
+    def is_blocked(self, host: str) -> bool:
+        """主機名稱是否被封鎖"""
+        verdict = self.trie.match(host)
+        if verdict is None:
+            return self.mode == 'allowlist'
+        return verdict == BLOCK
+
+
+class ShortenerCache:
+    """短網址展開結果的有界快取（含失敗結果，避免重複請求）"""
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # 短網址 -> (展開時間, 目的地網址或 None)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, url: str) -> bool:
+        entry = self._entries.get(url)
+        if entry is None:
+            return False
+        if time.monotonic() - entry[0] >= self.ttl_seconds:
+            del self._entries[url]
+            return False
+        return True
+
+    def get(self, url: str) -> Optional[str]:
+        """取得展開後的網址（未快取或展開失敗時為 None）"""
+        entry = self._entries.get(url)
+        if entry is None or time.monotonic() - entry[0] >= self.ttl_seconds:
+            return None
+        self._entries.move_to_end(url)
+        return entry[1]
+
+    def put(self, url: str, target: Optional[str]):
+        """記錄展開結果"""
+        self._entries[url] = (time.monotonic(), target)
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
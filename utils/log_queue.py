@@ -0,0 +1,294 @@
+"""
+日誌佇列模組 - 每個日誌頻道一個發送佇列
+多個事件合併為一則訊息（最多 10 個 embed），依數量或時間送出，並控制發送間隔以避開速率限制
+可選擇經由每個頻道數個受管理的 webhook 輪流發送，不佔用機器人本身的頻道速率限制
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Set
+
+import aiohttp
+import discord
+
+logger = logging.getLogger(__name__)
+
+MAX_EMBEDS_PER_MESSAGE = 10  # Discord 每則訊息最多 10 個 embed
+MAX_EMBED_CHARS = 6000  # 同一則訊息所有 embed 的字元總數上限
+
+
+class WebhookPool:
+    """每個日誌頻道數個受管理的 webhook，輪流使用（每個 webhook 有獨立的速率限制）"""
+
+    def __init__(self, size: int = 3, name: str = "日誌"):
+        """
+        Args:
+            size: 每個頻道的 webhook 數量
+            name: webhook 名稱（用來辨識由本模組管理的 webhook）
+        """
+        self.size = size
+        self.name = name
+        self._session: Optional[aiohttp.ClientSession] = None  # 所有 webhook 共用
+        self._webhooks: Dict[int, List[discord.Webhook]] = {}  # 頻道 ID -> webhook
+        self._cursor: Dict[int, int] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._unavailable: Set[int] = set()  # 沒有管理 webhook 權限的頻道
+        self.counters = {'created': 0, 'discarded': 0}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    def available(self, channel_id: int) -> bool:
+        return channel_id not in self._unavailable
+
+    async def _load(self, channel) -> List[discord.Webhook]:
+        """沿用頻道中已有的受管理 webhook，不足時建立"""
+        existing = [webhook for webhook in await channel.webhooks() if webhook.name == self.name and webhook.token]
+        while len(existing) < self.size:
+            existing.append(await channel.create_webhook(name=self.name, reason="日誌發送"))
+            self.counters['created'] += 1
+        session = self._get_session()
+        return [discord.Webhook.partial(webhook.id, webhook.token, session=session) for webhook in existing[:self.size]]
+
+    async def acquire(self, channel) -> discord.Webhook:
+        """
+        取得下一個 webhook（輪流）
+
+        Raises:
+            discord.Forbidden: 沒有管理 webhook 的權限（之後此頻道不再嘗試）
+        """
+        webhooks = self._webhooks.get(channel.id)
+        if not webhooks:
+            lock = self._locks.setdefault(channel.id, asyncio.Lock())
+            async with lock:
+                webhooks = self._webhooks.get(channel.id)
+                if not webhooks:
+                    try:
+                        webhooks = self._webhooks[channel.id] = await self._load(channel)
+                    except discord.Forbidden:
+                        self._unavailable.add(channel.id)
+                        raise
+        index = self._cursor.get(channel.id, 0)
+        self._cursor[channel.id] = index + 1
+        return webhooks[index % len(webhooks)]
+
+    def discard(self, channel_id: int, webhook: discord.Webhook):
+        """移除已被刪除的 webhook（全部移除後下次使用時重新建立）"""
+        webhooks = self._webhooks.get(channel_id)
+        if webhooks and webhook in webhooks:
+            webhooks.remove(webhook)
+            self.counters['discarded'] += 1
+            if not webhooks:
+                del self._webhooks[channel_id]
+
+    def forget(self, channel_id: int):
+        """忘記頻道的 webhook 與權限狀態（例如日誌頻道變更）"""
+        self._webhooks.pop(channel_id, None)
+        self._cursor.pop(channel_id, None)
+        self._unavailable.discard(channel_id)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'channels': len(self._webhooks),
+            'webhooks': sum(len(webhooks) for webhooks in self._webhooks.values()),
+            'unavailable': len(self._unavailable),
+            **self.counters,
+        }
+
+
+class _ChannelQueue:
+    """單一日誌頻道的待發送 embed"""
+
+    __slots__ = ('channel', 'entries', 'ready', 'task', 'next_send', 'failures', 'use_webhook')
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.use_webhook = False
+        self.entries: deque = deque()  # (embed, 附加檔案或 None)
+        self.ready = asyncio.Event()  # 累積到一則訊息的上限時設定，立即送出
+        self.task: Optional[asyncio.Task] = None
+        self.next_send = 0.0  # 下次可發送的時間（事件循環時間）
+        self.failures = 0  # 連續失敗次數
+
+
+class LogDispatcher:
+    """日誌頻道的批次發送器"""
+
+    def __init__(self, flush_seconds: float = 2, send_interval: float = 1, max_pending: int = 500,
+                 max_retries: int = 3, webhooks: Optional[WebhookPool] = None):
+        """
+        Args:
+            flush_seconds: 未滿一則訊息時最多等待的秒數
+            send_interval: 同一頻道兩次發送之間的最短間隔（秒）；使用 webhook 時除以 webhook 數量
+            max_pending: 每個頻道最多排隊的 embed 數量，超過時捨棄最舊的
+            max_retries: 暫時性錯誤（速率限制、伺服器錯誤）的重試次數
+            webhooks: webhook 池（None 為只以機器人身分發送）
+        """
+        self.webhooks = webhooks
+        self.flush_seconds = flush_seconds
+        self.send_interval = send_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self._queues: Dict[int, _ChannelQueue] = {}
+        self._closing = False
+        self.counters = {'queued': 0, 'sent_messages': 0, 'sent_embeds': 0, 'dropped': 0, 'retries': 0}
+
+    @property
+    def pending(self) -> int:
+        return sum(len(queue.entries) for queue in self._queues.values())
+
+    def enqueue(self, channel, embed: discord.Embed, use_webhook: bool = False,
+                file: Optional[discord.File] = None):
+        """
+        加入待發送的 embed（不等待發送）
+
+        Args:
+            channel: 日誌頻道
+            embed: 日誌內容
+            use_webhook: 是否經由 webhook 池發送
+            file: 附加檔案（含檔案的日誌單獨發送，不與其他 embed 合併）
+        """
+        queue = self._queues.get(channel.id)
+        if queue is None:
+            queue = self._queues[channel.id] = _ChannelQueue(channel)
+        queue.channel = channel
+        queue.use_webhook = use_webhook
+
+        if len(queue.entries) >= self.max_pending:
+            queue.entries.popleft()
+            self.counters['dropped'] += 1
+        queue.entries.append((embed, file))
+        self.counters['queued'] += 1
+
+        if len(queue.entries) >= MAX_EMBEDS_PER_MESSAGE:
+            queue.ready.set()
+        if queue.task is None:
+            queue.task = asyncio.create_task(self._worker(queue))
+
+    def _take_batch(self, queue: _ChannelQueue) -> List[tuple]:
+        """取出一則訊息可容納的 (embed, 檔案)"""
+        batch = [queue.entries.popleft()]
+        if batch[0][1] is not None:
+            return batch
+        total = len(batch[0][0])
+        while queue.entries and len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            embed, file = queue.entries[0]
+            if file is not None or total + len(embed) > MAX_EMBED_CHARS:
+                break
+            batch.append(queue.entries.popleft())
+            total += len(embed)
+        return batch
+
+    async def _worker(self, queue: _ChannelQueue):
+        """發送頻道佇列直到清空"""
+        loop = asyncio.get_running_loop()
+        try:
+            while queue.entries:
+                if len(queue.entries) < MAX_EMBEDS_PER_MESSAGE and not self._closing:
+                    # 等待累積更多事件，或等到時間到
+                    queue.ready.clear()
+                    try:
+                        await asyncio.wait_for(queue.ready.wait(), self.flush_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                delay = queue.next_send - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self._send(queue, self._take_batch(queue))
+                queue.next_send = loop.time() + self._interval(queue) * (1 + queue.failures)
+        finally:
+            queue.task = None
+            if not queue.entries:
+                self._queues.pop(queue.channel.id, None)
+
+    def _uses_webhook(self, queue: _ChannelQueue) -> bool:
+        return queue.use_webhook and self.webhooks is not None and self.webhooks.available(queue.channel.id)
+
+    def _interval(self, queue: _ChannelQueue) -> float:
+        if self._uses_webhook(queue):
+            return self.send_interval / self.webhooks.size
+        return self.send_interval
+
+    async def _deliver(self, queue: _ChannelQueue, batch: List[tuple]):
+        """發送一則訊息：優先使用 webhook，無法使用時改以機器人身分發送"""
+        embeds = [embed for embed, _ in batch]
+        files = [file for _, file in batch if file is not None]
+        extra = {'files': files} if files else {}
+        if self._uses_webhook(queue):
+            # 每個 webhook 最多嘗試一次，全部被刪除後 acquire 會重新建立一組，因此最多 size + 1 次
+            for _ in range(self.webhooks.size + 1):
+                try:
+                    webhook = await self.webhooks.acquire(queue.channel)
+                except discord.Forbidden:
+                    logger.warning(f"沒有權限管理 {queue.channel} 的 webhook，改以機器人身分發送日誌")
+                    break
+                try:
+                    await webhook.send(embeds=embeds, **extra)
+                    return
+                except discord.NotFound:
+                    # webhook 已被刪除（不代表頻道已刪除）：移除後改用下一個
+                    self.webhooks.discard(queue.channel.id, webhook)
+                    for file in files:
+                        file.reset()
+            else:
+                logger.warning(f"{queue.channel} 的 webhook 無法使用，改以機器人身分發送日誌")
+        await queue.channel.send(embeds=embeds, **extra)
+
+    async def _send(self, queue: _ChannelQueue, batch: List[tuple]):
+        try:
+            await self._deliver(queue, batch)
+        except (discord.Forbidden, discord.NotFound) as e:
+            # 無法發送到此頻道，捨棄所有待發送的內容
+            dropped = len(batch) + len(queue.entries)
+            queue.entries.clear()
+            self.counters['dropped'] += dropped
+            logger.warning(f"無法發送日誌到 {queue.channel}，捨棄 {dropped} 筆: {e}")
+            return
+        except discord.HTTPException as e:
+            queue.failures += 1
+            if queue.failures > self.max_retries or (e.status < 500 and e.status != 429):
+                self.counters['dropped'] += len(batch)
+                logger.warning(f"發送日誌到 {queue.channel} 失敗，捨棄 {len(batch)} 筆: {e}")
+                queue.failures = 0
+            else:
+                # 速率限制或伺服器錯誤：放回佇列前端，延長下次發送間隔後重試
+                for _, file in batch:
+                    if file is not None:
+                        file.reset()
+                queue.entries.extendleft(reversed(batch))
+                self.counters['retries'] += 1
+            return
+        except Exception as e:
+            self.counters['dropped'] += len(batch)
+            logger.error(f"發送日誌到 {queue.channel} 失敗: {e}")
+            return
+
+        queue.failures = 0
+        self.counters['sent_messages'] += 1
+        self.counters['sent_embeds'] += len(batch)
+
+    async def close(self, timeout: float = 5):
+        """送出剩餘的日誌（最多等待 timeout 秒），然後停止所有佇列"""
+        self._closing = True
+        for queue in self._queues.values():
+            queue.ready.set()
+        tasks = [queue.task for queue in self._queues.values() if queue.task is not None]
+        if tasks:
+            _, unfinished = await asyncio.wait(tasks, timeout=timeout)
+            for task in unfinished:
+                task.cancel()
+        self.counters['dropped'] += self.pending
+        self._queues.clear()
+        if self.webhooks is not None:
+            await self.webhooks.close()
+
+    def stats(self) -> Dict[str, int]:
+        """目前的排隊數量與累計計數"""
+        return {'channels': len(self._queues), 'pending': self.pending, **self.counters}
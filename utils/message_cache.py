@@ -0,0 +1,330 @@
+"""
+訊息快取模組 - 記錄訊息內容供刪除/編輯日誌使用
+內容以 zlib 壓縮，依伺服器配額與總容量淘汰最舊的訊息，可選擇將淘汰的訊息移到磁碟（SQLite，在執行緒中存取）
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_RECORD_OVERHEAD = 160  # 每筆記錄的物件開銷估算（位元組）
+_COMPRESSED = 1
+_SQL_BATCH = 500  # 單一查詢最多的參數數量（SQLite 預設上限 999）
+
+
+class CachedMessage:
+    """快取中的訊息"""
+
+    __slots__ = ('id', 'guild_id', 'channel_id', 'author_id', 'created_at', 'content', 'attachments')
+
+    def __init__(self, message_id: int, guild_id: int, channel_id: int, author_id: int,
+                 created_at: float, content: str, attachments: Tuple[str, ...] = ()):
+        self.id = message_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.created_at = created_at  # UNIX 時間戳
+        self.content = content
+        self.attachments = attachments  # 附件檔名
+
+
+def _encode(content: str, attachments: Tuple[str, ...], compress_min: int) -> Tuple[int, bytes]:
+    data = content.encode('utf-8')
+    if attachments:
+        data += b'\x00' + '\x00'.join(attachments).encode('utf-8')
+    if len(data) >= compress_min:
+        compressed = zlib.compress(data, 6)
+        if len(compressed) < len(data):
+            return _COMPRESSED, compressed
+    return 0, data
+
+
+def _decode(flags: int, data: bytes) -> Tuple[str, Tuple[str, ...]]:
+    if flags & _COMPRESSED:
+        data = zlib.decompress(data)
+    content, *attachments = data.decode('utf-8').split('\x00')
+    return content, tuple(attachments)
+
+
+class MessageCache:
+    """有界、壓縮的訊息內容快取（每個伺服器各自依時間順序淘汰）"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, guild_quota_bytes: int = 4 * 1024 * 1024,
+                 compress_min: int = 64, spill_path: Optional[str] = None, spill_max_entries: int = 200000):
+        """
+        Args:
+            max_bytes: 記憶體中所有訊息的容量上限（估算）
+            guild_quota_bytes: 每個伺服器的容量上限
+            compress_min: 內容達此位元組數才壓縮
+            spill_path: 淘汰的訊息寫入此 SQLite 檔案（None 為直接捨棄）
+            spill_max_entries: 磁碟上最多保留的訊息數
+        """
+        self.max_bytes = max_bytes
+        self.guild_quota_bytes = guild_quota_bytes
+        self.compress_min = compress_min
+        self.spill_max_entries = spill_max_entries
+        # 依最後活動排序：伺服器 ID -> {訊息 ID: (頻道, 作者, 時間, 旗標, 資料)}
+        self._guilds: "OrderedDict[int, OrderedDict]" = OrderedDict()
+        self._guild_bytes: Dict[int, int] = {}
+        self.total_bytes = 0
+        self.counters = {'stored': 0, 'hits': 0, 'misses': 0, 'evicted': 0, 'spilled': 0, 'disk_hits': 0}
+
+        self._spill: Optional[sqlite3.Connection] = None
+        self._spill_pending: Dict[int, tuple] = {}  # 等待寫入磁碟的訊息：訊息 ID -> (伺服器 ID, 記錄)
+        self._spill_writing: Dict[int, tuple] = {}  # 正在執行緒中寫入磁碟的訊息
+        self._deleted_while_writing: set = set()  # 寫入期間被移除的訊息，寫入完成後從磁碟刪除
+        # 磁碟存取在執行緒中進行，連線以鎖保護
+        self._lock = threading.Lock()
+        if spill_path:
+            os.makedirs(os.path.dirname(spill_path) or '.', exist_ok=True)
+            self._spill = sqlite3.connect(spill_path, check_same_thread=False)
+            self._spill.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY, guild_id INTEGER, channel_id INTEGER, author_id INTEGER, "
+                "created_at REAL, flags INTEGER, data BLOB)"
+            )
+            self._spill.commit()
+
+    def __len__(self) -> int:
+        return sum(len(messages) for messages in self._guilds.values())
+
+    @staticmethod
+    def _size(record: tuple) -> int:
+        return len(record[4]) + _RECORD_OVERHEAD
+
+    def put(self, message_id: int, guild_id: int, channel_id: int, author_id: int, created_at: float,
+            content: str, attachments: Iterable[str] = ()):
+        """記錄訊息（相同 ID 會覆蓋，例如訊息被編輯）"""
+        attachments = tuple(attachments)
+        self._spill_pending.pop(message_id, None)
+        flags, data = _encode(content, attachments, self.compress_min)
+        record = (channel_id, author_id, created_at, flags, data)
+
+        messages = self._guilds.get(guild_id)
+        if messages is None:
+            messages = self._guilds[guild_id] = OrderedDict()
+            self._guild_bytes[guild_id] = 0
+        else:
+            self._guilds.move_to_end(guild_id)
+            old = messages.pop(message_id, None)
+            if old is not None:
+                self._account(guild_id, -self._size(old))
+        messages[message_id] = record
+        self._account(guild_id, self._size(record))
+        self.counters['stored'] += 1
+
+        while self._guild_bytes[guild_id] > self.guild_quota_bytes and len(messages) > 1:
+            self._evict(guild_id)
+        while self.total_bytes > self.max_bytes and self._guilds:
+            self._evict(next(iter(self._guilds)))
+
+    def _account(self, guild_id: int, delta: int):
+        self._guild_bytes[guild_id] += delta
+        self.total_bytes += delta
+
+    def _evict(self, guild_id: int):
+        """淘汰伺服器最舊的訊息"""
+        messages = self._guilds[guild_id]
+        message_id, record = messages.popitem(last=False)
+        self._account(guild_id, -self._size(record))
+        if not messages:
+            del self._guilds[guild_id]
+            del self._guild_bytes[guild_id]
+        self.counters['evicted'] += 1
+        if self._spill is not None:
+            self._spill_pending[message_id] = (guild_id, record)
+
+    def _lookup_memory(self, guild_id: int, message_id: int, remove: bool) -> Optional[tuple]:
+        """在記憶體（含等待/正在寫入磁碟的訊息）中查詢，不阻塞"""
+        messages = self._guilds.get(guild_id)
+        if messages is not None and message_id in messages:
+            if not remove:
+                return messages[message_id]
+            record = messages.pop(message_id)
+            self._account(guild_id, -self._size(record))
+            if not messages:
+                del self._guilds[guild_id]
+                del self._guild_bytes[guild_id]
+            return record
+
+        for spilled in (self._spill_pending, self._spill_writing):
+            entry = spilled.get(message_id)
+            if entry is not None and entry[0] == guild_id:
+                if remove:
+                    del spilled[message_id]
+                    if spilled is self._spill_writing:
+                        self._deleted_while_writing.add(message_id)
+                return entry[1]
+        return None
+
+    def _read_spilled(self, guild_id: int, message_ids: List[int], remove: bool) -> Dict[int, tuple]:
+        """以單一查詢從磁碟讀取訊息（會阻塞，在執行緒中執行）"""
+        found = {}
+        with self._lock:
+            if self._spill is None:
+                return found
+            for start in range(0, len(message_ids), _SQL_BATCH):
+                chunk = message_ids[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._spill.execute(
+                    f"SELECT id, channel_id, author_id, created_at, flags, data FROM messages "
+                    f"WHERE guild_id = ? AND id IN ({placeholders})",
+                    (guild_id, *chunk)
+                ).fetchall()
+                for message_id, *record in rows:
+                    found[message_id] = tuple(record)
+            if remove and found:
+                self._delete_rows(list(found))
+        return found
+
+    def _delete_rows(self, message_ids: List[int]):
+        """以單一交易刪除磁碟上的訊息（呼叫端須持有鎖）"""
+        with self._spill:
+            for start in range(0, len(message_ids), _SQL_BATCH):
+                chunk = message_ids[start:start + _SQL_BATCH]
+                self._spill.execute(f"DELETE FROM messages WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+
+    def _delete_spilled(self, message_ids: List[int]):
+        """刪除磁碟上的訊息（會阻塞，在執行緒中執行）"""
+        with self._lock:
+            if self._spill is not None:
+                try:
+                    self._delete_rows(message_ids)
+                except sqlite3.Error as e:
+                    logger.error(f"刪除訊息快取失敗: {e}")
+
+    async def _lookup(self, guild_id: int, message_ids: List[int], remove: bool) -> List[CachedMessage]:
+        """先查記憶體，找不到的訊息再一次從磁碟讀取（依訊息 ID 排序，即時間順序）"""
+        records, missing = {}, []
+        for message_id in message_ids:
+            record = self._lookup_memory(guild_id, message_id, remove)
+            if record is not None:
+                records[message_id] = record
+            else:
+                missing.append(message_id)
+        if missing and self._spill is not None:
+            spilled = await asyncio.to_thread(self._read_spilled, guild_id, missing, remove)
+            self.counters['disk_hits'] += len(spilled)
+            records.update(spilled)
+        self.counters['hits'] += len(records)
+        self.counters['misses'] += len(message_ids) - len(records)
+        found = []
+        for message_id in sorted(records):
+            channel_id, author_id, created_at, flags, data = records[message_id]
+            content, attachments = _decode(flags, data)
+            found.append(CachedMessage(message_id, guild_id, channel_id, author_id, created_at, content, attachments))
+        return found
+
+    async def get(self, guild_id: int, message_id: int) -> Optional[CachedMessage]:
+        """取得訊息（不移除）"""
+        found = await self._lookup(guild_id, [message_id], remove=False)
+        return found[0] if found else None
+
+    async def pop(self, guild_id: int, message_id: int) -> Optional[CachedMessage]:
+        """取得並移除訊息（訊息被刪除時）"""
+        found = await self._lookup(guild_id, [message_id], remove=True)
+        return found[0] if found else None
+
+    async def pop_many(self, guild_id: int, message_ids: Iterable[int]) -> List[CachedMessage]:
+        """取得並移除多則訊息（依訊息 ID 排序，即時間順序；磁碟上的訊息以單一查詢讀取）"""
+        return await self._lookup(guild_id, list(message_ids), remove=True)
+
+    def _delete_spilled_guild(self, guild_id: int):
+        with self._lock:
+            if self._spill is not None:
+                with self._spill:
+                    self._spill.execute("DELETE FROM messages WHERE guild_id = ?", (guild_id,))
+
+    async def forget_guild(self, guild_id: int):
+        """移除伺服器的所有訊息（例如機器人離開伺服器）"""
+        messages = self._guilds.pop(guild_id, None)
+        if messages is not None:
+            self.total_bytes -= self._guild_bytes.pop(guild_id)
+        if self._spill is not None:
+            self._spill_pending = {
+                message_id: entry for message_id, entry in self._spill_pending.items() if entry[0] != guild_id
+            }
+            # 正在寫入的訊息可能在刪除之後才寫入，寫入完成後再刪除一次
+            self._deleted_while_writing.update(
+                message_id for message_id, entry in self._spill_writing.items() if entry[0] == guild_id
+            )
+            await asyncio.to_thread(self._delete_spilled_guild, guild_id)
+
+    def _write_spill(self, rows: List[tuple]) -> bool:
+        """
+        以單一交易寫入磁碟，並刪除超過上限的最舊訊息（會阻塞，在執行緒中執行）
+
+        Args:
+            rows: 在事件循環中建立的資料列快照（執行緒中不可讀取會被修改的字典）
+        """
+        with self._lock:
+            if self._spill is None:
+                return False
+            try:
+                with self._spill:
+                    self._spill.executemany(
+                        "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        rows
+                    )
+                    # 訊息 ID 依時間遞增，超過上限時刪除最舊的
+                    self._spill.execute(
+                        "DELETE FROM messages WHERE id <= "
+                        "(SELECT id FROM messages ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (self.spill_max_entries,)
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"寫入訊息快取失敗: {e}")
+                return False
+        return True
+
+    async def flush(self) -> int:
+        """
+        將等待中的淘汰訊息在執行緒中寫入磁碟（寫入期間仍可從記憶體查詢這些訊息）
+
+        Returns:
+            寫入的數量
+        """
+        if self._spill is None or not self._spill_pending:
+            return 0
+        pending, self._spill_pending = self._spill_pending, {}
+        rows = [(message_id, guild_id, *record) for message_id, (guild_id, record) in pending.items()]
+        self._spill_writing = pending
+        try:
+            written = await asyncio.to_thread(self._write_spill, rows)
+        finally:
+            self._spill_writing = {}
+            # 寫入期間被刪除的訊息不應留在磁碟上
+            deleted, self._deleted_while_writing = self._deleted_while_writing, set()
+            if deleted:
+                await asyncio.to_thread(self._delete_spilled, list(deleted))
+        if not written:
+            return 0
+        self.counters['spilled'] += len(rows)
+        return len(rows)
+
+    def _close_spill(self):
+        with self._lock:
+            self._spill.close()
+            self._spill = None
+
+    async def close(self):
+        """寫入剩餘的訊息並關閉磁碟檔案"""
+        if self._spill is not None:
+            await self.flush()
+            await asyncio.to_thread(self._close_spill)
+
+    def stats(self) -> Dict[str, int]:
+        """目前的項目數與記憶體用量"""
+        return {
+            'guilds': len(self._guilds),
+            'entries': len(self),
+            'approx_bytes': self.total_bytes,
+            'spill_pending': len(self._spill_pending),
+            **self.counters,
+        }
@@ -0,0 +1,168 @@
+"""
+效能指標模組 - 提供延遲直方圖與資料層統計
+"""
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Any, Tuple
+
+# 延遲直方圖的桶邊界（毫秒）
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class LatencyHistogram:
+    """固定桶邊界的延遲直方圖"""
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)  # 最後一格為溢出桶
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float):
+        """記錄一次觀測值"""
+        self.buckets[bisect_left(self.bounds, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def percentile(self, p: float) -> float:
+        """
+        估算百分位數（回傳所在桶的上界）
+
+        Args:
+            p: 百分位（0-100）
+
+        Returns:
+            估算的延遲（毫秒）
+        """
+        if not self.count:
+            return 0.0
+
+        target = self.count * p / 100
+        seen = 0
+        for i, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= target:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        """輸出為可序列化的字典"""
+        labels = [f"le_{b}" for b in self.bounds] + ["le_inf"]
+        return {
+            'count': self.count,
+            'total_ms': round(self.total, 3),
+            'avg_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max, 3),
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'buckets': dict(zip(labels, self.buckets)),
+        }
+
+
+class DatasetStats:
+    """單一資料集的 I/O 統計"""
+
+    def __init__(self):
+        self.reads = 0
+        self.cache_hits = 0
+        self.writes = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.read_io_ms = 0.0
+        self.parse_ms = 0.0
+        self.serialize_ms = 0.0
+        self.write_io_ms = 0.0
+        self.lock_acquisitions = 0
+        self.lock_wait = LatencyHistogram()
+        self.version_conflicts = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'reads': self.reads,
+            'cache_hits': self.cache_hits,
+            'writes': self.writes,
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'read_io_ms': round(self.read_io_ms, 3),
+            'parse_ms': round(self.parse_ms, 3),
+            'serialize_ms': round(self.serialize_ms, 3),
+            'write_io_ms': round(self.write_io_ms, 3),
+            'lock_acquisitions': self.lock_acquisitions,
+            'lock_wait': self.lock_wait.to_dict(),
+            'version_conflicts': self.version_conflicts,
+        }
+
+
+class StorageMetrics:
+    """資料層指標收集器（執行緒安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清除所有統計"""
+        with self._lock:
+            self.methods: Dict[Tuple[str, str], LatencyHistogram] = defaultdict(LatencyHistogram)
+            self.datasets: Dict[str, DatasetStats] = defaultdict(DatasetStats)
+
+    def record_call(self, dataset: str, method: str, elapsed_ms: float):
+        """記錄一次公開方法呼叫"""
+        with self._lock:
+            self.methods[(dataset, method)].observe(elapsed_ms)
+
+    def record_read(self, dataset: str, nbytes: int, io_ms: float, parse_ms: float):
+        """記錄一次檔案讀取"""
+        with self._lock:
+            stats = self.datasets[dataset]
+            stats.reads += 1
+            stats.bytes_read += nbytes
+            stats.read_io_ms += io_ms
+            stats.parse_ms += parse_ms
+
+    def record_cache_hit(self, dataset: str):
+        """記錄一次快取命中（未讀取檔案）"""
+        with self._lock:
+            self.datasets[dataset].cache_hits += 1
+
+    def record_write(self, dataset: str, nbytes: int, serialize_ms: float, io_ms: float):
+        """記錄一次檔案寫入"""
+        with self._lock:
+            stats = self.datasets[dataset]
+            stats.writes += 1
+            stats.bytes_written += nbytes
+            stats.serialize_ms += serialize_ms
+            stats.write_io_ms += io_ms
+
+    def record_lock_wait(self, dataset: str, wait_ms: float):
+        """記錄一次鎖等待時間"""
+        with self._lock:
+            stats = self.datasets[dataset]
+            stats.lock_acquisitions += 1
+            stats.lock_wait.observe(wait_ms)
+
+    def record_conflict(self, dataset: str):
+        """記錄一次樂觀並行控制的版本衝突"""
+        with self._lock:
+            self.datasets[dataset].version_conflicts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        輸出目前的統計快照
+
+        Returns:
+            {'datasets': {名稱: {...}}, 'methods': {'資料集.方法': {...}}}
+        """
+        with self._lock:
+            return {
+                'datasets': {name: stats.to_dict() for name, stats in self.datasets.items()},
+                'methods': {
+                    f"{dataset}.{method}": hist.to_dict()
+                    for (dataset, method), hist in sorted(self.methods.items())
+                },
+            }
@@ -0,0 +1,121 @@
+"""
+角色佇列模組 - 以固定速率依序為成員添加角色
+大量成員加入時自動角色不會同時發出大量 API 請求；暫時性錯誤（速率限制、伺服器錯誤）會延後重試
+"""
+import asyncio
+import itertools
+import logging
+from collections import deque
+from typing import Dict, Optional
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+
+class RoleAssignmentQueue:
+    """自動角色的速率限制工作佇列"""
+
+    def __init__(self, rate_per_second: float = 2, max_retries: int = 3, max_pending: int = 5000,
+                 reason: str = "自動角色"):
+        """
+        Args:
+            rate_per_second: 每秒最多添加的角色數
+            max_retries: 暫時性錯誤的重試次數（每次延後時間加倍）
+            max_pending: 最多排隊的數量，超過時捨棄新的請求
+            reason: 審核日誌中的原因
+        """
+        self.interval = 1 / rate_per_second
+        self.max_retries = max_retries
+        self.max_pending = max_pending
+        self.reason = reason
+        self._queue: deque = deque()  # (成員, 角色, 已重試次數)
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._retries: Dict[int, asyncio.TimerHandle] = {}  # 等待重試的計時器（關閉時取消）
+        self._retry_ids = itertools.count()
+        self._closed = False
+        self.counters = {'queued': 0, 'added': 0, 'skipped': 0, 'retries': 0, 'failed': 0, 'dropped': 0}
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue) + len(self._retries)
+
+    def enqueue(self, member: discord.Member, role: discord.Role, attempts: int = 0):
+        """加入待添加的角色（不等待完成）"""
+        if self._closed:
+            return
+        if self.pending >= self.max_pending:
+            self.counters['dropped'] += 1
+            return
+        self._queue.append((member, role, attempts))
+        if attempts == 0:
+            self.counters['queued'] += 1
+        self._ready.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._worker())
+
+    def _retry_later(self, retry_id: int, member: discord.Member, role: discord.Role, attempts: int):
+        self._retries.pop(retry_id, None)
+        self.enqueue(member, role, attempts)
+
+    async def _worker(self):
+        while True:
+            if not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            member, role, attempts = self._queue.popleft()
+            if await self._assign(member, role, attempts):
+                await asyncio.sleep(self.interval)
+
+    async def _assign(self, member: discord.Member, role: discord.Role, attempts: int) -> bool:
+        """
+        添加角色
+
+        Returns:
+            是否發出了 API 請求（未發出時不需等待）
+        """
+        # 排隊期間已離開的成員或已有此角色時略過
+        current = member.guild.get_member(member.id)
+        if current is None or current.get_role(role.id) is not None:
+            self.counters['skipped'] += 1
+            return False
+        try:
+            await current.add_roles(role, reason=self.reason)
+        except (discord.Forbidden, discord.NotFound) as e:
+            logger.error(f"添加自動角色失敗 ({member}): {e}")
+            self.counters['failed'] += 1
+        except discord.HTTPException as e:
+            if attempts < self.max_retries and (e.status == 429 or e.status >= 500):
+                delay = self.interval * 2 ** (attempts + 2)
+                self.counters['retries'] += 1
+                retry_id = next(self._retry_ids)
+                self._retries[retry_id] = asyncio.get_running_loop().call_later(
+                    delay, self._retry_later, retry_id, member, role, attempts + 1
+                )
+            else:
+                logger.error(f"添加自動角色失敗 ({member}): {e}")
+                self.counters['failed'] += 1
+        except Exception as e:
+            logger.error(f"添加自動角色失敗 ({member}): {e}")
+            self.counters['failed'] += 1
+        else:
+            self.counters['added'] += 1
+        return True
+
+    def close(self):
+        """停止工作（尚未處理與等待重試的請求會被捨棄）"""
+        self._closed = True
+        for handle in self._retries.values():
+            handle.cancel()
+        self.counters['dropped'] += len(self._retries)
+        self._retries.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.counters['dropped'] += len(self._queue)
+        self._queue.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'pending': self.pending, **self.counters}
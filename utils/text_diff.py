@@ -0,0 +1,102 @@
+"""
+文字差異模組 - 產生訊息編輯的精簡逐詞差異
+刪除的部分以 ~~刪除線~~、新增的部分以 **粗體** 標示，未變更的長段落只保留前後文
+"""
+import difflib
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+from discord.utils import escape_markdown
+
+# 中日韓文字沒有空白分隔，逐字比對；其餘以單字、空白、標點為單位
+_CJK = r'\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+# \w 也包含中日韓文字，單字類別必須排除，否則緊接在英數字後的中文會併成同一個詞
+_TOKEN_PATTERN = re.compile(rf'[{_CJK}]|[^\W{_CJK}]+|\s+|[^\w\s]')
+
+MAX_DIFF_TOKENS = 200  # 去除相同前後綴後任一邊超過此數量時不做逐詞比對（比對時間約為 O(n²)，200 個詞最差約 30 毫秒）
+CONTEXT_CHARS = 30  # 未變更段落保留的前後文字元數
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text)
+
+
+def _context(text: str, position: str) -> str:
+    """縮短未變更的段落：開頭只保留結尾、結尾只保留開頭、中間保留兩端"""
+    if len(text) <= CONTEXT_CHARS * 2:
+        return escape_markdown(text)
+    if position == 'start':
+        return "…" + escape_markdown(text[-CONTEXT_CHARS:])
+    if position == 'end':
+        return escape_markdown(text[:CONTEXT_CHARS]) + "…"
+    return escape_markdown(text[:CONTEXT_CHARS]) + " … " + escape_markdown(text[-CONTEXT_CHARS:])
+
+
+def _mark(text: str, marker: str) -> str:
+    """標示新增/刪除的段落（前後空白放在標記外，Discord 才能正確顯示）"""
+    stripped = text.strip()
+    if not stripped:
+        return text
+    leading = text[:len(text) - len(text.lstrip())]
+    trailing = text[len(text.rstrip()):]
+    return f"{leading}{marker}{escape_markdown(stripped)}{marker}{trailing}"
+
+
+def _opcodes(before: List[str], after: List[str]) -> List[Tuple[str, str, str]]:
+    """回傳 [(動作, 刪除的文字, 新增的文字)]，動作為 equal / replace / delete / insert"""
+    # 先去除相同的前後綴，只比對中間變更的部分
+    start = 0
+    limit = min(len(before), len(after))
+    while start < limit and before[start] == after[start]:
+        start += 1
+    end = 0
+    while end < limit - start and before[-1 - end] == after[-1 - end]:
+        end += 1
+    middle_before = before[start:len(before) - end]
+    middle_after = after[start:len(after) - end]
+
+    ops = []
+    if start:
+        ops.append(('equal', "".join(before[:start]), ""))
+    if len(middle_before) > MAX_DIFF_TOKENS or len(middle_after) > MAX_DIFF_TOKENS:
+        # 變更範圍太大，整段視為取代
+        ops.append(('replace', "".join(middle_before), "".join(middle_after)))
+    else:
+        matcher = difflib.SequenceMatcher(None, middle_before, middle_after, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            ops.append((tag, "".join(middle_before[i1:i2]), "".join(middle_after[j1:j2])))
+    if end:
+        ops.append(('equal', "".join(before[len(before) - end:]), ""))
+    return ops
+
+
+@lru_cache(maxsize=256)
+def render_diff(before: str, after: str, max_chars: int = 1024) -> str:
+    """
+    產生逐詞差異（結果會快取，同一則訊息的多個日誌不需重新計算；
+    長訊息的比對可能需要數十毫秒，在事件循環中請以 asyncio.to_thread 呼叫）
+
+    Args:
+        before: 編輯前內容
+        after: 編輯後內容
+        max_chars: 結果的最大長度
+
+    Returns:
+        Discord markdown 格式的差異
+    """
+    ops = _opcodes(_tokenize(before), _tokenize(after))
+    parts = []
+    for index, (tag, removed, added) in enumerate(ops):
+        if tag == 'equal':
+            position = 'start' if index == 0 else 'end' if index == len(ops) - 1 else 'middle'
+            parts.append(_context(removed, position))
+            continue
+        if removed:
+            parts.append(_mark(removed, "~~"))
+        if added:
+            parts.append(_mark(added, "**"))
+    result = "".join(parts)
+    if len(result) > max_chars:
+        result = result[:max_chars - 1] + "…"
+    return result
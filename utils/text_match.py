@@ -0,0 +1,196 @@
+"""
+文字比對模組 - 提供正規化、Aho-Corasick 多字串比對與 MinHash 簽章
+"""
+import unicodedata
+import zlib
+from collections import deque
+from typing import Iterable, List, Optional, Tuple
+
+# 常見的 leetspeak 替換與零寬字元移除
+_LEET_TABLE = str.maketrans({
+    '0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b',
+    '@': 'a', '$': 's', '!': 'i', '|': 'l', '+': 't',
+    '\u200b': None, '\u200c': None, '\u200d': None, '\u2060': None, '\ufeff': None,
+})
+
+# MinHash 參數（單次雜湊 + 分桶，每個字元組只需計算一次雜湊）
+SHINGLE_SIZE = 3  # 以 3 個字元為一組
+MINHASH_BUCKETS = 32  # 簽章長度
+_BUCKET_SHIFT = 64 - 5  # 以雜湊的最高 5 位元決定分桶（2^5 = MINHASH_BUCKETS）
+_VALUE_MASK = (1 << _BUCKET_SHIFT) - 1
+_MIX = 0x9E3779B97F4A7C15  # 將 32 位元的 crc32 擴散到 64 位元
+_MASK = (1 << 64) - 1
+
+
+def count_characters(text: str) -> Tuple[int, int, int]:
+    """
+    單次掃描文字，統計大寫字母、表情符號與組合附加符號（zalgo）的數量
+
+    Args:
+        text: 原始文字
+
+    Returns:
+        (大寫字母數, 表情符號數, 組合附加符號數)；自訂表情 <:name:id> 也計入表情符號
+    """
+    upper = emoji = combining = 0
+    custom = False
+    for c in text:
+        if c.isupper():
+            upper += 1
+        elif c >= '\u0300':
+            o = ord(c)
+            if (0x0300 <= o <= 0x036F or 0x1AB0 <= o <= 0x1AFF or 0x1DC0 <= o <= 0x1DFF
+                    or 0x20D0 <= o <= 0x20FF or 0xFE20 <= o <= 0xFE2F):
+                combining += 1
+            elif 0x1F000 <= o <= 0x1FAFF or 0x2600 <= o <= 0x27BF:
+                emoji += 1
+        elif c == '<':
+            custom = True
+    if custom:
+        # 只有出現過 < 時才計算自訂表情（C 層級的子字串計數）
+        emoji += text.count('<:') + text.count('<a:')
+    return upper, emoji, combining
+
+
+def normalize_text(text: str) -> str:
+    """
+    正規化文字以便比對：全形轉半形（NFKC）、忽略大小寫、常見 leetspeak 還原、移除零寬字元
+
+    Args:
+        text: 原始文字
+
+    Returns:
+        正規化後的文字
+    """
+    return unicodedata.normalize('NFKC', text).casefold().translate(_LEET_TABLE)
+
+
+class AhoCorasick:
+    """Aho-Corasick 自動機：比對成本與訊息長度成正比，與詞彙數量無關"""
+
+    def __init__(self, terms: Iterable[str]):
+        """
+        Args:
+            terms: 要比對的詞彙（會先經過 normalize_text）
+        """
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Optional[str]] = [None]  # 在此節點結束的最長詞彙（含失敗鏈）
+        self.size = 0
+
+        for term in terms:
+            normalized = normalize_text(term).strip()
+            if normalized:
+                self._add(normalized, term)
+        self._build()
+
+    def _add(self, normalized: str, original: str):
+        node = 0
+        for ch in normalized:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+            node = nxt
+        if self._output[node] is None:
+            self.size += 1
+        self._output[node] = original
+
+    def _build(self):
+        """以 BFS 建立失敗連結"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                if self._output[child] is None:
+                    self._output[child] = self._output[self._fail[child]]
+
+    def search(self, normalized_text: str) -> Optional[str]:
+        """
+        尋找第一個出現的詞彙
+
+        Args:
+            normalized_text: 已經過 normalize_text 的文字
+
+        Returns:
+            符合的原始詞彙，沒有則為 None
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for ch in normalized_text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node] is not None:
+                return output[node]
+        return None
+
+    def find_all(self, normalized_text: str) -> List[Tuple[int, str]]:
+        """
+        尋找所有出現的詞彙
+
+        Returns:
+            [(結束位置, 原始詞彙)]（每個位置只回報最長的詞彙）
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        matches = []
+        for i, ch in enumerate(normalized_text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node] is not None:
+                matches.append((i, output[node]))
+        return matches
+
+
+def minhash_signature(normalized_text: str) -> Tuple[int, ...]:
+    """
+    計算 MinHash 簽章（兩段文字簽章相同位置的比例約等於字元組集合的 Jaccard 相似度）
+
+    Args:
+        normalized_text: 已經過 normalize_text 的文字
+
+    Returns:
+        長度為 MINHASH_BUCKETS 的簽章
+    """
+    text = ' '.join(normalized_text.split())
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(max(len(text) - SHINGLE_SIZE + 1, 1))}
+
+    empty = _VALUE_MASK + 1
+    signature = [empty] * MINHASH_BUCKETS
+    # 使用所有字元組：集合的順序依 PYTHONHASHSEED 而不同，截斷取樣會讓不同行程的簽章無法比較
+    # （Discord 訊息最多 4000 字元，crc32 的成本可以接受）
+    for shingle in shingles:
+        # 不使用內建 hash()：其結果每個行程不同，簽章需要能跨行程比較
+        h = (zlib.crc32(shingle.encode()) * _MIX) & _MASK
+        bucket = h >> _BUCKET_SHIFT
+        value = h & _VALUE_MASK
+        if value < signature[bucket]:
+            signature[bucket] = value
+
+    # 空的分桶向後借用下一個非空分桶的值（加上距離區分），短訊息也能得到完整簽章
+    filled = tuple(signature)
+    for i in range(MINHASH_BUCKETS):
+        if filled[i] != empty:
+            continue
+        for step in range(1, MINHASH_BUCKETS):
+            value = filled[(i + step) % MINHASH_BUCKETS]
+            if value != empty:
+                signature[i] = -(value + 1) * MINHASH_BUCKETS - step
+                break
+    return tuple(signature)
+
+
+def signature_similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    """兩個 MinHash 簽章的估計相似度 (0-1)"""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
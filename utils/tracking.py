@@ -0,0 +1,475 @@
+"""
+記憶體追蹤模組 - 提供有界、會自動淘汰閒置項目的追蹤結構
+"""
+import sys
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Hashable, Optional, Tuple
+
+
+class RecentMessageTracker:
+    """每個 (頻道, 作者) 最近訊息內容雜湊的環形緩衝區"""
+
+    def __init__(self, size: int = 5, idle_seconds: float = 300, max_keys: int = 10000):
+        """
+        Args:
+            size: 每個 (頻道, 作者) 保留的訊息數
+            idle_seconds: 超過此秒數未活動的緩衝區會被淘汰
+            max_keys: 最多追蹤的 (頻道, 作者) 數量，超過時淘汰最久未活動的
+        """
+        self.size = size
+        self.idle_seconds = idle_seconds
+        self.max_keys = max_keys
+        # 依最後活動時間排序：(頻道, 作者) -> [最後活動時間, deque[內容雜湊]]
+        self._buffers: "OrderedDict[Hashable, list]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+    def record(self, channel_id: int, author_id: int, content: str, now: Optional[float] = None) -> int:
+        """
+        記錄一則訊息
+
+        Args:
+            channel_id: 頻道 ID
+            author_id: 作者 ID
+            content: 訊息內容
+            now: 目前時間（預設 time.monotonic()）
+
+        Returns:
+            此作者在此頻道最近訊息中與本則內容相同的數量（不含本則）
+        """
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+
+        key = (channel_id, author_id)
+        entry = self._buffers.get(key)
+        if entry is None:
+            entry = [now, deque(maxlen=self.size)]
+            self._buffers[key] = entry
+        else:
+            entry[0] = now
+            self._buffers.move_to_end(key)
+
+        digest = hash(content)
+        buffer = entry[1]
+        matches = buffer.count(digest)
+        buffer.append(digest)
+        return matches
+
+    def _evict(self, now: float):
+        """淘汰閒置或超量的緩衝區（依活動順序，從最舊的開始）"""
+        buffers = self._buffers
+        while buffers:
+            key, (last_seen, _) = next(iter(buffers.items()))
+            if now - last_seen < self.idle_seconds and len(buffers) < self.max_keys:
+                break
+            del buffers[key]
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        主動淘汰閒置的緩衝區
+
+        Returns:
+            淘汰的數量
+        """
+        before = len(self._buffers)
+        self._evict(time.monotonic() if now is None else now)
+        return before - len(self._buffers)
+
+    def stats(self) -> Dict[str, int]:
+        """目前的項目數與估算記憶體用量"""
+        return {
+            'keys': len(self._buffers),
+            'entries': sum(len(buffer) for _, buffer in self._buffers.values()),
+            'approx_bytes': sys.getsizeof(self._buffers) + sum(
+                sys.getsizeof(entry) + sys.getsizeof(entry[1]) for entry in self._buffers.values()
+            ),
+        }
+
+
+class SlidingWindowTracker:
+    """以 deque 實作的滑動視窗事件計數器（鍵值如 (伺服器, 用戶)）"""
+
+    def __init__(self, idle_seconds: float = 300, max_keys: int = 10000, max_events: int = 100):
+        """
+        Args:
+            idle_seconds: 超過此秒數沒有事件的鍵值會在 sweep 時淘汰
+            max_keys: 最多追蹤的鍵值數量，超過時淘汰最久未活動的
+            max_events: 每個鍵值最多保留的事件數
+        """
+        self.idle_seconds = idle_seconds
+        self.max_keys = max_keys
+        self.max_events = max_events
+        # 依最後事件時間排序：鍵值 -> deque[事件時間]
+        self._windows: "OrderedDict[Hashable, deque]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def hit(self, key: Hashable, window_seconds: float, now: Optional[float] = None) -> int:
+        """
+        記錄一次事件
+
+        Args:
+            key: 鍵值
+            window_seconds: 視窗長度（秒）
+            now: 目前時間（預設 time.monotonic()）
+
+        Returns:
+            視窗內（含本次）的事件數
+        """
+        now = time.monotonic() if now is None else now
+        window = self._windows.get(key)
+        if window is None:
+            if len(self._windows) >= self.max_keys:
+                self._windows.popitem(last=False)
+            window = deque(maxlen=self.max_events)
+            self._windows[key] = window
+        else:
+            self._windows.move_to_end(key)
+
+        cutoff = now - window_seconds
+        while window and window[0] <= cutoff:
+            window.popleft()
+        window.append(now)
+        return len(window)
+
+    def reset(self, key: Hashable):
+        """清除某鍵值的事件"""
+        self._windows.pop(key, None)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        淘汰閒置的鍵值
+
+        Returns:
+            淘汰的數量
+        """
+        now = time.monotonic() if now is None else now
+        removed = 0
+        while self._windows:
+            key, window = next(iter(self._windows.items()))
+            if window and now - window[-1] < self.idle_seconds:
+                break
+            del self._windows[key]
+            removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """目前的項目數與估算記憶體用量"""
+        return {
+            'keys': len(self._windows),
+            'entries': sum(len(window) for window in self._windows.values()),
+            'approx_bytes': sys.getsizeof(self._windows) + sum(
+                sys.getsizeof(window) for window in self._windows.values()
+            ),
+        }
+
+
+class NearDuplicateIndex:
+    """每個頻道最近訊息 MinHash 簽章的 LSH 索引，用來偵測多人複製貼上的相似訊息"""
+
+    ROWS_PER_BAND = 2  # 簽章每 2 個值為一段；任一段完全相同才會成為候選
+
+    def __init__(self, window_seconds: float = 30, history_size: int = 50, min_similarity: float = 0.6,
+                 idle_seconds: float = 300, max_keys: int = 10000):
+        """
+        Args:
+            window_seconds: 只比對此秒數內的訊息
+            history_size: 每個頻道保留的簽章數
+            min_similarity: 估計相似度達此值視為相似 (0-1)
+            idle_seconds: 超過此秒數未活動的頻道會在 sweep 時淘汰
+            max_keys: 最多追蹤的頻道數量，超過時淘汰最久未活動的
+        """
+        self.window_seconds = window_seconds
+        self.history_size = history_size
+        self.min_similarity = min_similarity
+        self.idle_seconds = idle_seconds
+        self.max_keys = max_keys
+        # 依最後活動時間排序：頻道 ID -> [deque[(時間, 簽章, 作者, 分段鍵值)], {分段鍵值: [項目]}]
+        self._channels: "OrderedDict[int, list]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def _band_keys(self, signature: tuple) -> tuple:
+        rows = self.ROWS_PER_BAND
+        return tuple((i, signature[i:i + rows]) for i in range(0, len(signature), rows))
+
+    def add(self, channel_id: int, author_id: int, signature: tuple, now: Optional[float] = None) -> Tuple[int, int]:
+        """
+        比對並記錄一則訊息的簽章
+
+        Args:
+            channel_id: 頻道 ID
+            author_id: 作者 ID
+            signature: 訊息的 MinHash 簽章
+            now: 目前時間（預設 time.monotonic()）
+
+        Returns:
+            (視窗內相似訊息數, 相似訊息的不同作者數)，皆不含本則
+        """
+        now = time.monotonic() if now is None else now
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            if len(self._channels) >= self.max_keys:
+                self._channels.popitem(last=False)
+            channel = [deque(), {}]
+            self._channels[channel_id] = channel
+        else:
+            self._channels.move_to_end(channel_id)
+
+        entries, buckets = channel
+        cutoff = now - self.window_seconds
+        while entries and (entries[0][0] <= cutoff or len(entries) >= self.history_size):
+            self._remove(buckets, entries.popleft())
+
+        # 只比對至少有一段相同的候選項目
+        band_keys = self._band_keys(signature)
+        required = self.min_similarity * len(signature)
+        seen = set()
+        authors = set()
+        matches = 0
+        for band_key in band_keys:
+            for entry in buckets.get(band_key, ()):
+                if id(entry) in seen:
+                    continue
+                seen.add(id(entry))
+                if sum(1 for x, y in zip(entry[1], signature) if x == y) >= required:
+                    matches += 1
+                    authors.add(entry[2])
+
+        entry = (now, signature, author_id, band_keys)
+        entries.append(entry)
+        for band_key in band_keys:
+            buckets.setdefault(band_key, []).append(entry)
+        return matches, len(authors)
+
+    @staticmethod
+    def _remove(buckets: dict, entry: tuple):
+        for band_key in entry[3]:
+            bucket = buckets.get(band_key)
+            if bucket is None:
+                continue
+            for i, item in enumerate(bucket):
+                if item is entry:
+                    del bucket[i]
+                    break
+            if not bucket:
+                del buckets[band_key]
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        淘汰閒置的頻道
+
+        Returns:
+            淘汰的數量
+        """
+        now = time.monotonic() if now is None else now
+        removed = 0
+        while self._channels:
+            channel_id, (entries, _) = next(iter(self._channels.items()))
+            if entries and now - entries[-1][0] < self.idle_seconds:
+                break
+            del self._channels[channel_id]
+            removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """目前的項目數與估算記憶體用量"""
+        return {
+            'keys': len(self._channels),
+            'entries': sum(len(entries) for entries, _ in self._channels.values()),
+            'approx_bytes': sys.getsizeof(self._channels) + sum(
+                sys.getsizeof(entries) + sys.getsizeof(buckets) + sum(sys.getsizeof(b) for b in buckets.values())
+                for entries, buckets in self._channels.values()
+            ),
+        }
+
+
+class JoinRateTracker:
+    """以固定大小時間桶記錄每個伺服器的加入人數與新帳號數量"""
+
+    def __init__(self, bucket_seconds: float = 10, bucket_count: int = 6,
+                 young_account_seconds: float = 7 * 86400, max_keys: int = 10000):
+        """
+        Args:
+            bucket_seconds: 每個時間桶的長度（秒）
+            bucket_count: 時間桶數量（視窗 = bucket_seconds * bucket_count）
+            young_account_seconds: 帳號年齡小於此秒數視為新帳號
+            max_keys: 最多追蹤的伺服器數量，超過時淘汰最久未活動的
+        """
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = bucket_count
+        self.young_account_seconds = young_account_seconds
+        self.max_keys = max_keys
+        # 依最後加入時間排序：伺服器 ID -> [[桶編號, 加入數, 新帳號數] * bucket_count]
+        self._guilds: "OrderedDict[int, list]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._guilds)
+
+    @property
+    def window_seconds(self) -> float:
+        return self.bucket_seconds * self.bucket_count
+
+    def _totals(self, buckets: list, index: int) -> Tuple[int, int]:
+        oldest = index - self.bucket_count
+        joins = young = 0
+        for bucket_index, bucket_joins, bucket_young in buckets:
+            if bucket_index > oldest:
+                joins += bucket_joins
+                young += bucket_young
+        return joins, young
+
+    def record(self, guild_id: int, account_age_seconds: float, now: Optional[float] = None) -> Tuple[int, int]:
+        """
+        記錄一位成員加入
+
+        Args:
+            guild_id: 伺服器 ID
+            account_age_seconds: 帳號年齡（秒）
+            now: 目前時間（預設 time.monotonic()）
+
+        Returns:
+            (視窗內加入人數, 視窗內新帳號數)，皆含本次
+        """
+        now = time.monotonic() if now is None else now
+        buckets = self._guilds.get(guild_id)
+        if buckets is None:
+            if len(self._guilds) >= self.max_keys:
+                self._guilds.popitem(last=False)
+            buckets = [[-1, 0, 0] for _ in range(self.bucket_count)]
+            self._guilds[guild_id] = buckets
+        else:
+            self._guilds.move_to_end(guild_id)
+
+        index = int(now // self.bucket_seconds)
+        bucket = buckets[index % self.bucket_count]
+        if bucket[0] != index:
+            bucket[0], bucket[1], bucket[2] = index, 0, 0
+        bucket[1] += 1
+        if account_age_seconds < self.young_account_seconds:
+            bucket[2] += 1
+        return self._totals(buckets, index)
+
+    def rate(self, guild_id: int, now: Optional[float] = None) -> Tuple[int, int]:
+        """目前視窗內的 (加入人數, 新帳號數)"""
+        buckets = self._guilds.get(guild_id)
+        if buckets is None:
+            return 0, 0
+        now = time.monotonic() if now is None else now
+        return self._totals(buckets, int(now // self.bucket_seconds))
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        淘汰視窗內已沒有加入記錄的伺服器
+
+        Returns:
+            淘汰的數量
+        """
+        now = time.monotonic() if now is None else now
+        oldest = int(now // self.bucket_seconds) - self.bucket_count
+        removed = 0
+        while self._guilds:
+            guild_id, buckets = next(iter(self._guilds.items()))
+            if max(bucket[0] for bucket in buckets) > oldest:
+                break
+            del self._guilds[guild_id]
+            removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """目前的項目數與估算記憶體用量"""
+        return {
+            'keys': len(self._guilds),
+            'entries': len(self._guilds) * self.bucket_count,
+            'approx_bytes': sys.getsizeof(self._guilds) + sum(
+                sys.getsizeof(buckets) + sum(sys.getsizeof(bucket) for bucket in buckets)
+                for buckets in self._guilds.values()
+            ),
+        }
+
+
+class MessageRateTracker:
+    """以固定大小時間桶記錄每個頻道的訊息數量（記錄與查詢皆為 O(桶數)，不保存個別時間戳）"""
+
+    def __init__(self, bucket_seconds: float = 10, bucket_count: int = 6, max_keys: int = 10000):
+        """
+        Args:
+            bucket_seconds: 每個時間桶的長度（秒）
+            bucket_count: 時間桶數量（視窗 = bucket_seconds * bucket_count）
+            max_keys: 最多追蹤的頻道數量，超過時淘汰最久未活動的
+        """
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = bucket_count
+        self.max_keys = max_keys
+        # 依最後訊息時間排序：頻道 ID -> [[桶編號, 訊息數] * bucket_count]
+        self._channels: "OrderedDict[int, list]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    @property
+    def window_seconds(self) -> float:
+        return self.bucket_seconds * self.bucket_count
+
+    def _total(self, buckets: list, index: int) -> int:
+        oldest = index - self.bucket_count
+        return sum(count for bucket_index, count in buckets if bucket_index > oldest)
+
+    def record(self, channel_id: int, now: Optional[float] = None):
+        """記錄一則訊息"""
+        now = time.monotonic() if now is None else now
+        buckets = self._channels.get(channel_id)
+        if buckets is None:
+            if len(self._channels) >= self.max_keys:
+                self._channels.popitem(last=False)
+            buckets = [[-1, 0] for _ in range(self.bucket_count)]
+            self._channels[channel_id] = buckets
+        else:
+            self._channels.move_to_end(channel_id)
+
+        index = int(now // self.bucket_seconds)
+        bucket = buckets[index % self.bucket_count]
+        if bucket[0] != index:
+            bucket[0], bucket[1] = index, 0
+        bucket[1] += 1
+
+    def rate(self, channel_id: int, now: Optional[float] = None) -> int:
+        """目前視窗內的訊息數"""
+        buckets = self._channels.get(channel_id)
+        if buckets is None:
+            return 0
+        now = time.monotonic() if now is None else now
+        return self._total(buckets, int(now // self.bucket_seconds))
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        淘汰視窗內已沒有訊息的頻道
+
+        Returns:
+            淘汰的數量
+        """
+        now = time.monotonic() if now is None else now
+        oldest = int(now // self.bucket_seconds) - self.bucket_count
+        removed = 0
+        while self._channels:
+            channel_id, buckets = next(iter(self._channels.items()))
+            if max(bucket[0] for bucket in buckets) > oldest:
+                break
+            del self._channels[channel_id]
+            removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """目前的項目數與估算記憶體用量"""
+        return {
+            'keys': len(self._channels),
+            'entries': len(self._channels) * self.bucket_count,
+            'approx_bytes': sys.getsizeof(self._channels) + sum(
+                sys.getsizeof(buckets) + sum(sys.getsizeof(bucket) for bucket in buckets)
+                for buckets in self._channels.values()
+            ),
+        }
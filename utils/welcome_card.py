@@ -0,0 +1,352 @@
+"""
+歡迎卡片模組 - 產生含頭像、名稱與成員編號的歡迎圖片
+背景模板依伺服器預先繪製並快取，頭像依頭像雜湊快取，繪製在執行緒池中進行，不阻塞事件循環
+需要 Pillow；未安裝時 PILLOW_AVAILABLE 為 False，歡迎卡片停用
+"""
+import asyncio
+import io
+import ipaddress
+import logging
+import socket
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+from yarl import URL
+
+try:
+    from PIL import Image, ImageDraw, ImageFont, ImageOps
+except ImportError:
+    Image = None
+
+PILLOW_AVAILABLE = Image is not None
+
+logger = logging.getLogger(__name__)
+
+CARD_SIZE = (800, 240)
+AVATAR_SIZE = 160
+AVATAR_POSITION = (40, 40)
+TEXT_X = 240
+MAX_BACKGROUND_BYTES = 8 * 1024 * 1024
+MAX_REDIRECTS = 3
+
+
+def _is_public_ip(address: str) -> bool:
+    try:
+        return ipaddress.ip_address(address).is_global
+    except ValueError:
+        return False
+
+
+def is_public_url(url: str) -> bool:
+    """
+    背景網址是否指向公開網路（背景由機器人主機下載，不可讓管理員指向內部服務）
+    網域名稱解析後的位址由下載時的解析器再檢查一次
+    """
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname
+    except ValueError:
+        return False
+    if parts.scheme not in ('http', 'https') or not host:
+        return False
+    host = host.rstrip('.')
+    if host == 'localhost' or host.endswith('.localhost'):
+        return False
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return True
+    return _is_public_ip(host)
+
+
+class _PublicResolver(AbstractResolver):
+    """只回傳公開位址的 DNS 解析器（防止網域解析到內部網路）"""
+
+    def __init__(self):
+        self._resolver = aiohttp.DefaultResolver()
+
+    async def resolve(self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET) -> List[dict]:
+        hosts = [entry for entry in await self._resolver.resolve(host, port, family) if _is_public_ip(entry['host'])]
+        if not hosts:
+            raise OSError(f"拒絕連線到非公開位址: {host}")
+        return hosts
+
+    async def close(self):
+        await self._resolver.close()
+
+
+@lru_cache(maxsize=16)
+def _font(path: Optional[str], size: int):
+    """載入字型（依路徑與大小快取；未設定字型檔時使用 Pillow 內建字型）"""
+    if path:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError as e:
+            logger.warning(f"無法載入字型 {path}: {e}")
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        # Pillow 10.1 以前的內建字型沒有大小
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=1)
+def _avatar_mask():
+    """圓形頭像遮罩（以 4 倍大小繪製再縮小，邊緣較平滑）"""
+    mask = Image.new('L', (AVATAR_SIZE * 4, AVATAR_SIZE * 4), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, AVATAR_SIZE * 4 - 1, AVATAR_SIZE * 4 - 1), fill=255)
+    return mask.resize((AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+
+
+def render_template(accent: int, background: Optional[bytes] = None):
+    """
+    繪製伺服器的背景模板（背景、暗化遮罩、頭像外框），所有成員共用
+
+    Args:
+        accent: 主題色 (0xRRGGBB)
+        background: 背景圖片檔案內容（None 為主題色漸層）
+
+    Returns:
+        RGB 模板圖片
+    """
+    color = ((accent >> 16) & 0xFF, (accent >> 8) & 0xFF, accent & 0xFF)
+    card = None
+    if background is not None:
+        try:
+            with Image.open(io.BytesIO(background)) as image:
+                image.draft('RGB', CARD_SIZE)
+                card = ImageOps.fit(image.convert('RGB'), CARD_SIZE, Image.LANCZOS)
+        except Exception as e:
+            logger.warning(f"無法解碼歡迎卡片背景: {e}")
+    if card is None:
+        # 主題色到深色的水平漸層
+        gradient = Image.linear_gradient('L').rotate(90).resize(CARD_SIZE)
+        card = Image.composite(Image.new('RGB', CARD_SIZE, (24, 25, 28)), Image.new('RGB', CARD_SIZE, color), gradient)
+
+    # 暗化讓文字清楚
+    card = Image.blend(card, Image.new('RGB', CARD_SIZE, (0, 0, 0)), 0.35)
+    draw = ImageDraw.Draw(card)
+    x, y = AVATAR_POSITION
+    draw.ellipse((x - 5, y - 5, x + AVATAR_SIZE + 4, y + AVATAR_SIZE + 4), fill=color)
+    return card
+
+
+def render_card(template, avatar: Optional[bytes], title: str, subtitle: str,
+                font_path: Optional[str] = None) -> bytes:
+    """
+    在模板上繪製成員的頭像與文字（會阻塞，請在執行緒池中呼叫）
+
+    Args:
+        template: render_template 的結果（不會被修改）
+        avatar: 頭像檔案內容（None 為留白）
+        title: 第一行文字（成員名稱）
+        subtitle: 第二行文字（成員編號）
+        font_path: 字型檔路徑
+
+    Returns:
+        PNG 檔案內容
+    """
+    card = template.copy()
+    if avatar is not None:
+        try:
+            with Image.open(io.BytesIO(avatar)) as image:
+                image.draft('RGB', (AVATAR_SIZE, AVATAR_SIZE))
+                face = image.convert('RGB').resize((AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+            card.paste(face, AVATAR_POSITION, _avatar_mask())
+        except Exception as e:
+            logger.debug(f"無法解碼頭像: {e}")
+
+    draw = ImageDraw.Draw(card)
+    title_font = _font(font_path, 44)
+    width = CARD_SIZE[0] - TEXT_X - 30
+    # 名稱過長時截斷
+    if draw.textlength(title, font=title_font) > width:
+        while title and draw.textlength(title + "…", font=title_font) > width:
+            title = title[:-1]
+        title += "…"
+    draw.text((TEXT_X, 70), title, font=title_font, fill=(255, 255, 255))
+    draw.text((TEXT_X, 135), subtitle, font=_font(font_path, 28), fill=(210, 212, 216))
+
+    output = io.BytesIO()
+    card.save(output, format='PNG', compress_level=3)
+    return output.getvalue()
+
+
+class WelcomeCardRenderer:
+    """歡迎卡片產生器：模板與頭像快取、執行緒池繪製"""
+
+    def __init__(self, workers: int = 2, template_cache_size: int = 32, avatar_cache_size: int = 512,
+                 font_path: Optional[str] = None):
+        """
+        Args:
+            workers: 繪製執行緒數量（Pillow 縮放與編碼時會釋放 GIL）
+            template_cache_size: 快取的伺服器模板數量
+            avatar_cache_size: 快取的頭像數量
+            font_path: 字型檔路徑（顯示中文需要 CJK 字型，None 為 Pillow 內建字型）
+        """
+        self.font_path = font_path
+        self.template_cache_size = template_cache_size
+        self.avatar_cache_size = avatar_cache_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="welcome-card")
+        # 伺服器 ID -> (模板鍵值, 模板圖片)
+        self._templates: "OrderedDict[int, tuple]" = OrderedDict()
+        # 頭像雜湊 -> 頭像檔案內容
+        self._avatars: "OrderedDict[str, bytes]" = OrderedDict()
+        # 進行中的下載/模板繪製，同時加入的成員共用同一次結果
+        self._fetching: Dict[str, asyncio.Task] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.counters = {
+            'rendered': 0, 'errors': 0, 'template_hits': 0, 'template_misses': 0,
+            'avatar_hits': 0, 'avatar_misses': 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return PILLOW_AVAILABLE
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _fetch_once(self, key: str, fetch):
+        """
+        同一個鍵值同時只執行一次（下載頭像/背景、繪製模板），失敗時回傳 None
+        以獨立的工作執行：呼叫端被取消（例如第一位成員的事件處理中斷）不會影響其他等待者
+        """
+        task = self._fetching.get(key)
+        if task is None:
+            task = asyncio.create_task(self._guarded(key, fetch))
+            self._fetching[key] = task
+            task.add_done_callback(lambda done: self._fetching.pop(key, None) if self._fetching.get(key) is done else None)
+        return await asyncio.shield(task)
+
+    @staticmethod
+    async def _guarded(key: str, fetch):
+        try:
+            return await fetch()
+        except Exception as e:
+            logger.debug(f"處理 {key} 失敗: {e}")
+            return None
+
+    async def _avatar(self, asset) -> Optional[bytes]:
+        """取得頭像（依頭像雜湊快取，成員更換頭像時雜湊會改變）"""
+        data = self._avatars.get(asset.key)
+        if data is not None:
+            self._avatars.move_to_end(asset.key)
+            self.counters['avatar_hits'] += 1
+            return data
+        self.counters['avatar_misses'] += 1
+        data = await self._fetch_once(f"avatar:{asset.key}", asset.with_format('png').with_size(256).read)
+        if data is not None:
+            self._avatars[asset.key] = data
+            while len(self._avatars) > self.avatar_cache_size:
+                self._avatars.popitem(last=False)
+        return data
+
+    async def _download(self, url: str) -> Optional[bytes]:
+        """下載背景圖片（只連線到公開位址；重新導向逐次檢查）"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=10),
+                connector=aiohttp.TCPConnector(resolver=_PublicResolver())
+            )
+        for _ in range(MAX_REDIRECTS + 1):
+            # IP 位址不經過解析器，每次連線前都要檢查
+            if not is_public_url(url):
+                raise ValueError(f"拒絕下載非公開網址: {url}")
+            async with self._session.get(url, allow_redirects=False) as response:
+                if response.status in (301, 302, 303, 307, 308) and 'Location' in response.headers:
+                    url = str(response.url.join(URL(response.headers['Location'])))
+                    continue
+                response.raise_for_status()
+                if (response.content_length or 0) > MAX_BACKGROUND_BYTES:
+                    return None
+                data = bytearray()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    data += chunk
+                    if len(data) > MAX_BACKGROUND_BYTES:
+                        return None
+                return bytes(data)
+        raise ValueError(f"重新導向次數過多: {url}")
+
+    async def _template(self, guild_id: int, accent: int, background_url: Optional[str]):
+        """取得伺服器的模板（設定變更時鍵值不同，會重新繪製）"""
+        key = (accent, background_url)
+        cached = self._templates.get(guild_id)
+        if cached is not None and cached[0] == key:
+            self._templates.move_to_end(guild_id)
+            self.counters['template_hits'] += 1
+            return cached[1]
+        self.counters['template_misses'] += 1
+        template = await self._fetch_once(
+            f"template:{guild_id}:{accent}:{background_url}",
+            lambda: self._build_template(guild_id, key, accent, background_url)
+        )
+        if template is None:
+            raise RuntimeError("無法繪製背景模板")
+        return template
+
+    async def _build_template(self, guild_id: int, key: tuple, accent: int, background_url: Optional[str]):
+        background = None
+        if background_url:
+            background = await self._fetch_once(f"background:{background_url}", lambda: self._download(background_url))
+        template = await self._run(render_template, accent, background)
+        self._templates[guild_id] = (key, template)
+        while len(self._templates) > self.template_cache_size:
+            self._templates.popitem(last=False)
+        return template
+
+    async def render(self, guild_id: int, avatar, title: str, subtitle: str, accent: int,
+                     background_url: Optional[str] = None) -> Optional[bytes]:
+        """
+        產生歡迎卡片
+
+        Args:
+            guild_id: 伺服器 ID
+            avatar: 成員頭像 (discord.Asset)
+            title: 第一行文字
+            subtitle: 第二行文字
+            accent: 主題色
+            background_url: 背景圖片網址
+
+        Returns:
+            PNG 檔案內容，未安裝 Pillow 或失敗時為 None
+        """
+        if not self.enabled:
+            return None
+        try:
+            template, avatar_data = await asyncio.gather(
+                self._template(guild_id, accent, background_url),
+                self._avatar(avatar)
+            )
+            data = await self._run(render_card, template, avatar_data, title, subtitle, self.font_path)
+        except Exception as e:
+            logger.error(f"產生歡迎卡片失敗: {e}")
+            self.counters['errors'] += 1
+            return None
+        self.counters['rendered'] += 1
+        return data
+
+    def forget_guild(self, guild_id: int):
+        """移除伺服器的模板（例如更換背景）"""
+        self._templates.pop(guild_id, None)
+
+    async def close(self):
+        for task in list(self._fetching.values()):
+            task.cancel()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'templates': len(self._templates),
+            'avatars': len(self._avatars),
+            'avatar_bytes': sum(len(data) for data in self._avatars.values()),
+            **self.counters,
+        }